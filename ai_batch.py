@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+AI 批量调用引擎
+
+热词锐评和群友锐评原来逐条同步调用 OpenAI，10 个词 + 10 个群友要串行等几分钟。
+这里基于 AsyncOpenAI 并发执行一批 chat completion：
+- 信号量限制并发数
+- 令牌桶限制每分钟请求数
+- 429 / 5xx / 超时按指数退避重试（优先遵循 Retry-After）
+- 每个请求单独超时，失败的条目返回 None，由调用方使用备用文案
+- 客户端和事件循环由 ai_client 进程级共享，批次之间复用连接
+"""
+
+import os
+import math
+import time
+import random
+import asyncio
+import config as cfg
+
+
+def ai_setting(name, default):
+    """读取 AI 相关配置：环境变量优先，其次 config.py，按默认值的类型转换"""
+    value = os.getenv(name)
+    if value is None or value == '':
+        value = getattr(cfg, name, default)
+    if isinstance(default, bool) and isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return type(default)(value)
+
+
+class TokenBucket:
+    """异步令牌桶：平均速率 rate 个/秒，允许 capacity 个突发"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+
+class ChatJob:
+    """一次 chat completion 请求（validate(text) -> bool 校验不通过的响应不写入缓存）"""
+
+    def __init__(self, key, messages, max_tokens, temperature, validate=None):
+        self.key = key
+        self.messages = messages
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.validate = validate
+
+
+class AsyncBatchRunner:
+    """基于 AsyncOpenAI 的并发批量执行器"""
+
+    def __init__(self, api_key, base_url, model, concurrency=None, rpm=None,
+                 max_retries=None, item_timeout=None):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.model = model
+        self.concurrency = max(concurrency or ai_setting('AI_CONCURRENCY', 5), 1)
+        self.rpm = max(rpm or ai_setting('AI_RATE_LIMIT_RPM', 60), 1)
+        self.max_retries = max_retries if max_retries is not None else ai_setting('AI_MAX_RETRIES', 3)
+        self.item_timeout = item_timeout or ai_setting('AI_ITEM_TIMEOUT', 120.0)
+
+    @staticmethod
+    def _retry_after(error):
+        """从错误响应中读取 Retry-After（秒），没有则返回 None"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _is_retryable(error):
+        import openai
+        if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, asyncio.TimeoutError)
+
+    async def _complete(self, client, job, semaphore, bucket, cache):
+        # SQLite 读写放到线程池，避免阻塞共享的事件循环
+        if cache:
+            cached = await asyncio.to_thread(cache.get, self.model, job.messages, job.temperature, job.max_tokens)
+            if cached is not None:
+                return cached
+
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            try:
+                async with semaphore:
+                    response = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            model=self.model,
+                            messages=job.messages,
+                            max_tokens=job.max_tokens,
+                            temperature=job.temperature
+                        ),
+                        timeout=self.item_timeout
+                    )
+                content = (response.choices[0].message.content or '').strip()
+                if cache and (job.validate is None or job.validate(content)):
+                    await asyncio.to_thread(
+                        cache.put, self.model, job.messages, job.temperature, job.max_tokens, content
+                    )
+                return content
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    print(f"   ⚠️ AI生成失败({job.key}): {e}")
+                    return None
+                delay = self._retry_after(e)
+                if delay is None:
+                    delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+                print(f"   ⏳ {job.key} 请求受限或超时，{delay:.1f} 秒后重试 ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+        return None
+
+    async def run(self, jobs, on_result=None):
+        """
+        并发执行一批请求
+
+        Args:
+            jobs: ChatJob 列表
+            on_result: 可选回调 on_result(key, text)，每完成一条调用一次（text 失败时为 None）
+
+        Returns:
+            {key: 响应文本或 None}
+        """
+        from ai_client import get_async_openai_client
+        from llm_cache import get_llm_cache
+
+        # 共享连接池的客户端，重试由本引擎统一处理
+        client = get_async_openai_client(self.api_key, self.base_url)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        bucket = TokenBucket(self.rpm / 60.0, self.concurrency)
+        cache = get_llm_cache()
+        results = {}
+
+        async def worker(job):
+            text = await self._complete(client, job, semaphore, bucket, cache)
+            results[job.key] = text
+            if on_result:
+                try:
+                    on_result(job.key, text)
+                except Exception as e:
+                    print(f"   ⚠️ 结果回调失败({job.key}): {e}")
+
+        await asyncio.gather(*(worker(job) for job in jobs))
+        return results
+
+    def batch_timeout(self, n_jobs):
+        """
+        整批请求的等待上限（秒）
+
+        按并发数分轮，每轮为单条请求含全部重试和退避的最长耗时，再加上限速排队的时间
+        """
+        waves = max(math.ceil(n_jobs / self.concurrency), 1)
+        per_item = (self.max_retries + 1) * self.item_timeout + self.max_retries * 45.0
+        return waves * per_item + n_jobs * 60.0 / self.rpm
+
+    def run_sync(self, jobs, on_result=None):
+        """同步执行（在 Flask 请求线程或命令行中直接调用），请求在常驻的 AI 事件循环中进行"""
+        from ai_client import run_in_ai_loop
+        jobs = list(jobs)
+        return run_in_ai_loop(self.run(jobs, on_result), timeout=self.batch_timeout(len(jobs)))
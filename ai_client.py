@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+进程级共享的 OpenAI 客户端
+
+AIWordSelector、AICommentGenerator、AIUserPersonalityGenerator 原来每次构造都新建
+OpenAI 客户端和 httpx.Client，每次 finalize 都要重新建立 TLS 连接，旧连接池也不会关闭。
+这里按 (api_key, base_url) 缓存客户端，所有实例共用一个长连接池：
+- 连接数、keep-alive 数量和过期时间可配置
+- 安装了 h2 时启用 HTTP/2（多个并发请求复用同一条连接）
+- 异步客户端绑定在一个常驻的后台事件循环上，AsyncBatchRunner 的每批请求都提交到该循环，
+  避免 asyncio.run 每次新建事件循环导致连接池无法复用
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from ai_batch import ai_setting
+
+# HTTP/2 需要 h2 包（pip install httpx[http2]），没有时使用 HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_lock = threading.Lock()
+_sync_http_client = None
+_async_http_client = None
+_sync_clients = {}
+_async_clients = {}
+_loop = None
+_loop_thread = None
+
+
+def _http_options():
+    """共享连接池的 httpx 参数"""
+    import httpx
+    return {
+        'timeout': httpx.Timeout(ai_setting('AI_HTTP_TIMEOUT', 300.0), connect=10.0),
+        'limits': httpx.Limits(
+            max_connections=ai_setting('AI_HTTP_MAX_CONNECTIONS', 20),
+            max_keepalive_connections=ai_setting('AI_HTTP_MAX_KEEPALIVE', 10),
+            keepalive_expiry=ai_setting('AI_HTTP_KEEPALIVE_EXPIRY', 60.0),
+        ),
+        'http2': HTTP2_AVAILABLE and ai_setting('AI_HTTP2', True),
+    }
+
+
+def get_openai_client(api_key, base_url=None):
+    """获取共享的同步 OpenAI 客户端（相同 api_key 和 base_url 返回同一个实例）"""
+    global _sync_http_client
+    key = (api_key, base_url or None)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            from openai import OpenAI
+            import httpx
+
+            if _sync_http_client is None:
+                _sync_http_client = httpx.Client(**_http_options())
+            client = OpenAI(api_key=api_key, base_url=base_url or None, http_client=_sync_http_client)
+            _sync_clients[key] = client
+        return client
+
+
+def get_async_openai_client(api_key, base_url=None):
+    """
+    获取共享的异步 OpenAI 客户端
+
+    只能在 run_in_ai_loop 提交的协程中使用，重试由 AsyncBatchRunner 统一处理（max_retries=0）
+    """
+    global _async_http_client
+    key = (api_key, base_url or None)
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            from openai import AsyncOpenAI
+            import httpx
+
+            if _async_http_client is None:
+                _async_http_client = httpx.AsyncClient(**_http_options())
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url or None,
+                                 max_retries=0, http_client=_async_http_client)
+            _async_clients[key] = client
+        return client
+
+
+def _get_loop():
+    """启动（或复用）常驻的 AI 事件循环线程"""
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or not _loop_thread.is_alive():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name='ai-event-loop', daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_in_ai_loop(coro, timeout=None):
+    """
+    在常驻事件循环中执行协程并等待结果（可从任意线程调用）
+
+    Args:
+        timeout: 最长等待秒数，超时后取消协程并抛出 TimeoutError（事件循环被阻塞时不会让调用线程永久挂起）
+    """
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("不能在 AI 事件循环线程内同步等待")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(f"AI 请求在 {timeout:g} 秒内未完成")
+
+
+def close_clients():
+    """关闭共享连接池（进程退出时调用）"""
+    global _sync_http_client, _async_http_client
+    with _lock:
+        _sync_clients.clear()
+        _async_clients.clear()
+        if _sync_http_client is not None:
+            _sync_http_client.close()
+            _sync_http_client = None
+        if _async_http_client is not None and _loop is not None and _loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(_async_http_client.aclose(), _loop).result(timeout=5)
+            except Exception:
+                pass
+        _async_http_client = None
+        if _loop is not None:
+            _loop.call_soon_threadsafe(_loop.stop)
+
+
+atexit.register(close_clients)
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import re
 import random
-import string
 import math
 import jieba
 from collections import Counter, defaultdict
@@ -9,14 +8,21 @@ import config as cfg
 from utils import (
     extract_emojis,
     is_emoji,
-    parse_timestamp,
     clean_text,
     calculate_entropy,
     analyze_single_chars,
-    analyze_sentiment,
     MEANINGLESS_SYMBOLS,
 )
 from tokenizer_wrapper import TokenizerWrapper
+from background_freq import get_background_table, log_likelihood_scores
+from sentiment import get_sentiment_backend
+from timestamps import get_default_parser
+from time_series import TimeSeriesAggregator
+from trends import compute_trends
+from interaction_graph import InteractionGraphBuilder, REPLY, AT
+from msgid_index import MessageIdIndex
+from user_filter import UserFilter
+from token_filter import TokenClassifier, is_id_like_string
 
 jieba.setLogLevel(jieba.logging.INFO)
 
@@ -26,7 +32,8 @@ class ChatAnalyzer:
         self.messages = data.get('messages', [])
         self.chat_name = data.get('chatName', data.get('chatInfo', {}).get('name', '未知群聊'))
         self.uin_to_name = {}
-        self.msgid_to_sender = {}
+        self.user_filter = UserFilter()  # FILTERED_USERS 预编译匹配（按名称 / uin 缓存）
+        self.msgid_to_sender = MessageIdIndex()  # messageId → 发送者（紧凑索引，见 msgid_index.py）
         self.word_freq = Counter()
         self.word_samples = defaultdict(list)
         self.word_contributors = defaultdict(Counter)
@@ -47,18 +54,29 @@ class ChatAnalyzer:
         self.hour_distribution = Counter()
         self.discovered_words = set()
         self.merged_words = {}
+        self.time_series = TimeSeriesAggregator()  # 全群 / 群友 / 热词的按天计数
+        self.word_periods = {}  # {word: {周序号: 次数}}，用于计算热词的突发性（过滤后由 time_series 汇总）
+        self.period_totals = Counter()  # {周序号: 有效消息数}（进入分词的非空消息，作为突发性的分母）
+        self.word_trends = {}  # {word: 爆发分、峰值日期、流行周期等}，见 trends.py
+        self.timestamp_parser = get_default_parser()  # 时间戳解析（带缓存，时区见 TIMEZONE_OFFSET_HOURS）
+        self.word_distinctiveness = {}  # {word: 相对背景语料的对数似然比}
         self.single_char_stats = {}  # 单字统计
         self.cleaned_texts = []  # 缓存清洗后的文本
         # 新增：用户情感统计
         self.user_positive_count = Counter()  # 正向情感发言数
         self.user_negative_count = Counter()  # 负向情感发言数
         self.user_neutral_count = Counter()  # 中立情感发言数
+        self.user_sentiment_score = Counter()  # 连续情感分（-1~1）之和，除以发言数得平均情感
         # 新增：用户@他人统计
         self.user_at_targets = defaultdict(Counter)  # {uin: {target_uin: count}}
+        # 回复 / @ 互动关系图（扫描时累计边，趣味统计结束后构建）
+        self.interactions = InteractionGraphBuilder()
+        self.interaction_graph = None
         # 新增：用户发言样本（用于AI举例）
         self.user_message_samples = defaultdict(list)  # {uin: [message_texts]}
         # 同词异格映射（别名到标准词的映射）
         self.word_alias_map = getattr(cfg, 'WORD_ALIAS_MAP', {})
+        self.token_classifier = TokenClassifier(normalize=self._normalize_word)  # 分词过滤（按词缓存判断结果）
         # 初始化分词器
         tokenizer_type = getattr(cfg, 'TOKENIZER_TYPE', 'jieba')
         model_path = getattr(cfg, 'SP_MODEL_PATH', None) or getattr(cfg, 'PKUSEG_MODEL', None)
@@ -92,25 +110,18 @@ class ChatAnalyzer:
         uin = sender.get('uin', '')
         
         # 检查用户名是否在过滤列表中
-        if name:
-            for filtered_name in cfg.FILTERED_USERS:
-                if filtered_name in name:
-                    return True
+        if self.user_filter.is_filtered_name(name):
+            return True
         
         # 检查 sendMemberName
         raw_msg = msg.get('rawMessage', {})
         send_member_name = raw_msg.get('sendMemberName', '').strip()
-        if send_member_name:
-            for filtered_name in cfg.FILTERED_USERS:
-                if filtered_name in send_member_name:
-                    return True
+        if self.user_filter.is_filtered_name(send_member_name):
+            return True
         
         # 检查 uin_to_name 映射中的名称
         if uin and uin in self.uin_to_name:
-            mapped_name = self.uin_to_name[uin]
-            for filtered_name in cfg.FILTERED_USERS:
-                if filtered_name in mapped_name:
-                    return True
+            return self.user_filter.is_filtered_uin(uin, self.uin_to_name)
         
         return False
 
@@ -133,19 +144,7 @@ class ChatAnalyzer:
             send_member_name = raw_msg.get('sendMemberName', '').strip()
             
             # 简单检查用户名是否包含过滤关键词
-            should_filter = False
-            if name:
-                for filtered_name in cfg.FILTERED_USERS:
-                    if filtered_name in name:
-                        should_filter = True
-                        break
-            if not should_filter and send_member_name:
-                for filtered_name in cfg.FILTERED_USERS:
-                    if filtered_name in send_member_name:
-                        should_filter = True
-                        break
-            
-            if should_filter:
+            if self.user_filter.is_filtered_name(name) or self.user_filter.is_filtered_name(send_member_name):
                 continue
             
             uin = sender.get('uin')
@@ -165,7 +164,7 @@ class ChatAnalyzer:
                     uin_member_names[uin] = send_member_name
             
             if msg_id and uin:
-                self.msgid_to_sender[msg_id] = uin
+                self.msgid_to_sender.add(msg_id, uin)
         
         # 为每个 uin 选择最合适的 name
         for uin, names in uin_names.items():
@@ -185,6 +184,8 @@ class ChatAnalyzer:
             
             if chosen_name:
                 self.uin_to_name[uin] = chosen_name
+        
+        self.user_filter.forget_uins()
 
     def get_name(self, uin):
         return self.uin_to_name.get(uin, f"未知用户({uin})")
@@ -215,49 +216,15 @@ class ChatAnalyzer:
         return word
     
     def _is_id_like_string(self, word):
-        """判断是否为ID类字符串（图片ID、消息ID等）"""
-        if not word:
-            return False
-        
-        # 长度检查：ID通常在3-20个字符之间（包括短ID如7R%D8、0ED3V）
-        if len(word) < 3 or len(word) > 20:
-            return False
-        
-        # 如果包含特殊字符（如%、_、-、}、]等），很可能是ID
-        if re.search(r'[%_\-}\]]', word):
-            return True
-        
-        # 必须是字母数字组合（不包含中文、标点等）
-        if not re.match(r'^[a-zA-Z0-9]+$', word):
-            return False
-        
-        # 必须包含至少一个字母和一个数字
-        has_letter = bool(re.search(r'[a-zA-Z]', word))
-        has_digit = bool(re.search(r'[0-9]', word))
-        
-        if not (has_letter and has_digit):
-            return False
-        
-        # 对于短字符串（3-5个字符），如果字母数字混合，很可能是ID
-        if len(word) <= 5:
-            # 如果全是数字或全是字母，不是ID
-            if re.match(r'^[0-9]+$', word) or re.match(r'^[a-zA-Z]+$', word):
-                return False
-            # 字母数字混合的短字符串，很可能是ID
-            return True
-        
-        # 对于长字符串（6-20个字符），字母数量应该占多数（至少50%）
-        letter_count = len(re.findall(r'[a-zA-Z]', word))
-        if letter_count < len(word) * 0.5:
-            return False
-        
-        # 排除常见的英文单词（长度在6-20之间的常见词）
-        # 这里可以添加更多常见词，但为了性能，只检查一些明显的
-        common_words = {'password', 'username', 'account', 'message', 'picture', 'image'}
-        if word.lower() in common_words:
-            return False
-        
-        return True
+        """判断是否为ID类字符串（图片ID、消息ID等），见 token_filter.is_id_like_string"""
+        return is_id_like_string(word)
+
+    def _message_day(self, msg):
+        """消息的本地日期序数（解析结果按小时缓存），无法解析时返回 None"""
+        date_hour = self.timestamp_parser.date_hour(msg.get('timestamp', ''))
+        if date_hour is None:
+            return None
+        return date_hour[0].toordinal()
 
     def analyze(self):
         print(f"📊 开始分析: {self.chat_name}")
@@ -439,6 +406,7 @@ class ChatAnalyzer:
 
     def _tokenize_and_count(self):
         """分词统计"""
+        token_classifier = self.token_classifier
         for idx, msg in enumerate(self.messages):
             # 跳过机器人消息
             if self._is_bot_message(msg):
@@ -457,6 +425,10 @@ class ChatAnalyzer:
             if not cleaned:
                 continue
             
+            day = self._message_day(msg)
+            if day is not None:
+                self.period_totals[day // 7] += 1
+            
             words = list(self.tokenizer.cut(cleaned))
             emojis = extract_emojis(cleaned)
             words = [w for w in words if not is_emoji(w)]  # 新增：从words中去掉emoji
@@ -467,63 +439,47 @@ class ChatAnalyzer:
                 if not word:
                     continue
                 
-                # 过滤@符号及其相关内容（额外检查，确保没有遗漏）
-                if word.startswith('@') or '@' in word:
-                    continue
-                
-                # 额外检查：如果词汇看起来像是群昵称（单独出现的英文单词，且可能是过滤@后残留的）
-                # 这种情况应该已经在clean_text中处理，但为了保险起见，这里也检查
-                # 注意：这个检查比较保守，只过滤明显是群昵称的情况
-                # 如果词汇是纯英文单词且长度较短（可能是群昵称），且不在常用词列表中，可能需要过滤
-                # 但这样可能误删，所以暂时不处理，让clean_text函数处理
-                
-                # 跳过纯数字/符号
-                if re.match(r'^[\d\W]+$', word) and not is_emoji(word):
-                    continue
-                
-                # 过滤包含特殊字符的字符串（如7R%D8、包含%、_、-、}、]等）
-                # 这些通常是图片ID、消息ID等无意义标识符
-                if re.search(r'[%_\-}\]]', word) and not re.search(r'[\u4e00-\u9fff]', word):
-                    # 如果包含特殊字符且没有中文，很可能是ID
-                    continue
-                
-                # 过滤无意义符号词汇（如⌒、☆、★等）
-                # 如果词只包含无意义符号，跳过
-                if all(c in MEANINGLESS_SYMBOLS for c in word):
-                    continue
-                # 如果词包含无意义符号且没有其他有意义字符，跳过
-                if word and all(c in MEANINGLESS_SYMBOLS or c in string.punctuation or c in '，。！？；：、""''（）【】' or c.isspace() for c in word):
-                    continue
-                
-                # 过滤ID类字符串（图片ID、消息ID等）
-                # 匹配：3-20个字符，主要是字母数字组合，包括短ID如7R%D8、0ED3V
-                if self._is_id_like_string(word):
-                    continue
-                
-                # 提前过滤黑名单（性能优化：避免统计后再过滤）
-                if word in cfg.BLACKLIST:
-                    continue
-                
-                # 过滤虚词（不计入统计）
-                if word in cfg.FUNCTION_WORDS:
+                # @、纯数字/符号、ID、无意义符号、黑名单、虚词的过滤和同词异格归一化（按词缓存）
+                normalized_word = token_classifier.classify(word)
+                if normalized_word is None:
                     continue
                 
-                # 同词异格处理：将别名映射到标准词
-                normalized_word = self._normalize_word(word)
-                
                 # 统计标准词（如果映射了，统计标准词；否则统计原词）
                 self.word_freq[normalized_word] += 1
                 if sender_uin:
                     self.word_contributors[normalized_word][sender_uin] += 1
+                if day is not None:
+                    self.time_series.add_word(normalized_word, day)
                 if len(self.word_samples[normalized_word]) < cfg.SAMPLE_COUNT * 3:
                     # 只收集有意义的样本（过滤掉只包含图片标记、ID等的无意义内容）
                     if self._is_meaningful_sample(cleaned):
                         self.word_samples[normalized_word].append(cleaned)
 
+    def _score_sentiment_chunk(self, backend, uins, texts):
+        """对一批发言做情感打分并累加到各用户"""
+        if not texts:
+            return
+        for uin, score in zip(uins, backend.score_batch(texts)):
+            self.user_sentiment_score[uin] += score
+            sentiment = backend.label(score)
+            if sentiment == 'positive':
+                self.user_positive_count[uin] += 1
+            elif sentiment == 'negative':
+                self.user_negative_count[uin] += 1
+            else:
+                self.user_neutral_count[uin] += 1
+        uins.clear()
+        texts.clear()
+
     def _fun_statistics(self):
         """趣味统计"""
         prev_clean = None  # 改用清理后文本
         prev_sender = None
+        # 情感分析按块批量进行
+        sentiment_backend = get_sentiment_backend()
+        chunk_size = getattr(cfg, 'SENTIMENT_CHUNK_SIZE', 4096)
+        sentiment_uins = []
+        sentiment_texts = []
         
         for msg in self.messages:
             # 跳过机器人消息
@@ -560,9 +516,10 @@ class ChatAnalyzer:
             if reply_info:
                 self.user_reply_count[sender_uin] += 1
                 ref_msg_id = reply_info.get('referencedMessageId')
-                if ref_msg_id and ref_msg_id in self.msgid_to_sender:
-                    target_uin = self.msgid_to_sender[ref_msg_id]
+                target_uin = self.msgid_to_sender.get(ref_msg_id)
+                if target_uin:
                     self.user_replied_count[target_uin] += 1
+                    self.interactions.add(sender_uin, target_uin, REPLY)
             
             # @统计
             raw = msg.get('rawMessage', {})
@@ -577,6 +534,7 @@ class ChatAnalyzer:
                         self.user_ated_count[at_uid] += 1
                         # 记录@的目标用户
                         self.user_at_targets[sender_uin][at_uid] += 1
+                        self.interactions.add(sender_uin, at_uid, AT)
             
             # 表情统计（包括emoji、[表情:]、gif）
             emojis = extract_emojis(clean)
@@ -591,8 +549,10 @@ class ChatAnalyzer:
                 self.user_link_count[sender_uin] += 1
             
             # 时段统计
-            hour = parse_timestamp(timestamp)
-            if hour is not None:
+            date_hour = self.timestamp_parser.date_hour(timestamp)
+            if date_hour is not None:
+                day, hour = date_hour
+                self.time_series.add_message(day.toordinal(), sender_uin)
                 self.hour_distribution[hour] += 1
                 if hour in cfg.NIGHT_OWL_HOURS:
                     self.user_night_count[sender_uin] += 1
@@ -604,15 +564,12 @@ class ChatAnalyzer:
                 if clean == prev_clean and sender_uin != prev_sender:
                     self.user_repeat_count[sender_uin] += 1
             
-            # 情感分析统计
+            # 情感分析统计（攒够一块再批量打分）
             if clean and len(clean) >= 2:
-                sentiment = analyze_sentiment(clean)
-                if sentiment == 'positive':
-                    self.user_positive_count[sender_uin] += 1
-                elif sentiment == 'negative':
-                    self.user_negative_count[sender_uin] += 1
-                else:
-                    self.user_neutral_count[sender_uin] += 1
+                sentiment_uins.append(sender_uin)
+                sentiment_texts.append(clean)
+                if len(sentiment_texts) >= chunk_size:
+                    self._score_sentiment_chunk(sentiment_backend, sentiment_uins, sentiment_texts)
                 
                 # 收集发言样本（最多保存10条有意义的样本）
                 if self._is_meaningful_sample(clean) and len(self.user_message_samples[sender_uin]) < 10:
@@ -623,6 +580,9 @@ class ChatAnalyzer:
             prev_clean = clean if clean else prev_clean  # 空消息不更新
             prev_sender = sender_uin
         
+        self._score_sentiment_chunk(sentiment_backend, sentiment_uins, sentiment_texts)
+        self.interaction_graph = self.interactions.build()
+        
         # 计算人均字数
         for uin in self.user_msg_count:
             msg_count = self.user_msg_count[uin]
@@ -654,14 +614,8 @@ class ChatAnalyzer:
             if word in cfg.FUNCTION_WORDS:
                 continue
             
-            # 过滤包含特殊字符的字符串（如7R%D8、包含%、_、-、}、]等）
-            # 这些通常是图片ID、消息ID等无意义标识符
-            if re.search(r'[%_\-}\]]', word) and not re.search(r'[\u4e00-\u9fff]', word):
-                # 如果包含特殊字符且没有中文，很可能是ID
-                continue
-            
-            # 过滤ID类字符串（图片ID、消息ID等）
-            if self._is_id_like_string(word):
+            # 特殊字符、ID、纯数字、纯标点、纯无意义符号（按词缓存）
+            if self.token_classifier.is_noise_word(word):
                 continue
             
             # 单字特殊处理（采用旧版逻辑）
@@ -677,25 +631,15 @@ class ChatAnalyzer:
                     else:
                         continue
             
-            # 纯数字跳过
-            if re.match(r'^[\d\s]+$', word):
-                continue
-            
-            # 纯标点跳过
-            if all(c in string.punctuation or c in '，。！？；：、""''（）【】' for c in word):
-                continue
-            
-            # 过滤无意义符号词汇（如⌒、☆、★等）
-            # 如果词只包含无意义符号，跳过
-            if all(c in MEANINGLESS_SYMBOLS for c in word):
-                continue
-            # 如果词包含无意义符号且没有其他有意义字符，跳过
-            if word and all(c in MEANINGLESS_SYMBOLS or c in string.punctuation or c in '，。！？；：、""''（）【】' or c.isspace() for c in word):
-                continue
-            
             filtered_freq[word] = freq
         
+        corpus_total = sum(self.word_freq.values())
         self.word_freq = filtered_freq
+        self._compute_distinctiveness(corpus_total)
+        # 只保留热词的按天计数，并汇总为按周的分布
+        self.time_series.compact_words(word for word, _ in self.get_top_words())
+        self.word_periods = {word: self.time_series.weekly(word, 'word') for word in self.time_series.words}
+        self.word_trends = compute_trends(self.time_series)
         
         # 采样并过滤无意义样本
         for word in list(self.word_samples.keys()):
@@ -709,22 +653,28 @@ class ChatAnalyzer:
         
         print(f"   过滤后 {len(self.word_freq)} 个词")
 
+    def _compute_distinctiveness(self, corpus_total):
+        """相对背景语料的对数似然比（G²），所有词一次批量计算"""
+        self.word_distinctiveness = {}
+        background = get_background_table()
+        if background is None or not self.word_freq:
+            return
+        words = list(self.word_freq.keys())
+        counts = [self.word_freq[w] for w in words]
+        scores = log_likelihood_scores(words, counts, corpus_total, background)
+        self.word_distinctiveness = dict(zip(words, scores))
+
     def get_top_words(self, n=None):
         n = n or cfg.TOP_N
+        # 按独特性排序时，通用高频词（什么、今天等）自然排在后面，不依赖停用词表
+        if getattr(cfg, 'HOT_WORD_RANKING', 'frequency') == 'distinctiveness' and self.word_distinctiveness:
+            ranked = sorted(
+                self.word_freq.items(),
+                key=lambda item: (-self.word_distinctiveness.get(item[0], 0.0), -item[1])
+            )
+            return ranked[:n]
         return self.word_freq.most_common(n)
 
-    def _is_filtered_user_by_uin(self, uin):
-        """根据uin判断用户是否应该被过滤"""
-        if not uin:
-            return False
-        # 检查映射中的名称
-        if uin in self.uin_to_name:
-            name = self.uin_to_name[uin]
-            for filtered_name in cfg.FILTERED_USERS:
-                if filtered_name in name:
-                    return True
-        return False
-    
     def _is_meaningful_sample(self, text):
         """判断样本是否有意义（过滤掉只包含图片标记、ID等的无意义内容）"""
         if not text or len(text.strip()) < 2:
@@ -827,12 +777,21 @@ class ChatAnalyzer:
                         if not self._is_filtered_user_by_uin(uin)
                     ][:cfg.CONTRIBUTOR_TOP_N],  # 过滤后取前N个
                     'samples': [s for s in self.word_samples.get(word, [])[:cfg.SAMPLE_COUNT * 2]
-                               if self._is_meaningful_sample(s)][:cfg.SAMPLE_COUNT]
+                               if self._is_meaningful_sample(s)][:cfg.SAMPLE_COUNT],
+                    'distinctiveness': round(self.word_distinctiveness.get(word, 0.0), 1),
+                    'monthly': self.time_series.monthly(word, 'word'),  # 月度走势 {'YYYY-MM': 次数}
+                    'trend': self.word_trends.get(word)  # 爆发 / 峰值 / 流行周期
                 }
                 for word, freq in self.get_top_words()
             ],
             'rankings': {},
-            'hourDistribution': {str(h): self.hour_distribution.get(h, 0) for h in range(24)}
+            'hourDistribution': {str(h): self.hour_distribution.get(h, 0) for h in range(24)},
+            'monthlyDistribution': self.time_series.monthly(),
+            'dateRange': {
+                'start': str(self.time_series.first_date() or ''),
+                'end': str(self.time_series.last_date() or ''),
+                'days': self.time_series.n_days,
+            }
         }
         
         # 趣味榜单（包含uin）
@@ -864,8 +823,46 @@ class ChatAnalyzer:
         result['rankings']['早起鸟'] = fmt_with_uin(self.user_morning_count)
         result['rankings']['复读机'] = fmt_with_uin(self.user_repeat_count)
         
+        result['interactions'] = self.get_interaction_summary()
+        
         return result
     
+    def get_interaction_summary(self):
+        """互动关系：最佳搭档和小圈子（供报告展示）"""
+        graph = self.interaction_graph
+        if graph is None:
+            return {'reciprocity': 0, 'bestDuos': [], 'circles': []}
+        
+        def member(uin):
+            return {'name': self.get_name(uin), 'uin': uin}
+        
+        best_duos = [
+            {
+                'members': [member(uin_a), member(uin_b)],
+                'replies': pair['replies'],
+                'ats': pair['ats'],
+                'weight': round(pair['weight'], 1),
+                'reciprocity': round(pair['reciprocity'], 2),
+            }
+            for uin_a, uin_b, pair in graph.best_duos(cfg.RANK_TOP_N, exclude=self._is_filtered_user_by_uin)
+        ]
+        
+        circles = []
+        for circle in graph.circles(getattr(cfg, 'CIRCLE_MIN_SIZE', 3), exclude=self._is_filtered_user_by_uin):
+            # 圈内按发言数排序，只展示最活跃的几位
+            members = sorted(circle['members'], key=lambda uin: -self.user_msg_count.get(uin, 0))
+            circles.append({
+                'size': len(members),
+                'members': [member(uin) for uin in members[:cfg.RANK_TOP_N]],
+                'weight': round(circle['internal_weight'], 1),
+            })
+        
+        return {
+            'reciprocity': round(graph.reciprocity(), 3),
+            'bestDuos': best_duos,
+            'circles': circles[:cfg.RANK_TOP_N],
+        }
+    
     def get_user_representative_words(self, top_n_users=10, words_per_user=5):
         """
         获取每个用户的代表性词汇
@@ -968,15 +965,10 @@ class ChatAnalyzer:
             char_count = self.user_char_count.get(uin, 0)
             emoji_count = self.user_emoji_count.get(uin, 0)
             
-            # 计算平均每小时发言数（假设分析的时间跨度，这里用总消息数估算）
-            # 如果无法准确计算，使用总消息数作为参考
-            total_messages = len(self.messages)
-            if total_messages > 0:
-                # 估算：假设群聊活跃期为30天，每天24小时
-                estimated_hours = 30 * 24
-                messages_per_hour = message_count / estimated_hours if estimated_hours > 0 else 0
-            else:
-                messages_per_hour = 0
+            # 平均每小时发言数（按聊天记录实际覆盖的时间跨度）和活跃天数
+            span_hours = self.time_series.span_hours()
+            messages_per_hour = message_count / span_hours if span_hours > 0 else 0
+            active_days = self.time_series.active_days(uin)
             
             # 情感统计
             positive_count = self.user_positive_count.get(uin, 0)
@@ -989,6 +981,13 @@ class ChatAnalyzer:
                 neutral_ratio = neutral_count / total_sentiment
             else:
                 positive_ratio = negative_ratio = neutral_ratio = 0
+            avg_score = self.user_sentiment_score.get(uin, 0) / total_sentiment if total_sentiment > 0 else 0
+            
+            # 互动最多的群友（回复和@双向合计，前3名）
+            top_partners = []
+            if self.interaction_graph is not None:
+                for partner_uin, weight in self.interaction_graph.top_partners(uin, 3):
+                    top_partners.append({'name': self.get_name(partner_uin), 'count': round(weight, 1)})
             
             # 最常@的群友（前3名）
             at_targets = self.user_at_targets.get(uin, Counter())
@@ -1010,6 +1009,8 @@ class ChatAnalyzer:
                 'char_count': char_count,
                 'avg_chars_per_msg': self.user_char_per_msg.get(uin, 0),
                 'messages_per_hour': round(messages_per_hour, 2),
+                'active_days': active_days,
+                'messages_per_active_day': round(message_count / active_days, 1) if active_days > 0 else 0,
                 'emoji_count': emoji_count,
                 'emoji_usage_rate': round(emoji_count / message_count, 2) if message_count > 0 else 0,
                 'top_emojis': top_emojis,
@@ -1020,8 +1021,10 @@ class ChatAnalyzer:
                     'positive_ratio': round(positive_ratio, 2),
                     'negative_ratio': round(negative_ratio, 2),
                     'neutral_ratio': round(neutral_ratio, 2),
+                    'avg_score': round(avg_score, 3),  # 平均情感分（-1 最负面，1 最正面）
                 },
                 'top_at_targets': top_at_targets,
+                'top_partners': top_partners,
                 'message_samples': user_samples[:5]  # 最多5个样本用于AI举例
             }
             
@@ -1036,15 +1039,4 @@ class ChatAnalyzer:
     
     def _is_filtered_user_by_uin(self, uin):
         """根据uin判断用户是否被过滤"""
-        if not uin:
-            return True
-        
-        name = self.uin_to_name.get(uin, '')
-        if not name:
-            return False
-        
-        for filtered_name in cfg.FILTERED_USERS:
-            if filtered_name in name:
-                return True
-        
-        return False
+        return self.user_filter.is_filtered_uin(uin, self.uin_to_name)
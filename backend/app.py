@@ -14,12 +14,14 @@ import os
 import json
 import uuid
 import base64
+import queue
+import threading
 import requests
-import asyncio
-from typing import List, Dict
+from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, redirect
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -34,11 +36,17 @@ if PROJECT_ROOT not in sys.path:
 
 import config
 import analyzer as analyzer_mod
-from image_generator import ImageGenerator, AIWordSelector
+from image_generator import ImageGenerator, AIWordSelector, AICommentGenerator, wait_for_render_ready, wait_for_layout
 from utils import load_json
+from llm_cache import get_llm_cache
+from word_ranker import LocalWordSelector
+from user_filter import UserFilter
 
 from backend.db_service import DatabaseService
 from backend.json_storage import JSONStorageService
+from backend.temp_janitor import TempFileJanitor
+from backend.browser_pool import get_browser_pool
+from backend.avatar_cache import AvatarCache, collect_report_uins, is_valid_uin
 
 
 app = Flask(__name__)
@@ -79,26 +87,34 @@ else:
         print(f"❌ 存储服务初始化失败: {e}")
         db_service = None
 
+# 后台清理未 finalize 的临时分析文件（TTL + 容量上限）
+temp_janitor = None
+if os.getenv('TEMP_JANITOR_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+    temp_janitor = TempFileJanitor.from_env(os.path.join(PROJECT_ROOT, "runtime_outputs", "temp"))
+    temp_janitor.start()
 
-def generate_ai_comments(selected_word_objects: List[Dict]) -> Dict[str, str]:
+# 头像本地缓存：报告页面和截图都从 /api/avatar/<uin> 读取头像，而不是每次访问 qlogo
+avatar_cache = None
+if os.getenv('AVATAR_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+    avatar_cache = AvatarCache.from_env(os.path.join(PROJECT_ROOT, "runtime_outputs", "avatar_cache"))
+    # get_avatar_url 根据该变量生成头像地址
+    os.environ.setdefault('AVATAR_PROXY_URL', '/api/avatar')
+
+
+def generate_ai_comments(selected_word_objects: List[Dict], on_result=None) -> Dict[str, str]:
     # 使用OpenAI API为每个热词生成犀利的AI锐评
     # 返回: {word: comment} 的字典
+    # on_result(word, comment): 可选回调，每生成一条锐评调用一次（流式推送）
+    # 生成器只构造一次：OpenAI 客户端由 ai_client 进程级共享，出错时直接用同一实例的备用锐评
+    ai_gen = AICommentGenerator()
     try:
-        from image_generator import AICommentGenerator
-        ai_gen = AICommentGenerator()
-        
+        # 未配置 OpenAI 时 generate_batch 直接返回默认锐评
+        comments = ai_gen.generate_batch(selected_word_objects, on_result=on_result)
         if ai_gen.client:
-            comments = ai_gen.generate_batch(selected_word_objects)
             print("✅ AI锐评生成完成")
-            return comments
-        else:
-            print("⚠️ OpenAI未配置，使用默认锐评")
-            return {w['word']: ai_gen._fallback_comment(w['word']) 
-                   for w in selected_word_objects}
+        return comments
     except Exception as e:
         print(f"⚠️ AI锐评生成失败: {e}")
-        from image_generator import AICommentGenerator
-        ai_gen = AICommentGenerator()
         return {w['word']: ai_gen._fallback_comment(w['word']) 
                for w in selected_word_objects}
 
@@ -109,11 +125,52 @@ def health():
     return jsonify({
         "ok": True,
         "services": {
-            "database": db_service is not None
-        }
+            "database": db_service is not None,
+            "temp_janitor": temp_janitor is not None,
+            "avatar_cache": avatar_cache is not None
+        },
+        "temp_files": temp_janitor.get_metrics() if temp_janitor else None,
+        "avatar_cache": avatar_cache.get_stats() if avatar_cache else None,
+        "llm_cache": get_llm_cache().get_stats() if get_llm_cache() else None,
+        "browser_pool": get_browser_pool().get_stats()
     })
 
 
+@app.route("/api/avatar/<uin>", methods=["GET"])
+def get_avatar(uin):
+    """头像代理（磁盘缓存 + ETag 重新验证），缓存不可用时重定向到 qlogo"""
+    if not is_valid_uin(uin):
+        return jsonify({"error": "无效的QQ号"}), 400
+    
+    qlogo_url = f"https://q1.qlogo.cn/g?b=qq&nk={uin}&s=640"
+    if not avatar_cache:
+        return redirect(qlogo_url)
+    
+    cached = avatar_cache.get(uin)
+    if not cached:
+        return redirect(qlogo_url)
+    
+    content, meta = cached
+    etag = f'"{uin}-{int(meta.get("fetched_at", 0))}"'
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304)
+    
+    response = Response(content, mimetype=meta.get('content_type') or 'image/jpeg')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response
+
+
+def prefetch_report_avatars(report: Dict):
+    """截图前同步预取报告中的头像（有上限），保证渲染时头像都已在本地缓存"""
+    if not avatar_cache:
+        return
+    uins = collect_report_uins(report)
+    if uins:
+        avatar_cache.prefetch(uins, wait=True, timeout=float(os.getenv('AVATAR_PREFETCH_WAIT_SECONDS', '15')))
+        print(f"   🖼️ 已预取头像 {len(uins)} 个")
+
+
 def allowed_file(filename):
     """检查文件类型是否允许"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'json'
@@ -170,37 +227,7 @@ def upload_and_analyze():
         
         # 如果是AI自动选词
         if auto_select:
-            print("🤖 启动AI智能选词...")
-            ai_selector = AIWordSelector()
-            
-            if ai_selector.client:
-                # 使用AI从前200个词中智能选择10个
-                selected_word_objects = ai_selector.select_words(all_words, top_n=200)
-                
-                if selected_word_objects:
-                    # 按词频从高到低排序（与手动模式保持一致）
-                    selected_word_objects_sorted = sorted(
-                        selected_word_objects, 
-                        key=lambda w: w['freq'], 
-                        reverse=True
-                    )
-                    selected_words = [w['word'] for w in selected_word_objects_sorted]
-                    print(f"✅ AI选词成功（已按词频排序）: {', '.join(selected_words)}")
-                else:
-                    # AI失败，降级到前10个
-                    print("⚠️ AI选词失败，使用前10个热词")
-                    selected_words = [w['word'] for w in all_words[:10]]
-            else:
-                # AI未配置，使用前10个
-                print("⚠️ OpenAI未配置，使用前10个热词")
-                selected_words = [w['word'] for w in all_words[:10]]
-            
-            result = finalize_report(
-                report_id=report_id,
-                analyzer=analyzer,
-                selected_words=selected_words,
-                auto_mode=True
-            )
+            result = run_auto_pipeline(report_id, analyzer, report)
             # 删除临时文件
             cleanup_temp_files(temp_path)
             return result
@@ -229,6 +256,11 @@ def upload_and_analyze():
                 'user_positive_count': dict(getattr(analyzer, 'user_positive_count', {})),
                 'user_negative_count': dict(getattr(analyzer, 'user_negative_count', {})),
                 'user_neutral_count': dict(getattr(analyzer, 'user_neutral_count', {})),
+                'user_sentiment_score': dict(getattr(analyzer, 'user_sentiment_score', {})),
+                'span_hours': analyzer.time_series.span_hours() if hasattr(analyzer, 'time_series') else 0,
+                'user_active_days': {
+                    uin: analyzer.time_series.active_days(uin) for uin in analyzer.time_series.users
+                } if hasattr(analyzer, 'time_series') else {},
                 # 新增：@目标统计
                 'user_at_targets': {
                     uin: dict(targets) 
@@ -320,34 +352,8 @@ def upload_and_analyze_batch():
             
             # 如果是AI自动选词
             if auto_select:
-                print(f"   🤖 启动AI智能选词...")
-                ai_selector = AIWordSelector()
-                
-                if ai_selector.client:
-                    selected_word_objects = ai_selector.select_words(all_words, top_n=200)
-                    
-                    if selected_word_objects:
-                        selected_word_objects_sorted = sorted(
-                            selected_word_objects, 
-                            key=lambda w: w['freq'], 
-                            reverse=True
-                        )
-                        selected_words = [w['word'] for w in selected_word_objects_sorted]
-                        print(f"   ✅ AI选词成功: {', '.join(selected_words[:5])}...")
-                    else:
-                        print("   ⚠️ AI选词失败，使用前10个热词")
-                        selected_words = [w['word'] for w in all_words[:10]]
-                else:
-                    print("   ⚠️ OpenAI未配置，使用前10个热词")
-                    selected_words = [w['word'] for w in all_words[:10]]
-                
                 # 直接生成报告
-                result_response = finalize_report(
-                    report_id=file_report_id,
-                    analyzer=analyzer,
-                    selected_words=selected_words,
-                    auto_mode=True
-                )
+                result_response = run_auto_pipeline(file_report_id, analyzer, report)
                 
                 # 解析响应获取report_id
                 if hasattr(result_response, 'get_json'):
@@ -398,6 +404,11 @@ def upload_and_analyze_batch():
                         'user_positive_count': dict(getattr(analyzer, 'user_positive_count', {})),
                         'user_negative_count': dict(getattr(analyzer, 'user_negative_count', {})),
                         'user_neutral_count': dict(getattr(analyzer, 'user_neutral_count', {})),
+                        'user_sentiment_score': dict(getattr(analyzer, 'user_sentiment_score', {})),
+                        'span_hours': analyzer.time_series.span_hours() if hasattr(analyzer, 'time_series') else 0,
+                        'user_active_days': {
+                            uin: analyzer.time_series.active_days(uin) for uin in analyzer.time_series.users
+                        } if hasattr(analyzer, 'time_series') else {},
                         # 新增：@目标统计
                         'user_at_targets': {
                             uin: dict(targets) 
@@ -470,206 +481,638 @@ def finalize_report_endpoint():
     print(f"   词汇数量: {len(selected_words)}")
     print(f"{'='*60}\n")
     
+    busy = check_finalize_conflict(report_id)
+    if busy:
+        return busy
+    
     try:
-        # 从临时文件加载分析结果（不需要重新分析！）
-        base_dir = os.path.join(PROJECT_ROOT, "runtime_outputs")
-        temp_dir = os.path.join(base_dir, "temp")
-        result_temp_path = os.path.join(temp_dir, f"{report_id}_result.json")
-        analyzer_data_path = os.path.join(temp_dir, f"{report_id}_analyzer_data.json")
-        
-        if not os.path.exists(result_temp_path):
+        report, restored_analyzer = load_temp_analysis(report_id)
+        if report is None:
             return jsonify({"error": "分析结果已过期，请重新上传"}), 404
+
+        result = finalize_report(
+            report_id=report_id,
+            analyzer=restored_analyzer,  
+            selected_words=selected_words,
+            auto_mode=False,
+            report_data=report
+        )
         
-        print("📂 加载已缓存的分析结果...")
-        with open(result_temp_path, 'r', encoding='utf-8') as f:
-            report = json.load(f)
+        # 清理临时文件
+        cleanup_finalize_temp_files(report_id)
         
-        # 尝试恢复analyzer对象的关键数据，用于生成群友锐评
-        restored_analyzer = None
-        if os.path.exists(analyzer_data_path):
+        return result
+    except Exception as exc:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"生成失败: {exc}"}), 500
+    finally:
+        end_finalize(report_id)
+
+
+# 流式生成的报告在全部AI锐评保存前带有该标记（statistics 中），中途失败的报告据此判断可以重新生成
+GENERATING_KEY = 'generating'
+
+# 正在最终化的报告：同一个 report_id 同时只允许一个最终化流程
+# （流式连接断开后后台线程仍在生成，此时再次提交不能重复创建报告、与清理临时文件竞争）
+_finalizing_reports = set()
+_finalizing_lock = threading.Lock()
+
+
+def check_finalize_conflict(report_id: str):
+    """
+    登记 report_id 开始最终化
+    
+    Returns:
+        None 表示可以开始（结束后必须调用 end_finalize）；
+        否则返回要直接响应的结果：正在生成中为 409，报告已生成则直接返回报告地址
+        （流式生成中途失败留下的未完成报告不算已生成，可以重新生成）
+    """
+    with _finalizing_lock:
+        if report_id in _finalizing_reports:
+            return jsonify({
+                "error": "该报告正在生成中，请稍候",
+                "report_id": report_id,
+                "report_url": f"/report/{report_id}"
+            }), 409
+        _finalizing_reports.add(report_id)
+    
+    try:
+        existing = db_service.get_report(report_id)
+    except Exception:
+        existing = None
+    if existing and (existing.get('statistics') or {}).get(GENERATING_KEY):
+        print(f"♻️ 报告 {report_id} 上次未生成完成，重新生成")
+    elif existing:
+        end_finalize(report_id)
+        return jsonify({
+            "success": True,
+            "report_id": report_id,
+            "report_url": f"/report/{report_id}",
+            "message": "报告已生成"
+        })
+    return None
+
+
+def save_report_row(report_id: str, selected_word_objects: List[Dict], statistics: Dict,
+                    ai_comments: Optional[Dict[str, str]] = None) -> bool:
+    """保存报告，上次未生成完成的同一报告直接覆盖"""
+    if db_service.get_report(report_id):
+        return db_service.update_report(
+            report_id,
+            selected_words=selected_word_objects,
+            statistics=statistics,
+            ai_comments=ai_comments or {}
+        )
+    return db_service.create_report(
+        report_id=report_id,
+        chat_name=statistics['chatName'],
+        message_count=statistics['messageCount'],
+        selected_words=selected_word_objects,
+        statistics=statistics,
+        ai_comments=ai_comments
+    )
+
+
+def end_finalize(report_id: str):
+    with _finalizing_lock:
+        _finalizing_reports.discard(report_id)
+
+
+def format_sse(event: str, data: Dict) -> str:
+    """格式化一条 server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.route("/api/finalize/stream", methods=["POST"])
+def finalize_report_stream_endpoint():
+
+    # 与 /api/finalize 相同，但以 SSE 逐条推送AI锐评：
+    # created（报告已保存，可以打开）→ comment / personality（每完成一条）→ done
+    # 每条结果同时写入存储，中途断开连接也不会丢失已生成的内容
+
+    if not db_service:
+        return jsonify({"error": "数据库服务未初始化"}), 500
+    
+    data = request.json or {}
+    report_id = data.get('report_id')
+    selected_words = data.get('selected_words', [])
+    
+    if not report_id or not selected_words:
+        return jsonify({"error": "缺少必要参数"}), 400
+    
+    print(f"\n{'='*60}")
+    print(f"📝 收到选词确认请求（流式） | Report ID: {report_id}")
+    print(f"   选中词汇: {', '.join(selected_words[:5])}{'...' if len(selected_words) > 5 else ''}")
+    print(f"{'='*60}\n")
+    
+    busy = check_finalize_conflict(report_id)
+    if busy:
+        return busy
+    
+    try:
+        report, restored_analyzer = load_temp_analysis(report_id)
+    except Exception as exc:
+        end_finalize(report_id)
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"生成失败: {exc}"}), 500
+    if report is None:
+        end_finalize(report_id)
+        return jsonify({"error": "分析结果已过期，请重新上传"}), 404
+    
+    events = queue.Queue()
+    
+    def emit(event, payload):
+        events.put((event, payload))
+    
+    def worker():
+        try:
+            stream_finalize_report(report_id, restored_analyzer, selected_words, report, emit)
+        except Exception as exc:
+            import traceback
+            traceback.print_exc()
+            emit('error', {"error": f"生成失败: {exc}"})
+        finally:
+            end_finalize(report_id)
+            events.put(None)
+    
+    # 生成在后台线程中进行，客户端断开后仍会完成并保存
+    threading.Thread(target=worker, name=f'finalize-stream-{report_id[:8]}', daemon=True).start()
+    
+    heartbeat = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+    
+    def generate():
+        while True:
             try:
-                with open(analyzer_data_path, 'r', encoding='utf-8') as f:
-                    analyzer_data = json.load(f)
+                item = events.get(timeout=heartbeat)
+            except queue.Empty:
+                # 心跳注释行，防止代理因空闲断开连接
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield format_sse(*item)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭 nginx 缓冲
+    })
+
+
+def stream_finalize_report(report_id: str, analyzer, selected_words: List[str], report: Dict, emit):
+    """
+    流式最终化报告：先保存不含AI锐评的报告，再随生成进度逐条更新
+    
+    Args:
+        emit: 事件回调 emit(event, payload)
+    """
+    selected_word_objects = build_selected_word_objects(report, selected_words)
+    ai_comments = {}
+    user_personalities = {}
+    statistics = build_report_statistics(report, user_personalities)
+    statistics[GENERATING_KEY] = True
+    save_lock = threading.Lock()
+    save_interval = float(os.getenv('STREAM_SAVE_INTERVAL_SECONDS', '2'))
+    
+    success = save_report_row(report_id, selected_word_objects, statistics)
+    if not success:
+        emit('error', {"error": "保存数据库失败"})
+        return
+    
+    # 报告创建时预取一次头像（打开报告时不再重复预取）
+    if avatar_cache:
+        avatar_cache.prefetch(collect_report_uins({"statistics": statistics}))
+    
+    emit('created', {
+        "report_id": report_id,
+        "report_url": f"/report/{report_id}",
+        "total_words": len(selected_word_objects)
+    })
+    
+    # 回调在 AI 事件循环线程中执行，只记录结果并放入事件队列，不做任何 I/O；
+    # 存储由单独的写入线程合并写入（每 save_interval 秒最多一次），中途断开也不会丢失已生成的内容
+    dirty = threading.Event()
+    finished = threading.Event()
+    
+    def save_snapshot(complete=False):
+        with save_lock:
+            comments_snapshot = dict(ai_comments)
+            statistics_snapshot = dict(statistics, userPersonalities=dict(user_personalities))
+        if complete:
+            # 只有最终结果保存后才去掉未完成标记
+            statistics_snapshot.pop(GENERATING_KEY, None)
+        return db_service.update_report(report_id, statistics=statistics_snapshot, ai_comments=comments_snapshot)
+    
+    def writer():
+        while True:
+            dirty.wait()
+            # 合并这段时间内陆续完成的结果
+            finished.wait(save_interval)
+            if finished.is_set():
+                return
+            dirty.clear()
+            try:
+                save_snapshot()
+            except Exception as e:
+                print(f"⚠️ 保存中间结果失败: {e}")
+    
+    def on_comment(word, comment):
+        with save_lock:
+            ai_comments[word] = comment
+        dirty.set()
+        emit('comment', {"word": word, "comment": comment})
+    
+    def on_personality(entry):
+        with save_lock:
+            user_personalities[entry['name']] = entry
+        dirty.set()
+        emit('personality', entry)
+    
+    def stop_writer():
+        finished.set()
+        dirty.set()
+        writer_thread.join()
+    
+    writer_thread = threading.Thread(target=writer, name=f'finalize-writer-{report_id[:8]}', daemon=True)
+    writer_thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='personality') as executor:
+            personality_future = executor.submit(generate_user_personalities, analyzer, on_personality)
+            final_comments = generate_ai_comments(selected_word_objects, on_result=on_comment)
+            final_personalities = personality_future.result()
+    except Exception:
+        # 出错时先保存已生成的部分，再交给调用方处理
+        stop_writer()
+        save_snapshot()
+        raise
+    stop_writer()
+    
+    # 最终结果为准（包含失败时的备用锐评）
+    with save_lock:
+        ai_comments.update(final_comments)
+        user_personalities.update(final_personalities)
+    if not save_snapshot(complete=True):
+        raise RuntimeError("保存数据库失败")
+    
+    # 创建时只预取了榜单头像，群友锐评的头像生成完成后再预取一次
+    if avatar_cache:
+        avatar_cache.prefetch(collect_report_uins({"statistics": {"userPersonalities": user_personalities}}))
+    
+    cleanup_finalize_temp_files(report_id)
+    
+    emit('done', {
+        "success": True,
+        "report_id": report_id,
+        "report_url": f"/report/{report_id}",
+        "message": "报告已生成",
+        "ai_comments": ai_comments,
+        "user_personalities": user_personalities
+    })
+
+
+def load_temp_analysis(report_id: str):
+    """
+    从临时文件加载上传阶段缓存的分析结果（不需要重新分析！）
+    
+    Returns:
+        (report, restored_analyzer)，分析结果已过期时返回 (None, None)
+    """
+    temp_dir = os.path.join(PROJECT_ROOT, "runtime_outputs", "temp")
+    result_temp_path = os.path.join(temp_dir, f"{report_id}_result.json")
+    analyzer_data_path = os.path.join(temp_dir, f"{report_id}_analyzer_data.json")
+    
+    if not os.path.exists(result_temp_path):
+        return None, None
+    
+    print("📂 加载已缓存的分析结果...")
+    with open(result_temp_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    
+    # 尝试恢复analyzer对象的关键数据，用于生成群友锐评
+    restored_analyzer = None
+    if os.path.exists(analyzer_data_path):
+        try:
+            with open(analyzer_data_path, 'r', encoding='utf-8') as f:
+                analyzer_data = json.load(f)
+            
+            # 创建一个简化的analyzer对象，只包含生成群友锐评需要的数据
+            class RestoredAnalyzer:
+                def __init__(self, data):
+                    from collections import Counter, defaultdict
+                    self.word_contributors = defaultdict(Counter)
+                    for word, contributors in data.get('word_contributors', {}).items():
+                        self.word_contributors[word] = Counter(contributors)
+                    self.user_msg_count = Counter(analyzer_data.get('user_msg_count', {}))
+                    self.user_char_count = Counter(analyzer_data.get('user_char_count', {}))
+                    self.user_char_per_msg = analyzer_data.get('user_char_per_msg', {})
+                    self.uin_to_name = analyzer_data.get('uin_to_name', {})
+                    self.user_filter = UserFilter()
+                    # 新增：情感统计
+                    self.user_positive_count = Counter(analyzer_data.get('user_positive_count', {}))
+                    self.user_negative_count = Counter(analyzer_data.get('user_negative_count', {}))
+                    self.user_neutral_count = Counter(analyzer_data.get('user_neutral_count', {}))
+                    self.user_sentiment_score = Counter(analyzer_data.get('user_sentiment_score', {}))
+                    self.span_hours = analyzer_data.get('span_hours', 0)
+                    self.user_active_days = analyzer_data.get('user_active_days', {})
+                    # 新增：@目标统计
+                    self.user_at_targets = defaultdict(Counter)
+                    for uin, targets in analyzer_data.get('user_at_targets', {}).items():
+                        self.user_at_targets[uin] = Counter(targets)
+                    # 新增：表情统计
+                    self.user_emoji_count = Counter(analyzer_data.get('user_emoji_count', {}))
+                    # 新增：发言样本
+                    self.user_message_samples = defaultdict(list, analyzer_data.get('user_message_samples', {}))
+                    # 新增：总消息数
+                    self.total_messages = analyzer_data.get('total_messages', 0)
                 
-                # 创建一个简化的analyzer对象，只包含生成群友锐评需要的数据
-                class RestoredAnalyzer:
-                    def __init__(self, data):
-                        from collections import Counter, defaultdict
-                        self.word_contributors = defaultdict(Counter)
-                        for word, contributors in data.get('word_contributors', {}).items():
-                            self.word_contributors[word] = Counter(contributors)
-                        self.user_msg_count = Counter(analyzer_data.get('user_msg_count', {}))
-                        self.user_char_count = Counter(analyzer_data.get('user_char_count', {}))
-                        self.user_char_per_msg = analyzer_data.get('user_char_per_msg', {})
-                        self.uin_to_name = analyzer_data.get('uin_to_name', {})
-                        # 新增：情感统计
-                        self.user_positive_count = Counter(analyzer_data.get('user_positive_count', {}))
-                        self.user_negative_count = Counter(analyzer_data.get('user_negative_count', {}))
-                        self.user_neutral_count = Counter(analyzer_data.get('user_neutral_count', {}))
-                        # 新增：@目标统计
-                        self.user_at_targets = defaultdict(Counter)
-                        for uin, targets in analyzer_data.get('user_at_targets', {}).items():
-                            self.user_at_targets[uin] = Counter(targets)
-                        # 新增：表情统计
-                        self.user_emoji_count = Counter(analyzer_data.get('user_emoji_count', {}))
-                        # 新增：发言样本
-                        self.user_message_samples = defaultdict(list, analyzer_data.get('user_message_samples', {}))
-                        # 新增：总消息数
-                        self.total_messages = analyzer_data.get('total_messages', 0)
+                def get_name(self, uin):
+                    return self.uin_to_name.get(uin, f"未知用户({uin})")
+                
+                def get_user_representative_words(self, top_n_users=10, words_per_user=5):
+                    # 复用analyzer.py中的逻辑
+                    from collections import Counter, defaultdict
+                    import config as cfg
+                    from utils import is_emoji
+                    import re
                     
-                    def get_name(self, uin):
-                        return self.uin_to_name.get(uin, f"未知用户({uin})")
+                    user_word_freq = defaultdict(Counter)
                     
-                    def get_user_representative_words(self, top_n_users=10, words_per_user=5):
-                        # 复用analyzer.py中的逻辑
-                        from collections import Counter, defaultdict
-                        import config as cfg
-                        from utils import is_emoji
-                        import re
+                    for word, contributors in self.word_contributors.items():
+                        if word in cfg.FUNCTION_WORDS or word in cfg.BLACKLIST:
+                            continue
+                        if len(word) == 1 and not is_emoji(word):
+                            continue
                         
-                        user_word_freq = defaultdict(Counter)
+                        for uin, count in contributors.items():
+                            if self._is_filtered_user_by_uin(uin):
+                                continue
+                            user_word_freq[uin][word] += count
+                    
+                    top_users = [uin for uin, _ in self.user_msg_count.most_common(top_n_users * 2)]
+                    top_users = [uin for uin in top_users if not self._is_filtered_user_by_uin(uin)][:top_n_users]
+                    
+                    result = []
+                    for uin in top_users:
+                        user_words = user_word_freq.get(uin, Counter())
+                        if not user_words:
+                            continue
                         
-                        for word, contributors in self.word_contributors.items():
+                        selected_words = []
+                        for word, count in user_words.most_common(words_per_user * 3):
                             if word in cfg.FUNCTION_WORDS or word in cfg.BLACKLIST:
                                 continue
                             if len(word) == 1 and not is_emoji(word):
                                 continue
+                            if re.match(r'^[\d\W]+$', word) and not is_emoji(word):
+                                continue
                             
-                            for uin, count in contributors.items():
-                                if self._is_filtered_user_by_uin(uin):
-                                    continue
-                                user_word_freq[uin][word] += count
+                            selected_words.append({'word': word, 'count': count})
+                            if len(selected_words) >= words_per_user:
+                                break
                         
-                        top_users = [uin for uin, _ in self.user_msg_count.most_common(top_n_users * 2)]
-                        top_users = [uin for uin in top_users if not self._is_filtered_user_by_uin(uin)][:top_n_users]
+                        if not selected_words:
+                            continue
                         
-                        result = []
-                        for uin in top_users:
-                            user_words = user_word_freq.get(uin, Counter())
-                            if not user_words:
-                                continue
-                            
-                            selected_words = []
-                            for word, count in user_words.most_common(words_per_user * 3):
-                                if word in cfg.FUNCTION_WORDS or word in cfg.BLACKLIST:
-                                    continue
-                                if len(word) == 1 and not is_emoji(word):
-                                    continue
-                                if re.match(r'^[\d\W]+$', word) and not is_emoji(word):
-                                    continue
-                                
-                                selected_words.append({'word': word, 'count': count})
-                                if len(selected_words) >= words_per_user:
-                                    break
-                            
-                            if not selected_words:
-                                continue
-                            
-                            # 计算统计数据（与analyzer.py中的逻辑保持一致）
-                            message_count = self.user_msg_count.get(uin, 0)
-                            char_count = self.user_char_count.get(uin, 0)
-                            emoji_count = self.user_emoji_count.get(uin, 0)
-                            
-                            # 计算平均每小时发言数
-                            estimated_hours = 30 * 24  # 假设30天
-                            messages_per_hour = message_count / estimated_hours if estimated_hours > 0 else 0
-                            
-                            # 情感统计
-                            positive_count = self.user_positive_count.get(uin, 0)
-                            negative_count = self.user_negative_count.get(uin, 0)
-                            neutral_count = self.user_neutral_count.get(uin, 0)
-                            total_sentiment = positive_count + negative_count + neutral_count
-                            if total_sentiment > 0:
-                                positive_ratio = positive_count / total_sentiment
-                                negative_ratio = negative_count / total_sentiment
-                                neutral_ratio = neutral_count / total_sentiment
-                            else:
-                                positive_ratio = negative_ratio = neutral_ratio = 0
-                            
-                            # 最常@的群友
-                            at_targets = self.user_at_targets.get(uin, Counter())
-                            top_at_targets = []
-                            for target_uin, count in at_targets.most_common(3):
-                                target_name = self.get_name(target_uin)
-                                top_at_targets.append({'name': target_name, 'count': count})
-                            
-                            # 发言样本
-                            message_samples = self.user_message_samples.get(uin, [])[:5]
-                            
-                            user_stats = {
-                                'message_count': message_count,
-                                'char_count': char_count,
-                                'avg_chars_per_msg': self.user_char_per_msg.get(uin, 0),
-                                'messages_per_hour': round(messages_per_hour, 2),
-                                'emoji_count': emoji_count,
-                                'emoji_usage_rate': round(emoji_count / message_count, 2) if message_count > 0 else 0,
-                                'sentiment': {
-                                    'positive_count': positive_count,
-                                    'negative_count': negative_count,
-                                    'neutral_count': neutral_count,
-                                    'positive_ratio': round(positive_ratio, 2),
-                                    'negative_ratio': round(negative_ratio, 2),
-                                    'neutral_ratio': round(neutral_ratio, 2),
-                                },
-                                'top_at_targets': top_at_targets,
-                                'message_samples': message_samples
-                            }
-                            
-                            result.append({
-                                'name': self.get_name(uin),
-                                'uin': uin,
-                                'words': selected_words,
-                                'stats': user_stats
-                            })
+                        # 计算统计数据（与analyzer.py中的逻辑保持一致）
+                        message_count = self.user_msg_count.get(uin, 0)
+                        char_count = self.user_char_count.get(uin, 0)
+                        emoji_count = self.user_emoji_count.get(uin, 0)
+                        
+                        # 计算平均每小时发言数（旧的临时数据没有时间跨度时按30天估算）
+                        span_hours = self.span_hours or 30 * 24
+                        messages_per_hour = message_count / span_hours
+                        active_days = self.user_active_days.get(uin, 0)
+                        
+                        # 情感统计
+                        positive_count = self.user_positive_count.get(uin, 0)
+                        negative_count = self.user_negative_count.get(uin, 0)
+                        neutral_count = self.user_neutral_count.get(uin, 0)
+                        total_sentiment = positive_count + negative_count + neutral_count
+                        if total_sentiment > 0:
+                            positive_ratio = positive_count / total_sentiment
+                            negative_ratio = negative_count / total_sentiment
+                            neutral_ratio = neutral_count / total_sentiment
+                        else:
+                            positive_ratio = negative_ratio = neutral_ratio = 0
+                        avg_score = self.user_sentiment_score.get(uin, 0) / total_sentiment if total_sentiment > 0 else 0
+                        
+                        # 最常@的群友
+                        at_targets = self.user_at_targets.get(uin, Counter())
+                        top_at_targets = []
+                        for target_uin, count in at_targets.most_common(3):
+                            target_name = self.get_name(target_uin)
+                            top_at_targets.append({'name': target_name, 'count': count})
+                        
+                        # 发言样本
+                        message_samples = self.user_message_samples.get(uin, [])[:5]
+                        
+                        user_stats = {
+                            'message_count': message_count,
+                            'char_count': char_count,
+                            'avg_chars_per_msg': self.user_char_per_msg.get(uin, 0),
+                            'messages_per_hour': round(messages_per_hour, 2),
+                            'active_days': active_days,
+                            'messages_per_active_day': round(message_count / active_days, 1) if active_days > 0 else 0,
+                            'emoji_count': emoji_count,
+                            'emoji_usage_rate': round(emoji_count / message_count, 2) if message_count > 0 else 0,
+                            'sentiment': {
+                                'positive_count': positive_count,
+                                'negative_count': negative_count,
+                                'neutral_count': neutral_count,
+                                'positive_ratio': round(positive_ratio, 2),
+                                'negative_ratio': round(negative_ratio, 2),
+                                'neutral_ratio': round(neutral_ratio, 2),
+                                'avg_score': round(avg_score, 3),
+                            },
+                            'top_at_targets': top_at_targets,
+                            'message_samples': message_samples
+                        }
                         
-                        return result
+                        result.append({
+                            'name': self.get_name(uin),
+                            'uin': uin,
+                            'words': selected_words,
+                            'stats': user_stats
+                        })
                     
-                    def _is_filtered_user_by_uin(self, uin):
-                        if not uin:
-                            return True
-                        name = self.uin_to_name.get(uin, '')
-                        if not name:
-                            return False
-                        import config as cfg
-                        for filtered_name in cfg.FILTERED_USERS:
-                            if filtered_name in name:
-                                return True
-                        return False
+                    return result
                 
-                restored_analyzer = RestoredAnalyzer(analyzer_data)
-                print("✅ 已恢复analyzer数据，可用于生成群友锐评")
-            except Exception as e:
-                print(f"⚠️ 恢复analyzer数据失败: {e}")
-                import traceback
-                traceback.print_exc()
+                def _is_filtered_user_by_uin(self, uin):
+                    return self.user_filter.is_filtered_uin(uin, self.uin_to_name)
+            
+            restored_analyzer = RestoredAnalyzer(analyzer_data)
+            print("✅ 已恢复analyzer数据，可用于生成群友锐评")
+        except Exception as e:
+            print(f"⚠️ 恢复analyzer数据失败: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    return report, restored_analyzer
 
-        result = finalize_report(
-            report_id=report_id,
-            analyzer=restored_analyzer,  
-            selected_words=selected_words,
-            auto_mode=False,
-            report_data=report
+
+def cleanup_finalize_temp_files(report_id: str):
+    """报告保存后清理上传阶段留下的临时文件"""
+    temp_dir = os.path.join(PROJECT_ROOT, "runtime_outputs", "temp")
+    for name in (f"{report_id}_result.json", f"{report_id}_analyzer_data.json", f"{report_id}.json"):
+        path = os.path.join(temp_dir, name)
+        if os.path.exists(path):
+            cleanup_temp_files(path)
+
+
+def auto_select_words(all_words: List[Dict], analyzer=None) -> List[str]:
+    """AI自动选词，AI未配置或失败时使用本地选词引擎"""
+    print("🤖 启动AI智能选词...")
+    ai_selector = AIWordSelector()
+    
+    selected_word_objects = None
+    if ai_selector.client:
+        # 使用AI从前200个词中智能选择10个
+        selected_word_objects = ai_selector.select_words(all_words, top_n=200, analyzer=analyzer)
+        if not selected_word_objects:
+            print("⚠️ AI选词失败，改用本地选词")
+    else:
+        print("⚠️ OpenAI未配置，使用本地选词")
+    
+    if not selected_word_objects:
+        # 按突发性、参与度、独特性、新颖性打分，不需要网络
+        selected_word_objects = LocalWordSelector(analyzer).select_words(all_words, top_n=200)
+    
+    if not selected_word_objects:
+        # 兜底：直接取词频最高的10个，保证最终化时有可用的选词
+        print("⚠️ 本地选词没有结果，改用词频前10")
+        selected_word_objects = sorted(all_words, key=lambda w: w['freq'], reverse=True)[:10]
+    
+    # 按词频从高到低排序（与手动模式保持一致）
+    selected_word_objects_sorted = sorted(
+        selected_word_objects, 
+        key=lambda w: w['freq'], 
+        reverse=True
+    )
+    selected_words = [w['word'] for w in selected_word_objects_sorted]
+    print(f"✅ 选词完成（已按词频排序）: {', '.join(selected_words)}")
+    return selected_words
+
+
+def build_selected_word_objects(report: Dict, selected_words: List[str]) -> List[Dict]:
+    """转换selected_words为详细对象"""
+    all_words = {w['word']: w for w in report.get('topWords', [])}
+    selected_word_objects = []
+    for word in selected_words:
+        if word in all_words:
+            selected_word_objects.append(all_words[word])
+        else:
+            selected_word_objects.append({"word": word, "freq": 0, "samples": []})
+    return selected_word_objects
+
+
+def build_personality_entry(user: Dict, comment: str) -> Dict:
+    """群友锐评条目（保存到 statistics.userPersonalities）"""
+    return {
+        'name': user['name'],
+        'uin': user.get('uin', ''),
+        'words': user['words'],
+        'stats': user.get('stats', {}),
+        'personality_comment': comment
+    }
+
+
+def generate_user_personalities(analyzer, on_result=None) -> Dict[str, Dict]:
+    """
+    生成群友性格和用词锐评，返回 {name: {...}}
+    
+    on_result(entry): 可选回调，每生成一位群友的锐评调用一次（流式推送）
+    """
+    user_personalities = {}
+    if not analyzer:
+        return user_personalities
+    try:
+        from image_generator import AIUserPersonalityGenerator
+        user_representative_words = analyzer.get_user_representative_words(
+            top_n_users=10, 
+            words_per_user=5
         )
-        
-        # 清理临时文件
-        original_json_path = os.path.join(temp_dir, f"{report_id}.json")
-        analyzer_data_path = os.path.join(temp_dir, f"{report_id}_analyzer_data.json")
-        cleanup_temp_files(result_temp_path)
-        cleanup_temp_files(analyzer_data_path)
-        if os.path.exists(original_json_path):
-            cleanup_temp_files(original_json_path)
-        
-        return result
-    except Exception as exc:
+        if user_representative_words:
+            ai_personality_gen = AIUserPersonalityGenerator()
+            if ai_personality_gen.client:
+                users_by_name = {u['name']: u for u in user_representative_words}
+                handle_result = None
+                if on_result:
+                    handle_result = lambda name, comment: on_result(build_personality_entry(users_by_name[name], comment))
+                user_personalities_comments = ai_personality_gen.generate_batch(
+                    user_representative_words, on_result=handle_result
+                )
+                # 转换为字典格式，包含完整信息
+                user_personalities = {
+                    u['name']: build_personality_entry(u, user_personalities_comments.get(u['name'], ''))
+                    for u in user_representative_words
+                }
+            else:
+                # AI未启用，使用默认锐评
+                user_personalities = {
+                    u['name']: build_personality_entry(u, ai_personality_gen._fallback_comment(u['name'], u['words']))
+                    for u in user_representative_words
+                }
+                if on_result:
+                    for entry in user_personalities.values():
+                        on_result(entry)
+    except Exception as e:
+        print(f"⚠️ 生成群友锐评失败: {e}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": f"生成失败: {exc}"}), 500
+    return user_personalities
+
+
+def run_auto_pipeline(report_id: str, analyzer, report: Dict):
+    """
+    AI自动选词流水线
+    
+    群友锐评只依赖用户统计，不依赖选词结果，因此在后台线程中立即开始生成，
+    与 AI选词 → 热词锐评 这条链并行，最后一起保存。
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='personality') as executor:
+        personality_future = executor.submit(generate_user_personalities, analyzer)
+        
+        try:
+            selected_words = auto_select_words(report.get('topWords', [])[:100], analyzer)
+            selected_word_objects = build_selected_word_objects(report, selected_words)
+            ai_comments = generate_ai_comments(selected_word_objects)
+        finally:
+            # 无论选词链是否出错，都等待后台线程结束
+            user_personalities = personality_future.result()
+    
+    return finalize_report(
+        report_id=report_id,
+        analyzer=analyzer,
+        selected_words=selected_words,
+        auto_mode=True,
+        report_data=report,
+        ai_comments=ai_comments,
+        user_personalities=user_personalities
+    )
+
+
+def build_report_statistics(report: Dict, user_personalities: Dict[str, Dict]) -> Dict:
+    """提取关键统计数据（只保留前端展示需要的）"""
+    return {
+        "chatName": report.get('chatName'),
+        "messageCount": report.get('messageCount'),
+        "rankings": report.get('rankings', {}),
+        "timeDistribution": report.get('timeDistribution', {}),
+        "hourDistribution": report.get('hourDistribution', {}),
+        "monthlyDistribution": report.get('monthlyDistribution', {}),
+        "dateRange": report.get('dateRange', {}),
+        "interactions": report.get('interactions', {}),
+        "userPersonalities": user_personalities  # 添加群友锐评数据
+    }
 
 
 def finalize_report(report_id: str, analyzer, selected_words: List[str], 
-                   auto_mode: bool = False, report_data: Dict = None):
+                   auto_mode: bool = False, report_data: Dict = None,
+                   ai_comments: Dict[str, str] = None, user_personalities: Dict[str, Dict] = None):
 
     # 步骤5-7: 选词 + AI锐评 + 保存MySQL（只存关键数据）
+    # ai_comments / user_personalities 已提前生成时直接使用
 
     try:
         if report_data is None:
@@ -677,82 +1120,35 @@ def finalize_report(report_id: str, analyzer, selected_words: List[str],
         else:
             report = report_data
         
-        # 转换selected_words为详细对象
-        all_words = {w['word']: w for w in report.get('topWords', [])}
-        selected_word_objects = []
-        for word in selected_words:
-            if word in all_words:
-                selected_word_objects.append(all_words[word])
-            else:
-                selected_word_objects.append({"word": word, "freq": 0, "samples": []})
-        
-        # 生成AI锐评（传入字典列表）
-        ai_comments = generate_ai_comments(selected_word_objects)
+        selected_word_objects = build_selected_word_objects(report, selected_words)
         
-        # 生成群友性格和用词锐评
-        user_personalities = {}
-        if analyzer:
-            try:
-                from image_generator import AIUserPersonalityGenerator
-                user_representative_words = analyzer.get_user_representative_words(
-                    top_n_users=10, 
-                    words_per_user=5
-                )
-                if user_representative_words:
-                    ai_personality_gen = AIUserPersonalityGenerator()
-                    if ai_personality_gen.client:
-                        user_personalities_comments = ai_personality_gen.generate_batch(user_representative_words)
-                        # 转换为字典格式，包含完整信息
-                        user_personalities = {
-                            u['name']: {
-                                'name': u['name'],
-                                'uin': u.get('uin', ''),
-                                'words': u['words'],
-                                'stats': u.get('stats', {}),
-                                'personality_comment': user_personalities_comments.get(u['name'], '')
-                            }
-                            for u in user_representative_words
-                        }
-                    else:
-                        # AI未启用，使用默认锐评
-                        user_personalities = {
-                            u['name']: {
-                                'name': u['name'],
-                                'uin': u.get('uin', ''),
-                                'words': u['words'],
-                                'stats': u.get('stats', {}),
-                                'personality_comment': ai_personality_gen._fallback_comment(u['name'], u['words'])
-                            }
-                            for u in user_representative_words
-                        }
-            except Exception as e:
-                print(f"⚠️ 生成群友锐评失败: {e}")
-                import traceback
-                traceback.print_exc()
+        # 热词锐评和群友锐评互不依赖：群友锐评在后台线程生成，同时生成热词锐评
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='personality') as executor:
+            personality_future = None
+            if user_personalities is None:
+                personality_future = executor.submit(generate_user_personalities, analyzer)
+            
+            # 生成AI锐评（传入字典列表）
+            if ai_comments is None:
+                ai_comments = generate_ai_comments(selected_word_objects)
+            
+            # 生成群友性格和用词锐评
+            if personality_future:
+                user_personalities = personality_future.result()
         
         # 提取关键统计数据（只保留前端展示需要的）
-        statistics = {
-            "chatName": report.get('chatName'),
-            "messageCount": report.get('messageCount'),
-            "rankings": report.get('rankings', {}),
-            "timeDistribution": report.get('timeDistribution', {}),
-            "hourDistribution": report.get('hourDistribution', {}),
-            "userPersonalities": user_personalities  # 添加群友锐评数据
-        }
+        statistics = build_report_statistics(report, user_personalities)
         
         # 保存到MySQL（只保存关键数据）
-        success = db_service.create_report(
-            report_id=report_id,
-            chat_name=statistics['chatName'],
-            message_count=statistics['messageCount'],
-            selected_words=selected_word_objects,
-            statistics=statistics,
-            ai_comments=ai_comments
-        )
+        success = save_report_row(report_id, selected_word_objects, statistics, ai_comments)
         
         if not success:
             return jsonify({"error": "保存数据库失败"}), 500
         
+        # 报告生成后立即在后台预取头像，首次打开报告时不再逐个访问 qlogo
+        if avatar_cache:
+            avatar_cache.prefetch(collect_report_uins({"statistics": statistics}))
+        
         return jsonify({
             "success": True,
             "report_id": report_id,
@@ -938,6 +1334,7 @@ def generate_personality_image(report_id):
         
         # 生成新图片
         print(f"🖼️ 开始生成群友分析图片: {report_id} (格式: {image_format})")
+        prefetch_report_avatars(report)
         
         # 构建前端URL（使用HTTP访问，与年度报告一致）
         frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
@@ -950,12 +1347,13 @@ def generate_personality_image(report_id):
         # 使用 playwright 生成图片（群友分析使用1000px宽度，避免触发媒体查询的单列布局）
         # 注意：页面内容宽度是900px，但视口需要>950px才能保持两列布局
         # 使用device_scale_factor=3提高清晰度（与image_generator.py中的设置一致）
-        image_data = asyncio.run(generate_image_with_playwright(
+        image_data = get_browser_pool().render(
+            generate_image_with_playwright,
             personality_url, 
             viewport_width=1000,  # 设置为1000px，大于950px媒体查询断点，确保两列布局
             viewport_height=1200, 
             device_scale_factor=3  # 提高到3倍，确保高清截图
-        ))
+        )
         
         if not image_data:
             return jsonify({"error": "图片生成失败"}), 500
@@ -1034,6 +1432,7 @@ def generate_report_image(report_id):
         
         # 生成新图片
         print(f"🖼️ 开始生成图片: {report_id} (模板: {template_id}, 格式: {image_format})")
+        prefetch_report_avatars(report)
         
         # 构建前端URL
         frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:5173')
@@ -1043,13 +1442,14 @@ def generate_report_image(report_id):
         if image_format == 'for_share':
             report_url += '?mode=share'
         
-        # 使用 playwright 生成图片（年度报告使用450px宽度）
-        image_data = asyncio.run(generate_image_with_playwright(
+        # 使用常驻浏览器池生成图片（年度报告使用450px宽度）
+        image_data = get_browser_pool().render(
+            generate_image_with_playwright,
             report_url,
             viewport_width=450,
             viewport_height=800,
             device_scale_factor=2
-        ))
+        )
         
         if not image_data:
             return jsonify({"error": "图片生成失败"}), 500
@@ -1072,16 +1472,16 @@ def generate_report_image(report_id):
         return jsonify({"error": f"生成失败: {exc}"}), 500
 
 
-async def generate_image_with_playwright(url, viewport_width=450, viewport_height=800, device_scale_factor=2):
+async def generate_image_with_playwright(page, url, viewport_width=450, viewport_height=800):
     """
-    使用 Playwright 无头浏览器生成图片
+    在浏览器池提供的页面中渲染并截图
     返回 base64 编码的图片数据
     
     Args:
+        page: 浏览器池分配的页面（已设置视口和设备缩放）
         url: 要访问的URL
         viewport_width: 视口宽度（默认450，群友分析使用900）
         viewport_height: 视口高度（默认800）
-        device_scale_factor: 设备缩放因子（默认2）
     """
     # 强制布局的JavaScript代码（用于群友分析的两列布局）
     force_layout_js = """
@@ -1139,485 +1539,429 @@ async def generate_image_with_playwright(url, viewport_width=450, viewport_heigh
     debug_log('app.py:813', 'generate_image_with_playwright called', {'url': url, 'viewport_width': viewport_width, 'viewport_height': viewport_height}, 'A')
     # #endregion
     
-    try:
-        from playwright.async_api import async_playwright
-    except ImportError:
-        print("❌ 需要安装 Playwright: pip install playwright && playwright install chromium")
-        return None
+    # #region agent log
+    debug_log('app.py:840', 'Page created with viewport', {'viewport_width': viewport_width, 'viewport_height': viewport_height}, 'C')
+    # #endregion
     
-    try:
-        async with async_playwright() as p:
-            # 启动浏览器
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
-            
-            # 创建页面，设置视口和设备缩放
-            # 注意：对于群友分析（900px），需要确保视口宽度足够大，避免触发媒体查询
-            page = await browser.new_page(
-                viewport={'width': viewport_width, 'height': viewport_height},
-                device_scale_factor=device_scale_factor
-            )
-            
-            # #region agent log
-            debug_log('app.py:840', 'Page created with viewport', {'viewport_width': viewport_width, 'viewport_height': viewport_height}, 'C')
-            # #endregion
-            
-            # 设置用户代理，确保CSS媒体查询正确工作
-            await page.set_extra_http_headers({
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            })
-            
-            print(f"   🌐 访问: {url} (视口宽度: {viewport_width}px)")
-            await page.goto(url, wait_until='networkidle', timeout=30000)
-            
-            # #region agent log
-            actual_viewport = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
-            debug_log('app.py:851', 'After page.goto - actual viewport', actual_viewport, 'C')
-            # #endregion
-            
-            # 确保视口宽度正确（特别是对于群友分析的900px）
-            await page.set_viewport_size({'width': viewport_width, 'height': viewport_height})
-            
-            # #region agent log
-            actual_viewport_after = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
-            debug_log('app.py:854', 'After set_viewport_size - actual viewport', actual_viewport_after, 'C')
-            # #endregion
-            
-            # 等待内容渲染
-            await page.wait_for_timeout(3000)
-            
-            # 对于群友分析（viewport_width >= 900），强制覆盖CSS以确保两列布局
-            if viewport_width >= 900:
-                try:
-                    result = await page.evaluate(force_layout_js)
-                    if result:
-                        print(f"   🔧 强制布局设置成功")
-                    await page.wait_for_timeout(500)
-                except Exception as e:
-                    print(f"   ⚠️ 强制布局设置失败: {e}")
-                    await page.wait_for_timeout(500)
+    print(f"   🌐 访问: {url} (视口宽度: {viewport_width}px)")
+    await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+    
+    # #region agent log
+    actual_viewport = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
+    debug_log('app.py:851', 'After page.goto - actual viewport', actual_viewport, 'C')
+    # #endregion
+    
+    # 确保视口宽度正确（特别是对于群友分析的900px）
+    await page.set_viewport_size({'width': viewport_width, 'height': viewport_height})
+    
+    # #region agent log
+    actual_viewport_after = await page.evaluate('() => ({width: window.innerWidth, height: window.innerHeight})')
+    debug_log('app.py:854', 'After set_viewport_size - actual viewport', actual_viewport_after, 'C')
+    # #endregion
+    
+    # 等待前端设置渲染就绪标志（数据、字体、头像加载完成），代替固定延时
+    await wait_for_render_ready(page)
+    
+    # 对于群友分析（viewport_width >= 900），强制覆盖CSS以确保两列布局
+    if viewport_width >= 900:
+        try:
+            result = await page.evaluate(force_layout_js)
+            if result:
+                print(f"   🔧 强制布局设置成功")
+        except Exception as e:
+            print(f"   ⚠️ 强制布局设置失败: {e}")
+        await wait_for_layout(page)
+        
+        # #region agent log
+        forced_layout = await page.evaluate("""
+            () => {
+                const body = document.body;
+                const reportContainer = document.querySelector('.report-container');
+                const userSection = document.querySelector('.user-section');
+                return {
+                    bodyWidth: body.offsetWidth,
+                    containerWidth: reportContainer?.offsetWidth || 0,
+                    userSectionGrid: userSection ? window.getComputedStyle(userSection).gridTemplateColumns : 'none'
+                };
+            }
+        """)
+        debug_log('app.py:875', 'After forcing layout - dimensions', forced_layout, 'A')
+        print(f"   🔧 强制布局后 - Body宽度: {forced_layout.get('bodyWidth')}px, 容器宽度: {forced_layout.get('containerWidth')}px, Grid: {forced_layout.get('userSectionGrid')}")
+        # #endregion
+    
+    # 验证布局是否正确（对于群友分析，检查是否为两列）
+    if viewport_width >= 900:
+        layout_check = await page.evaluate("""
+            () => {
+                const userSection = document.querySelector('.user-section');
+                const body = document.body;
+                const reportContainer = document.querySelector('.report-container');
+                const personalityContent = document.querySelector('.personality-content');
                 
-                # #region agent log
-                forced_layout = await page.evaluate("""
-                    () => {
-                        const body = document.body;
-                        const reportContainer = document.querySelector('.report-container');
-                        const userSection = document.querySelector('.user-section');
-                        return {
-                            bodyWidth: body.offsetWidth,
-                            containerWidth: reportContainer?.offsetWidth || 0,
-                            userSectionGrid: userSection ? window.getComputedStyle(userSection).gridTemplateColumns : 'none'
-                        };
-                    }
-                """)
-                debug_log('app.py:875', 'After forcing layout - dimensions', forced_layout, 'A')
-                print(f"   🔧 强制布局后 - Body宽度: {forced_layout.get('bodyWidth')}px, 容器宽度: {forced_layout.get('containerWidth')}px, Grid: {forced_layout.get('userSectionGrid')}")
-                # #endregion
-            
-            # 验证布局是否正确（对于群友分析，检查是否为两列）
-            if viewport_width >= 900:
-                layout_check = await page.evaluate("""
-                    () => {
-                        const userSection = document.querySelector('.user-section');
-                        const body = document.body;
-                        const reportContainer = document.querySelector('.report-container');
-                        const personalityContent = document.querySelector('.personality-content');
-                        
-                        if (userSection) {
-                            const computedStyle = window.getComputedStyle(userSection);
-                            const bodyStyle = window.getComputedStyle(body);
-                            const containerStyle = reportContainer ? window.getComputedStyle(reportContainer) : null;
-                            const contentStyle = personalityContent ? window.getComputedStyle(personalityContent) : null;
-                            
-                            const gridColumns = computedStyle.gridTemplateColumns;
-                            const display = computedStyle.display;
-                            const viewportWidth = window.innerWidth;
-                            const containerWidth = reportContainer?.offsetWidth || 0;
-                            const bodyWidth = body.offsetWidth;
-                            const contentWidth = personalityContent?.offsetWidth || 0;
-                            
-                            // 检查媒体查询是否匹配
-                            const mediaQuery = window.matchMedia('(max-width: 950px)');
-                            
-                            return {
-                                hasUserSection: true,
-                                display: display,
-                                gridColumns: gridColumns,
-                                viewportWidth: viewportWidth,
-                                containerWidth: containerWidth,
-                                bodyWidth: bodyWidth,
-                                contentWidth: contentWidth,
-                                bodyMaxWidth: bodyStyle.maxWidth,
-                                containerMaxWidth: containerStyle?.maxWidth || 'none',
-                                contentMaxWidth: contentStyle?.maxWidth || 'none',
-                                mediaQueryMatches: mediaQuery.matches,
-                                isTwoColumn: gridColumns.includes('1fr 1fr') || (gridColumns.split(' ').length >= 2 && !gridColumns.includes('1fr'))
-                            };
-                        }
-                        return { hasUserSection: false };
+                if (userSection) {
+                    const computedStyle = window.getComputedStyle(userSection);
+                    const bodyStyle = window.getComputedStyle(body);
+                    const containerStyle = reportContainer ? window.getComputedStyle(reportContainer) : null;
+                    const contentStyle = personalityContent ? window.getComputedStyle(personalityContent) : null;
+                    
+                    const gridColumns = computedStyle.gridTemplateColumns;
+                    const display = computedStyle.display;
+                    const viewportWidth = window.innerWidth;
+                    const containerWidth = reportContainer?.offsetWidth || 0;
+                    const bodyWidth = body.offsetWidth;
+                    const contentWidth = personalityContent?.offsetWidth || 0;
+                    
+                    // 检查媒体查询是否匹配
+                    const mediaQuery = window.matchMedia('(max-width: 950px)');
+                    
+                    return {
+                        hasUserSection: true,
+                        display: display,
+                        gridColumns: gridColumns,
+                        viewportWidth: viewportWidth,
+                        containerWidth: containerWidth,
+                        bodyWidth: bodyWidth,
+                        contentWidth: contentWidth,
+                        bodyMaxWidth: bodyStyle.maxWidth,
+                        containerMaxWidth: containerStyle?.maxWidth || 'none',
+                        contentMaxWidth: contentStyle?.maxWidth || 'none',
+                        mediaQueryMatches: mediaQuery.matches,
+                        isTwoColumn: gridColumns.includes('1fr 1fr') || (gridColumns.split(' ').length >= 2 && !gridColumns.includes('1fr'))
+                    };
+                }
+                return { hasUserSection: false };
+            }
+        """)
+        print(f"   📐 布局检查: {layout_check}")
+        
+        # #region agent log
+        debug_log('app.py:861', 'Layout check result', layout_check, 'A')
+        debug_log('app.py:861', 'Layout check result', layout_check, 'B')
+        debug_log('app.py:861', 'Layout check result', layout_check, 'D')
+        debug_log('app.py:861', 'Layout check result', layout_check, 'E')
+        # #endregion
+        
+        if layout_check.get('hasUserSection'):
+            if layout_check.get('isTwoColumn'):
+                print(f"   ✅ 确认: 群友分析页面已正确显示为两列布局")
+            else:
+                print(f"   ⚠️ 警告: 群友分析页面未显示为两列布局")
+                print(f"      视口宽度: {layout_check.get('viewportWidth')}px")
+                print(f"      容器宽度: {layout_check.get('containerWidth')}px")
+                print(f"      Body宽度: {layout_check.get('bodyWidth')}px")
+                print(f"      Content宽度: {layout_check.get('contentWidth')}px")
+                print(f"      媒体查询匹配: {layout_check.get('mediaQueryMatches')}")
+                print(f"      Grid列设置: {layout_check.get('gridColumns')}")
+                print(f"      显示模式: {layout_check.get('display')}")
+    
+    # 隐藏保存按钮（如果存在）
+    await page.evaluate("""
+        () => {
+            const saveButton = document.querySelector('.save-button');
+            if (saveButton) {
+                saveButton.style.display = 'none';
+            }
+        }
+    """)
+    
+    # 等待布局稳定（特别是grid布局）
+    await wait_for_layout(page)
+    
+    # 获取实际高度（只计算实际内容的高度，不包括多余的空白）
+    height = await page.evaluate("""
+        () => {
+            // 获取report-container的实际内容高度（这是实际内容区域）
+            const reportContainer = document.querySelector('.report-container');
+            if (reportContainer) {
+                // 获取容器内最后一个有内容的元素
+                const children = Array.from(reportContainer.children);
+                let lastElement = null;
+                for (let i = children.length - 1; i >= 0; i--) {
+                    const elem = children[i];
+                    // 跳过隐藏元素和空白元素
+                    const style = window.getComputedStyle(elem);
+                    if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
+                        lastElement = elem;
+                        break;
                     }
-                """)
-                print(f"   📐 布局检查: {layout_check}")
+                }
                 
-                # #region agent log
-                debug_log('app.py:861', 'Layout check result', layout_check, 'A')
-                debug_log('app.py:861', 'Layout check result', layout_check, 'B')
-                debug_log('app.py:861', 'Layout check result', layout_check, 'D')
-                debug_log('app.py:861', 'Layout check result', layout_check, 'E')
-                # #endregion
+                if (lastElement) {
+                    // 计算从容器顶部到最后一个元素底部的距离
+                    const containerTop = reportContainer.offsetTop;
+                    const lastElementBottom = lastElement.offsetTop + lastElement.offsetHeight;
+                    const contentHeight = lastElementBottom - containerTop + 50; // 加50px底部边距
+                    return contentHeight;
+                }
                 
-                if layout_check.get('hasUserSection'):
-                    if layout_check.get('isTwoColumn'):
-                        print(f"   ✅ 确认: 群友分析页面已正确显示为两列布局")
-                    else:
-                        print(f"   ⚠️ 警告: 群友分析页面未显示为两列布局")
-                        print(f"      视口宽度: {layout_check.get('viewportWidth')}px")
-                        print(f"      容器宽度: {layout_check.get('containerWidth')}px")
-                        print(f"      Body宽度: {layout_check.get('bodyWidth')}px")
-                        print(f"      Content宽度: {layout_check.get('contentWidth')}px")
-                        print(f"      媒体查询匹配: {layout_check.get('mediaQueryMatches')}")
-                        print(f"      Grid列设置: {layout_check.get('gridColumns')}")
-                        print(f"      显示模式: {layout_check.get('display')}")
+                // 如果没有找到最后一个元素，使用容器的scrollHeight
+                return reportContainer.scrollHeight;
+            }
             
-            # 等待所有图片加载完成
-            await page.evaluate("""
-                async () => {
-                    const images = Array.from(document.images);
-                    const promises = images.map((img) => {
-                        return new Promise((resolve) => {
-                            if (img.complete && img.naturalHeight !== 0) {
-                                resolve();
-                                return;
-                            }
-                            img.onload = () => resolve();
-                            img.onerror = () => resolve();  // 失败也继续
-                            setTimeout(() => resolve(), 5000);  // 超时保护
-                        });
-                    });
-                    await Promise.all(promises);
-                    await new Promise(resolve => setTimeout(resolve, 500));
+            // 如果没有report-container，使用body的高度
+            const bodyHeight = document.body.scrollHeight;
+            const docHeight = document.documentElement.scrollHeight;
+            return Math.min(bodyHeight, docHeight); // 取较小值，避免多余空白
+        }
+    """)
+    
+    print(f"   📏 页面内容高度: {height}px")
+    
+    # 设置视口高度，只设置必要的高度，避免多余空白
+    await page.set_viewport_size({'width': viewport_width, 'height': min(height + 50, 5000)})  # 限制最大高度，避免过大
+    
+    # 对于群友分析，重新强制设置布局（因为set_viewport_size可能触发重新布局）
+    if viewport_width >= 900:
+        await page.evaluate("""
+            () => {
+                const body = document.body;
+                const reportContainer = document.querySelector('.report-container');
+                const personalityContent = document.querySelector('.personality-content');
+                const userSection = document.querySelector('.user-section');
+                
+                if (body) {
+                    body.style.width = '900px';
+                    body.style.maxWidth = '900px';
                 }
-            """)
-            
-            # 隐藏保存按钮（如果存在）
-            await page.evaluate("""
-                () => {
-                    const saveButton = document.querySelector('.save-button');
-                    if (saveButton) {
-                        saveButton.style.display = 'none';
-                    }
+                if (reportContainer) {
+                    reportContainer.style.width = '900px';
+                    reportContainer.style.maxWidth = '900px';
                 }
-            """)
-            
-            # 等待布局稳定（特别是grid布局）
-            await page.wait_for_timeout(1000)
-            
-            # 获取实际高度（只计算实际内容的高度，不包括多余的空白）
-            height = await page.evaluate("""
-                () => {
-                    // 获取report-container的实际内容高度（这是实际内容区域）
-                    const reportContainer = document.querySelector('.report-container');
-                    if (reportContainer) {
-                        // 获取容器内最后一个有内容的元素
-                        const children = Array.from(reportContainer.children);
-                        let lastElement = null;
-                        for (let i = children.length - 1; i >= 0; i--) {
-                            const elem = children[i];
-                            // 跳过隐藏元素和空白元素
-                            const style = window.getComputedStyle(elem);
-                            if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
-                                lastElement = elem;
-                                break;
-                            }
-                        }
-                        
-                        if (lastElement) {
-                            // 计算从容器顶部到最后一个元素底部的距离
-                            const containerTop = reportContainer.offsetTop;
-                            const lastElementBottom = lastElement.offsetTop + lastElement.offsetHeight;
-                            const contentHeight = lastElementBottom - containerTop + 50; // 加50px底部边距
-                            return contentHeight;
-                        }
-                        
-                        // 如果没有找到最后一个元素，使用容器的scrollHeight
-                        return reportContainer.scrollHeight;
-                    }
-                    
-                    // 如果没有report-container，使用body的高度
-                    const bodyHeight = document.body.scrollHeight;
-                    const docHeight = document.documentElement.scrollHeight;
-                    return Math.min(bodyHeight, docHeight); // 取较小值，避免多余空白
+                if (personalityContent) {
+                    personalityContent.style.maxWidth = '900px';
+                    personalityContent.style.width = '900px';
                 }
-            """)
-            
-            print(f"   📏 页面内容高度: {height}px")
-            
-            # 设置视口高度，只设置必要的高度，避免多余空白
-            await page.set_viewport_size({'width': viewport_width, 'height': min(height + 50, 5000)})  # 限制最大高度，避免过大
-            
-            # 对于群友分析，重新强制设置布局（因为set_viewport_size可能触发重新布局）
-            if viewport_width >= 900:
-                await page.evaluate("""
-                    () => {
-                        const body = document.body;
-                        const reportContainer = document.querySelector('.report-container');
-                        const personalityContent = document.querySelector('.personality-content');
-                        const userSection = document.querySelector('.user-section');
-                        
-                        if (body) {
-                            body.style.width = '900px';
-                            body.style.maxWidth = '900px';
-                        }
-                        if (reportContainer) {
-                            reportContainer.style.width = '900px';
-                            reportContainer.style.maxWidth = '900px';
-                        }
-                        if (personalityContent) {
-                            personalityContent.style.maxWidth = '900px';
-                            personalityContent.style.width = '900px';
-                        }
-                        if (userSection) {
-                            userSection.style.display = 'grid';
-                            userSection.style.gridTemplateColumns = '1fr 1fr';
-                        }
+                if (userSection) {
+                    userSection.style.display = 'grid';
+                    userSection.style.gridTemplateColumns = '1fr 1fr';
+                }
+            }
+        """)
+    
+    # 再次等待布局稳定
+    await wait_for_layout(page)
+    
+    # 滚动到页面底部，确保所有内容都已渲染（特别是grid布局）
+    await page.evaluate("""
+        () => {
+            window.scrollTo(0, document.body.scrollHeight);
+        }
+    """)
+    await wait_for_layout(page)
+    
+    # 滚动回顶部
+    await page.evaluate("""
+        () => {
+            window.scrollTo(0, 0);
+        }
+    """)
+    await wait_for_layout(page)
+    
+    # 再次获取高度（滚动后可能发生变化，但只计算实际内容）
+    final_height = await page.evaluate("""
+        () => {
+            const reportContainer = document.querySelector('.report-container');
+            if (reportContainer) {
+                const children = Array.from(reportContainer.children);
+                let lastElement = null;
+                for (let i = children.length - 1; i >= 0; i--) {
+                    const elem = children[i];
+                    const style = window.getComputedStyle(elem);
+                    if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
+                        lastElement = elem;
+                        break;
                     }
-                """)
-            
-            # 再次等待布局稳定
-            await page.wait_for_timeout(1000)
-            
-            # 滚动到页面底部，确保所有内容都已渲染（特别是grid布局）
-            await page.evaluate("""
-                () => {
-                    window.scrollTo(0, document.body.scrollHeight);
                 }
-            """)
-            await page.wait_for_timeout(500)
-            
-            # 滚动回顶部
-            await page.evaluate("""
-                () => {
-                    window.scrollTo(0, 0);
+                
+                if (lastElement) {
+                    const containerTop = reportContainer.offsetTop;
+                    const lastElementBottom = lastElement.offsetTop + lastElement.offsetHeight;
+                    return lastElementBottom - containerTop + 50;
                 }
-            """)
-            await page.wait_for_timeout(500)
-            
-            # 再次获取高度（滚动后可能发生变化，但只计算实际内容）
-            final_height = await page.evaluate("""
-                () => {
-                    const reportContainer = document.querySelector('.report-container');
-                    if (reportContainer) {
-                        const children = Array.from(reportContainer.children);
-                        let lastElement = null;
-                        for (let i = children.length - 1; i >= 0; i--) {
-                            const elem = children[i];
-                            const style = window.getComputedStyle(elem);
-                            if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
-                                lastElement = elem;
-                                break;
-                            }
-                        }
-                        
-                        if (lastElement) {
-                            const containerTop = reportContainer.offsetTop;
-                            const lastElementBottom = lastElement.offsetTop + lastElement.offsetHeight;
-                            return lastElementBottom - containerTop + 50;
+                return reportContainer.scrollHeight;
+            }
+            return Math.min(document.body.scrollHeight, document.documentElement.scrollHeight);
+        }
+    """)
+    
+    if final_height > height:
+        print(f"   📏 更新后内容高度: {final_height}px")
+        await page.set_viewport_size({'width': viewport_width, 'height': min(final_height + 50, 5000)})
+        
+        # 再次强制设置布局（因为set_viewport_size可能触发重新布局）
+        if viewport_width >= 900:
+            try:
+                await page.evaluate(force_layout_js)
+            except Exception as e:
+                print(f"   ⚠️ 更新后强制布局失败: {e}")
+        
+        await wait_for_layout(page)
+    
+    # 截图前最后一次强制设置布局，确保万无一失
+    if viewport_width >= 900:
+        await page.evaluate("""
+            () => {
+                const body = document.body;
+                const reportContainer = document.querySelector('.report-container');
+                const personalityContent = document.querySelector('.personality-content');
+                const userSection = document.querySelector('.user-section');
+                
+                if (body) {
+                    body.style.width = '900px';
+                    body.style.maxWidth = '900px';
+                }
+                if (reportContainer) {
+                    reportContainer.style.width = '900px';
+                    reportContainer.style.maxWidth = '900px';
+                }
+                if (personalityContent) {
+                    personalityContent.style.maxWidth = '900px';
+                    personalityContent.style.width = '900px';
+                }
+                if (userSection) {
+                    userSection.style.display = 'grid';
+                    userSection.style.gridTemplateColumns = '1fr 1fr';
+                }
+            }
+        """)
+        await wait_for_layout(page)
+    
+    # 截图前最后一次计算精确的内容高度
+    screenshot_info = await page.evaluate("""
+        () => {
+            const reportContainer = document.querySelector('.report-container');
+            if (reportContainer) {
+                // 找到容器内最后一个可见元素
+                const children = Array.from(reportContainer.children);
+                let lastElement = null;
+                let maxBottom = 0;
+                
+                for (let i = 0; i < children.length; i++) {
+                    const elem = children[i];
+                    const style = window.getComputedStyle(elem);
+                    if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
+                        const rect = elem.getBoundingClientRect();
+                        const bottom = rect.bottom + window.scrollY;
+                        if (bottom > maxBottom) {
+                            maxBottom = bottom;
+                            lastElement = elem;
                         }
-                        return reportContainer.scrollHeight;
                     }
-                    return Math.min(document.body.scrollHeight, document.documentElement.scrollHeight);
                 }
-            """)
-            
-            if final_height > height:
-                print(f"   📏 更新后内容高度: {final_height}px")
-                await page.set_viewport_size({'width': viewport_width, 'height': min(final_height + 50, 5000)})
                 
-                # 再次强制设置布局（因为set_viewport_size可能触发重新布局）
-                if viewport_width >= 900:
-                    try:
-                        await page.evaluate(force_layout_js)
-                    except Exception as e:
-                        print(f"   ⚠️ 更新后强制布局失败: {e}")
+                if (lastElement) {
+                    // 计算从页面顶部到最后一个元素底部的距离
+                    const containerRect = reportContainer.getBoundingClientRect();
+                    const containerTop = containerRect.top + window.scrollY;
+                    const lastElementRect = lastElement.getBoundingClientRect();
+                    const lastElementBottom = lastElementRect.bottom + window.scrollY;
+                    
+                    // 加上一些底部边距
+                    const footer = document.querySelector('.footer') || document.querySelector('footer');
+                    const footerHeight = footer ? footer.getBoundingClientRect().height : 0;
+                    
+                    const contentHeight = lastElementBottom - containerTop + footerHeight + 20; // 20px底部边距
+                    return {
+                        height: Math.ceil(contentHeight),
+                        containerTop: Math.ceil(containerTop),
+                        lastElementBottom: Math.ceil(lastElementBottom)
+                    };
+                }
                 
-                await page.wait_for_timeout(500)
-            
-            # 截图前最后一次强制设置布局，确保万无一失
-            if viewport_width >= 900:
-                await page.evaluate("""
-                    () => {
-                        const body = document.body;
-                        const reportContainer = document.querySelector('.report-container');
-                        const personalityContent = document.querySelector('.personality-content');
-                        const userSection = document.querySelector('.user-section');
-                        
-                        if (body) {
-                            body.style.width = '900px';
-                            body.style.maxWidth = '900px';
-                        }
-                        if (reportContainer) {
-                            reportContainer.style.width = '900px';
-                            reportContainer.style.maxWidth = '900px';
-                        }
-                        if (personalityContent) {
-                            personalityContent.style.maxWidth = '900px';
-                            personalityContent.style.width = '900px';
-                        }
-                        if (userSection) {
-                            userSection.style.display = 'grid';
-                            userSection.style.gridTemplateColumns = '1fr 1fr';
-                        }
-                    }
-                """)
-                await page.wait_for_timeout(200)
+                return {
+                    height: reportContainer.scrollHeight,
+                    containerTop: 0,
+                    lastElementBottom: reportContainer.scrollHeight
+                };
+            }
             
-            # 截图前最后一次计算精确的内容高度
-            screenshot_info = await page.evaluate("""
+            // 如果没有容器，使用body的实际内容高度
+            const body = document.body;
+            const html = document.documentElement;
+            return {
+                height: Math.min(body.scrollHeight, html.scrollHeight),
+                containerTop: 0,
+                lastElementBottom: Math.min(body.scrollHeight, html.scrollHeight)
+            };
+        }
+    """)
+    
+    # 安全获取截图高度
+    if screenshot_info and isinstance(screenshot_info, dict):
+        screenshot_height = screenshot_info.get('height', final_height if 'final_height' in locals() else viewport_height)
+    else:
+        screenshot_height = final_height if 'final_height' in locals() else viewport_height
+    
+    # 确保高度有效
+    if screenshot_height <= 0:
+        screenshot_height = viewport_height
+    if screenshot_height > 10000:  # 限制最大高度，避免过大
+        screenshot_height = 10000
+    
+    print(f"   📏 精确截图高度: {screenshot_height}px")
+    
+    # 截图前再次检查布局
+    # #region agent log
+    if viewport_width >= 900:
+        try:
+            final_check = await page.evaluate("""
                 () => {
-                    const reportContainer = document.querySelector('.report-container');
-                    if (reportContainer) {
-                        // 找到容器内最后一个可见元素
-                        const children = Array.from(reportContainer.children);
-                        let lastElement = null;
-                        let maxBottom = 0;
-                        
-                        for (let i = 0; i < children.length; i++) {
-                            const elem = children[i];
-                            const style = window.getComputedStyle(elem);
-                            if (style.display !== 'none' && style.visibility !== 'hidden' && elem.offsetHeight > 0) {
-                                const rect = elem.getBoundingClientRect();
-                                const bottom = rect.bottom + window.scrollY;
-                                if (bottom > maxBottom) {
-                                    maxBottom = bottom;
-                                    lastElement = elem;
-                                }
-                            }
-                        }
-                        
-                        if (lastElement) {
-                            // 计算从页面顶部到最后一个元素底部的距离
-                            const containerRect = reportContainer.getBoundingClientRect();
-                            const containerTop = containerRect.top + window.scrollY;
-                            const lastElementRect = lastElement.getBoundingClientRect();
-                            const lastElementBottom = lastElementRect.bottom + window.scrollY;
-                            
-                            // 加上一些底部边距
-                            const footer = document.querySelector('.footer') || document.querySelector('footer');
-                            const footerHeight = footer ? footer.getBoundingClientRect().height : 0;
-                            
-                            const contentHeight = lastElementBottom - containerTop + footerHeight + 20; // 20px底部边距
-                            return {
-                                height: Math.ceil(contentHeight),
-                                containerTop: Math.ceil(containerTop),
-                                lastElementBottom: Math.ceil(lastElementBottom)
-                            };
-                        }
-                        
+                    const userSection = document.querySelector('.user-section');
+                    if (userSection) {
+                        const style = window.getComputedStyle(userSection);
                         return {
-                            height: reportContainer.scrollHeight,
-                            containerTop: 0,
-                            lastElementBottom: reportContainer.scrollHeight
+                            gridColumns: style.gridTemplateColumns,
+                            viewportWidth: window.innerWidth,
+                            containerWidth: document.querySelector('.report-container')?.offsetWidth || 0
                         };
                     }
-                    
-                    // 如果没有容器，使用body的实际内容高度
-                    const body = document.body;
-                    const html = document.documentElement;
-                    return {
-                        height: Math.min(body.scrollHeight, html.scrollHeight),
-                        containerTop: 0,
-                        lastElementBottom: Math.min(body.scrollHeight, html.scrollHeight)
-                    };
+                    return null;
                 }
             """)
-            
-            # 安全获取截图高度
-            if screenshot_info and isinstance(screenshot_info, dict):
-                screenshot_height = screenshot_info.get('height', final_height if 'final_height' in locals() else viewport_height)
-            else:
-                screenshot_height = final_height if 'final_height' in locals() else viewport_height
-            
-            # 确保高度有效
-            if screenshot_height <= 0:
-                screenshot_height = viewport_height
-            if screenshot_height > 10000:  # 限制最大高度，避免过大
-                screenshot_height = 10000
-            
-            print(f"   📏 精确截图高度: {screenshot_height}px")
-            
-            # 截图前再次检查布局
-            # #region agent log
-            if viewport_width >= 900:
-                try:
-                    final_check = await page.evaluate("""
-                        () => {
-                            const userSection = document.querySelector('.user-section');
-                            if (userSection) {
-                                const style = window.getComputedStyle(userSection);
-                                return {
-                                    gridColumns: style.gridTemplateColumns,
-                                    viewportWidth: window.innerWidth,
-                                    containerWidth: document.querySelector('.report-container')?.offsetWidth || 0
-                                };
-                            }
-                            return null;
-                        }
-                    """)
-                    debug_log('app.py:965', 'Before screenshot - final layout check', final_check, 'A')
-                except:
-                    pass
-            # #endregion
-            
-            # 设置视口高度为精确的内容高度（限制最大高度）
-            actual_screenshot_height = min(int(screenshot_height), 5000)
-            if actual_screenshot_height < 100:
-                actual_screenshot_height = viewport_height  # 如果太小，使用默认高度
-            
-            await page.set_viewport_size({'width': viewport_width, 'height': actual_screenshot_height})
-            await page.wait_for_timeout(300)
-            
-            # 滚动到顶部，确保从顶部开始截图
-            await page.evaluate("window.scrollTo(0, 0)")
-            await page.wait_for_timeout(200)
-            
-            # 截图 - 使用full_page=False，只截取视口内容（已设置为精确高度）
-            # 确保高质量截图
-            try:
-                screenshot_bytes = await page.screenshot(
-                    full_page=False,  # 不使用full_page，只截取当前视口
-                    type='png'
-                    # PNG格式不支持quality参数，移除它
-                )
-            except Exception as e:
-                print(f"   ⚠️ 截图失败，尝试使用full_page模式: {e}")
-                # 如果失败，回退到full_page模式
-                screenshot_bytes = await page.screenshot(
-                    full_page=True,
-                    type='png'
-                )
-            
-            # #region agent log
-            debug_log('app.py:970', 'Screenshot taken', {'size_bytes': len(screenshot_bytes)}, 'A')
-            # #endregion
-            
-            await browser.close()
-            
-            # 转换为 base64
-            image_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-            
-            # #region agent log
-            debug_log('app.py:978', 'Function exit', {'image_b64_length': len(image_b64)}, 'A')
-            # #endregion
-            
-            return f"data:image/png;base64,{image_b64}"
-            
+            debug_log('app.py:965', 'Before screenshot - final layout check', final_check, 'A')
+        except:
+            pass
+    # #endregion
+    
+    # 设置视口高度为精确的内容高度（限制最大高度）
+    actual_screenshot_height = min(int(screenshot_height), 5000)
+    if actual_screenshot_height < 100:
+        actual_screenshot_height = viewport_height  # 如果太小，使用默认高度
+    
+    await page.set_viewport_size({'width': viewport_width, 'height': actual_screenshot_height})
+    
+    # 滚动到顶部，确保从顶部开始截图
+    await page.evaluate("window.scrollTo(0, 0)")
+    await wait_for_layout(page)
+    
+    # 截图 - 使用full_page=False，只截取视口内容（已设置为精确高度）
+    # 确保高质量截图
+    try:
+        screenshot_bytes = await page.screenshot(
+            full_page=False,  # 不使用full_page，只截取当前视口
+            type='png'
+            # PNG格式不支持quality参数，移除它
+        )
     except Exception as e:
-        print(f"❌ Playwright 生成失败: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        print(f"   ⚠️ 截图失败，尝试使用full_page模式: {e}")
+        # 如果失败，回退到full_page模式
+        screenshot_bytes = await page.screenshot(
+            full_page=True,
+            type='png'
+        )
+    
+    # #region agent log
+    debug_log('app.py:970', 'Screenshot taken', {'size_bytes': len(screenshot_bytes)}, 'A')
+    # #endregion
+    
+    # 转换为 base64
+    image_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
+    
+    # #region agent log
+    debug_log('app.py:978', 'Function exit', {'image_b64_length': len(image_b64)}, 'A')
+    # #endregion
+    
+    return f"data:image/png;base64,{image_b64}"
 
 
 def process_report_data_for_frontend(report):
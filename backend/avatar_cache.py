@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QQ 头像本地缓存：代理 q1.qlogo.cn 的头像并缓存到磁盘
+
+每次渲染报告都要从 qlogo 重新下载上百个头像，是截图耗时的长尾，
+偶尔还会因为下载超时导致头像缺失。这里把头像缓存到 runtime_outputs/avatar_cache，
+过期后用 ETag / Last-Modified 条件请求重新验证，报告生成或打开时并发预取所有头像。
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+
+QLOGO_URL = "https://q1.qlogo.cn/g?b=qq&nk={uin}&s=640"
+
+# 与 download_image_to_base64 使用的请求头一致，避免被拒绝
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://qzone.qq.com/',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
+}
+
+# 按 uin 串行下载使用的锁数量（不同 uin 偶尔共用一把锁，只会让它们排队，不影响正确性）
+LOCK_STRIPES = 64
+
+
+def is_valid_uin(uin) -> bool:
+    """QQ号只允许纯数字，防止拼接出任意路径或URL"""
+    uin = str(uin or '')
+    return uin.isdigit() and len(uin) <= 20
+
+
+def collect_report_uins(report: Dict) -> List[str]:
+    """收集报告中会显示头像的所有 uin（榜单前5名 + 群友锐评）"""
+    statistics = report.get('statistics') or {}
+    uins = []
+    for items in (statistics.get('rankings') or {}).values():
+        for item in (items or [])[:5]:
+            uins.append(str(item.get('uin', '')))
+    for user in (statistics.get('userPersonalities') or {}).values():
+        uins.append(str(user.get('uin', '')))
+    # 去重并保持顺序
+    return [uin for uin in dict.fromkeys(uins) if is_valid_uin(uin)]
+
+
+class AvatarCache:
+    """磁盘头像缓存（线程安全）"""
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = 7 * 24 * 3600,
+                 timeout: float = 10, max_workers: int = 8):
+        """
+        初始化头像缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl_seconds: 缓存新鲜期，过期后向 qlogo 发条件请求重新验证
+            timeout: 单次下载超时（秒）
+            max_workers: 并发预取线程数
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._session = requests.Session()
+        self._session.headers.update(REQUEST_HEADERS)
+        self._executor = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix='avatar-prefetch')
+        # 分段锁：同一个 uin 总是映射到同一把锁，锁的数量固定，不随见过的 uin 增长
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._stats = {'hits': 0, 'revalidated': 0, 'downloads': 0, 'stale_served': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls, default_dir: str) -> 'AvatarCache':
+        """从环境变量读取配置创建头像缓存"""
+        return cls(
+            cache_dir=os.getenv('AVATAR_CACHE_DIR') or default_dir,
+            ttl_seconds=int(float(os.getenv('AVATAR_CACHE_TTL_HOURS', '168')) * 3600),
+            timeout=float(os.getenv('AVATAR_FETCH_TIMEOUT_SECONDS', '10')),
+            max_workers=int(os.getenv('AVATAR_PREFETCH_WORKERS', '8')),
+        )
+
+    # ========== 磁盘存储 ==========
+
+    def _paths(self, uin: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f"{uin}.img"),
+                os.path.join(self.cache_dir, f"{uin}.meta.json"))
+
+    def _read_meta(self, uin: str) -> Optional[Dict]:
+        img_path, meta_path = self._paths(uin)
+        if not os.path.exists(img_path):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, uin: str, content: bytes, meta: Dict):
+        img_path, meta_path = self._paths(uin)
+        # 先写临时文件再替换，避免并发读到半个文件
+        tmp_img = f"{img_path}.{threading.get_ident()}.tmp"
+        with open(tmp_img, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_img, img_path)
+        self._write_meta(uin, meta)
+
+    def _write_meta(self, uin: str, meta: Dict):
+        _, meta_path = self._paths(uin)
+        tmp_meta = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+    def _lock_for(self, uin: str) -> threading.Lock:
+        return self._locks[hash(uin) % len(self._locks)]
+
+    # ========== 读取 ==========
+
+    def get(self, uin) -> Optional[Tuple[bytes, Dict]]:
+        """
+        获取头像（必要时下载或重新验证）
+
+        Returns:
+            (图片字节, 元信息) ，下载失败且没有旧缓存时返回 None
+        """
+        uin = str(uin or '')
+        if not is_valid_uin(uin):
+            return None
+
+        # 同一个 uin 同时只下载一次，其他线程等待后直接读缓存
+        with self._lock_for(uin):
+            meta = self._read_meta(uin)
+            now = time.time()
+            if meta and now - meta.get('fetched_at', 0) < self.ttl_seconds:
+                self._stats['hits'] += 1
+                return self._load(uin, meta)
+
+            meta = self._fetch(uin, meta, now)
+            if meta is None:
+                return None
+            return self._load(uin, meta)
+
+    def _load(self, uin: str, meta: Dict) -> Optional[Tuple[bytes, Dict]]:
+        img_path, _ = self._paths(uin)
+        try:
+            with open(img_path, 'rb') as f:
+                return f.read(), meta
+        except OSError:
+            return None
+
+    def _fetch(self, uin: str, meta: Optional[Dict], now: float) -> Optional[Dict]:
+        """从 qlogo 下载或条件请求重新验证，失败时返回旧缓存的元信息（可能为 None）"""
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = self._session.get(QLOGO_URL.format(uin=uin), headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and meta:
+                meta['fetched_at'] = now
+                self._write_meta(uin, meta)
+                self._stats['revalidated'] += 1
+                return meta
+            if response.status_code == 200 and len(response.content) >= 100:
+                new_meta = {
+                    'etag': response.headers.get('ETag', ''),
+                    'last_modified': response.headers.get('Last-Modified', ''),
+                    'content_type': response.headers.get('Content-Type', 'image/jpeg'),
+                    'fetched_at': now,
+                }
+                self._write(uin, response.content, new_meta)
+                self._stats['downloads'] += 1
+                return new_meta
+        except requests.exceptions.RequestException:
+            pass
+        except OSError as e:
+            print(f"⚠️ 写入头像缓存失败 {uin}: {e}")
+
+        if meta:
+            # 网络异常时继续使用旧头像，比头像缺失好
+            self._stats['stale_served'] += 1
+            return meta
+        self._stats['failures'] += 1
+        return None
+
+    # ========== 预取 ==========
+
+    def prefetch(self, uins: Iterable, wait: bool = False, timeout: Optional[float] = None) -> int:
+        """
+        并发预取头像
+
+        Args:
+            uins: QQ号列表
+            wait: 是否等待全部完成
+            timeout: 等待上限（秒），仅 wait=True 时有效
+
+        Returns:
+            提交的预取数量
+        """
+        uins = [str(u) for u in dict.fromkeys(uins or []) if is_valid_uin(u)]
+        futures = [self._executor.submit(self.get, uin) for uin in uins]
+        if wait and futures:
+            deadline = time.time() + timeout if timeout else None
+            for future in futures:
+                try:
+                    future.result(timeout=max(deadline - time.time(), 0) if deadline else None)
+                except Exception:
+                    break
+        return len(futures)
+
+    def get_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        stats = dict(self._stats)
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Playwright 浏览器池：常驻 Chromium + 预热的浏览器上下文
+
+每次截图都 async_playwright() 启动一个新的 Chromium 要多花 1~2 秒，并且并发请求
+会无上限地拉起浏览器进程。这里在独立的事件循环线程中常驻一个浏览器，
+按 device_scale_factor 复用有限数量的上下文，超出并发的请求排队等待，
+每次渲染都有独立的超时。
+"""
+
+import asyncio
+import atexit
+import os
+import threading
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+
+# 与之前 set_extra_http_headers 中使用的一致，保证 CSS 媒体查询行为不变
+DEFAULT_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+
+class BrowserPoolTimeout(Exception):
+    """排队或渲染超时"""
+
+
+class BrowserPool:
+    """常驻浏览器池（所有 Playwright 调用都在池内部的事件循环线程中执行）"""
+
+    def __init__(self, size: int = 2, render_timeout: float = 90.0,
+                 queue_timeout: float = 120.0, prewarm_scales: Optional[List[int]] = None):
+        """
+        初始化浏览器池
+
+        Args:
+            size: 最大并发渲染数，同时也是上下文数量上限
+            render_timeout: 单次渲染超时（秒）
+            queue_timeout: 排队等待空闲上下文的超时（秒）
+            prewarm_scales: 启动时预热的 device_scale_factor 列表
+        """
+        self.size = max(int(size), 1)
+        self.render_timeout = render_timeout
+        self.queue_timeout = queue_timeout
+        self.prewarm_scales = list(prewarm_scales or [])[:self.size]
+
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._semaphore = None
+        self._context_lock = None
+        self._idle: Dict[int, list] = {}
+        self._context_count = 0
+        self._stats = {'renders': 0, 'failures': 0, 'timeouts': 0, 'launches': 0}
+
+    @classmethod
+    def from_env(cls) -> 'BrowserPool':
+        """从环境变量读取配置创建浏览器池"""
+        scales = [int(s) for s in os.getenv('BROWSER_POOL_PREWARM_SCALES', '2,3').split(',') if s.strip()]
+        return cls(
+            size=int(os.getenv('BROWSER_POOL_SIZE', '2')),
+            render_timeout=float(os.getenv('BROWSER_RENDER_TIMEOUT_SECONDS', '90')),
+            queue_timeout=float(os.getenv('BROWSER_QUEUE_TIMEOUT_SECONDS', '120')),
+            prewarm_scales=scales,
+        )
+
+    # ========== 生命周期 ==========
+
+    def start(self):
+        """启动事件循环线程并启动浏览器（重复调用无副作用）"""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+            self._thread.start()
+            future = asyncio.run_coroutine_threadsafe(self._startup(), self._loop)
+            try:
+                future.result(timeout=60)
+            except Exception:
+                self._shutdown_loop()
+                raise
+
+    async def _startup(self):
+        from playwright.async_api import async_playwright
+
+        self._semaphore = asyncio.Semaphore(self.size)
+        self._context_lock = asyncio.Lock()
+        self._playwright = await async_playwright().start()
+        await self._launch_browser()
+
+        for scale in self.prewarm_scales:
+            context = await self._new_context(scale)
+            self._idle.setdefault(scale, []).append(context)
+        print(f"🌐 浏览器池已启动: 并发 {self.size}, 预热上下文 {self._context_count} 个")
+
+    async def _launch_browser(self):
+        self._browser = await self._playwright.chromium.launch(
+            headless=True,
+            args=['--no-sandbox', '--disable-setuid-sandbox']
+        )
+        self._idle = {}
+        self._context_count = 0
+        self._stats['launches'] += 1
+
+    def stop(self):
+        """关闭浏览器并停止事件循环线程"""
+        if not self._loop or not self._thread or not self._thread.is_alive():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._teardown(), self._loop).result(timeout=10)
+        except Exception as e:
+            print(f"⚠️ 关闭浏览器池失败: {e}")
+        self._shutdown_loop()
+
+    async def _teardown(self):
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def _shutdown_loop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    # ========== 上下文管理 ==========
+
+    async def _new_context(self, scale: int):
+        context = await self._browser.new_context(
+            device_scale_factor=scale,
+            user_agent=DEFAULT_USER_AGENT,
+            ignore_https_errors=True
+        )
+        self._context_count += 1
+        return context
+
+    async def _close_context(self, context, counted: bool = True):
+        if counted:
+            self._context_count -= 1
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def _checkout_context(self, scale: int):
+        """取出一个指定缩放倍率的空闲上下文，没有则新建（总数不超过 size）"""
+        async with self._context_lock:
+            if not self._browser or not self._browser.is_connected():
+                print("⚠️ 浏览器已断开，重新启动...")
+                await self._launch_browser()
+
+            idle = self._idle.get(scale)
+            if idle:
+                return idle.pop()
+
+            if self._context_count >= self.size:
+                # 持有信号量时在用的上下文最多 size-1 个，这里一定有其他倍率的空闲上下文
+                for other in self._idle.values():
+                    if other:
+                        await self._close_context(other.pop())
+                        break
+            return await self._new_context(scale)
+
+    async def _checkin_context(self, context, scale: int, healthy: bool):
+        async with self._context_lock:
+            if context.browser is not self._browser:
+                # 浏览器在渲染期间被重启过，旧上下文已不计入当前浏览器
+                await self._close_context(context, counted=False)
+                return
+            if healthy and self._browser.is_connected():
+                try:
+                    await context.clear_cookies()
+                    self._idle.setdefault(scale, []).append(context)
+                    return
+                except Exception:
+                    pass
+            await self._close_context(context)
+
+    # ========== 渲染 ==========
+
+    async def _render(self, render_fn: Callable, args: tuple, kwargs: dict,
+                      device_scale_factor: int, viewport: Dict[str, int]):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise BrowserPoolTimeout(f"等待空闲浏览器超时（{self.queue_timeout}s）")
+
+        try:
+            context = await self._checkout_context(device_scale_factor)
+            healthy = False
+            page = None
+            try:
+                page = await context.new_page()
+                await page.set_viewport_size(viewport)
+                result = await asyncio.wait_for(render_fn(page, *args, **kwargs), timeout=self.render_timeout)
+                healthy = True
+                return result
+            except asyncio.TimeoutError:
+                self._stats['timeouts'] += 1
+                raise BrowserPoolTimeout(f"渲染超时（{self.render_timeout}s）")
+            finally:
+                if page:
+                    try:
+                        await page.close()
+                    except Exception:
+                        healthy = False
+                await self._checkin_context(context, device_scale_factor, healthy)
+        finally:
+            self._semaphore.release()
+
+    def render(self, render_fn: Callable, *args, device_scale_factor: int = 2,
+               viewport_width: int = 450, viewport_height: int = 800, **kwargs) -> Any:
+        """
+        在池中执行一次渲染（同步阻塞，可在 Flask 请求线程中直接调用）
+
+        Args:
+            render_fn: 协程函数 render_fn(page, *args, viewport_width=..., viewport_height=..., **kwargs)
+            device_scale_factor: 设备缩放因子，相同倍率的上下文会被复用
+            viewport_width: 视口宽度
+            viewport_height: 视口高度
+
+        Returns:
+            render_fn 的返回值，失败或超时返回 None
+        """
+        try:
+            self.start()
+        except ImportError:
+            print("❌ 需要安装 Playwright: pip install playwright && playwright install chromium")
+            return None
+        except Exception as e:
+            print(f"❌ 浏览器池启动失败: {e}")
+            return None
+
+        viewport = {'width': viewport_width, 'height': viewport_height}
+        kwargs.update(viewport_width=viewport_width, viewport_height=viewport_height)
+        future = asyncio.run_coroutine_threadsafe(
+            self._render(render_fn, args, kwargs, device_scale_factor, viewport),
+            self._loop
+        )
+        try:
+            result = future.result(timeout=self.queue_timeout + self.render_timeout + 10)
+            self._stats['renders'] += 1
+            return result
+        except BrowserPoolTimeout as e:
+            self._stats['failures'] += 1
+            print(f"❌ Playwright 生成失败: {e}")
+            return None
+        except Exception as e:
+            future.cancel()
+            self._stats['failures'] += 1
+            print(f"❌ Playwright 生成失败: {e}")
+            traceback.print_exc()
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取浏览器池状态"""
+        stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['running'] = bool(self._thread and self._thread.is_alive())
+        stats['contexts'] = self._context_count
+        return stats
+
+
+_browser_pool = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取进程级浏览器池（懒加载：在第一次截图时才启动浏览器，避免 gunicorn fork 前创建线程）"""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool.from_env()
+            atexit.register(_browser_pool.stop)
+        return _browser_pool
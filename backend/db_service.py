@@ -104,6 +104,40 @@ class DatabaseService:
             if conn:
                 conn.close()
     
+    def update_report(self, report_id: str, selected_words: Optional[List[Dict]] = None,
+                     statistics: Optional[Dict] = None,
+                     ai_comments: Optional[Dict] = None) -> bool:
+        """更新报告的部分字段（流式生成时逐步写入AI锐评），None 表示不修改该字段"""
+        fields = []
+        values = []
+        for column, value in (('selected_words', selected_words),
+                              ('statistics', statistics),
+                              ('ai_comments', ai_comments)):
+            if value is not None:
+                fields.append(f"{column} = %s")
+                values.append(json.dumps(value, ensure_ascii=False))
+        if not fields:
+            return True
+        
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            sql = f"UPDATE reports SET {', '.join(fields)} WHERE report_id = %s"
+            cursor.execute(sql, (*values, report_id))
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"更新报告失败: {e}")
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if conn:
+                conn.close()
+    
     def get_report(self, report_id: str) -> Optional[Dict[str, Any]]:
         conn = None
         try:
@@ -115,6 +115,45 @@ class JSONStorageService:
             print(f"❌ 创建报告失败: {e}")
             return False
     
+    def update_report(self, report_id: str, selected_words: Optional[List[Dict]] = None,
+                     statistics: Optional[Dict] = None,
+                     ai_comments: Optional[Dict] = None) -> bool:
+        """更新报告的部分字段（流式生成时逐步写入AI锐评），None 表示不修改该字段"""
+        try:
+            report_file = self._get_report_file(report_id)
+            if not report_file.exists():
+                print(f"❌ 更新报告失败: 报告不存在 {report_id}")
+                return False
+            
+            report_data = json.loads(report_file.read_text(encoding='utf-8'))
+            if selected_words is not None:
+                report_data["selected_words"] = selected_words
+            if statistics is not None:
+                report_data["statistics"] = statistics
+            if ai_comments is not None:
+                report_data["ai_comments"] = ai_comments
+            report_data["updated_at"] = datetime.now().isoformat()
+            
+            # 先写临时文件再替换，避免读取到写了一半的报告
+            tmp_file = report_file.with_suffix('.json.tmp')
+            tmp_file.write_text(
+                json.dumps(report_data, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
+            os.replace(tmp_file, report_file)
+            
+            # 更新索引中的更新时间
+            index = self._load_index()
+            for entry in index:
+                if entry["report_id"] == report_id:
+                    entry["updated_at"] = report_data["updated_at"]
+            self._save_index(index)
+            return True
+            
+        except Exception as e:
+            print(f"❌ 更新报告失败: {e}")
+            return False
+    
     def get_report(self, report_id: str) -> Optional[Dict[str, Any]]:
         """获取报告"""
         try:
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+临时文件清理服务：定期回收 runtime_outputs/temp 下被遗弃的分析会话
+
+用户上传后如果一直没有调用 /api/finalize，{id}.json、{id}_result.json、
+{id}_analyzer_data.json 会永远留在磁盘上。这里用一个后台线程按会话（report_id）
+聚合这些文件，超过 TTL 的整体删除；总占用超过上限时按最后修改时间从旧到新淘汰。
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+# 同一会话的临时文件后缀（按长度倒序，保证先匹配更长的后缀）
+SESSION_SUFFIXES = ('_analyzer_data.json', '_result.json', '.json')
+
+
+def _session_id(filename: str) -> Optional[str]:
+    """从临时文件名解析会话ID（report_id），无法识别返回 None"""
+    for suffix in SESSION_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)] or None
+    return None
+
+
+class TempFileJanitor:
+    """后台临时文件清理器"""
+
+    def __init__(self, temp_dir: str, ttl_seconds: int = 6 * 3600,
+                 max_bytes: int = 0, interval_seconds: int = 300,
+                 min_age_seconds: int = 600):
+        """
+        初始化清理器
+
+        Args:
+            temp_dir: 临时文件目录
+            ttl_seconds: 会话最长保留时间，超过即删除（<=0 表示不按时间清理）
+            max_bytes: 临时目录占用上限，超过后从最旧的会话开始淘汰（<=0 表示不限制）
+            interval_seconds: 扫描间隔
+            min_age_seconds: 按容量淘汰时跳过最近活跃的会话，避免删掉正在分析/选词的文件
+        """
+        self.temp_dir = temp_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.interval_seconds = max(int(interval_seconds), 1)
+        self.min_age_seconds = min_age_seconds
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._metrics = {
+            'runs': 0,
+            'sessions_removed': 0,
+            'files_removed': 0,
+            'bytes_reclaimed': 0,
+            'expired_sessions': 0,
+            'evicted_sessions': 0,
+            'last_run_at': None,
+            'last_run_bytes_reclaimed': 0,
+            'current_bytes': 0,
+            'current_sessions': 0,
+            'errors': 0,
+        }
+
+    @classmethod
+    def from_env(cls, temp_dir: str) -> 'TempFileJanitor':
+        """从环境变量读取配置创建清理器"""
+        return cls(
+            temp_dir=temp_dir,
+            ttl_seconds=int(float(os.getenv('TEMP_FILE_TTL_HOURS', '6')) * 3600),
+            max_bytes=int(float(os.getenv('TEMP_DIR_MAX_MB', '0')) * 1024 * 1024),
+            interval_seconds=int(os.getenv('TEMP_SWEEP_INTERVAL_SECONDS', '300')),
+            min_age_seconds=int(os.getenv('TEMP_EVICT_MIN_AGE_SECONDS', '600')),
+        )
+
+    def start(self):
+        """启动后台清理线程（重复调用无副作用）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='temp-janitor', daemon=True)
+        self._thread.start()
+        print(f"🧹 临时文件清理已启动: TTL {self.ttl_seconds // 60} 分钟, "
+              f"上限 {self.max_bytes // (1024 * 1024) if self.max_bytes > 0 else '不限'} MB, "
+              f"间隔 {self.interval_seconds} 秒")
+
+    def stop(self):
+        """停止后台清理线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                with self._lock:
+                    self._metrics['errors'] += 1
+                print(f"⚠️ 临时文件清理失败: {e}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def _collect_sessions(self) -> Dict[str, Dict]:
+        """按会话聚合临时文件：{session_id: {'files': [(path, size)], 'bytes': n, 'mtime': t}}"""
+        sessions = {}
+        try:
+            entries = list(os.scandir(self.temp_dir))
+        except FileNotFoundError:
+            return sessions
+
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            session_id = _session_id(entry.name)
+            if not session_id:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            session = sessions.setdefault(session_id, {'files': [], 'bytes': 0, 'mtime': 0.0})
+            session['files'].append((entry.path, stat.st_size))
+            session['bytes'] += stat.st_size
+            # 会话的活跃时间取其中最新的文件
+            session['mtime'] = max(session['mtime'], stat.st_mtime)
+        return sessions
+
+    def _remove_session(self, session: Dict) -> Tuple[int, int]:
+        """删除一个会话的全部文件，返回 (删除文件数, 回收字节数)"""
+        files_removed = 0
+        bytes_reclaimed = 0
+        for path, size in session['files']:
+            try:
+                os.remove(path)
+                files_removed += 1
+                bytes_reclaimed += size
+            except FileNotFoundError:
+                # 可能刚被 finalize 删除，或被其他 worker 的清理器删除
+                pass
+        return files_removed, bytes_reclaimed
+
+    def sweep(self, now: Optional[float] = None) -> Dict:
+        """
+        执行一次清理
+
+        Returns:
+            本次清理结果 {'expired': n, 'evicted': n, 'files': n, 'bytes': n}
+        """
+        now = now if now is not None else time.time()
+        sessions = self._collect_sessions()
+
+        expired = []
+        if self.ttl_seconds > 0:
+            expired = [sid for sid, s in sessions.items() if now - s['mtime'] > self.ttl_seconds]
+
+        expired_set = set(expired)
+        evicted = []
+        if self.max_bytes > 0:
+            remaining = {sid: s for sid, s in sessions.items() if sid not in expired_set}
+            total = sum(s['bytes'] for s in remaining.values())
+            if total > self.max_bytes:
+                # 从最旧的会话开始淘汰，跳过最近仍在使用的会话
+                for sid, s in sorted(remaining.items(), key=lambda item: item[1]['mtime']):
+                    if total <= self.max_bytes:
+                        break
+                    if now - s['mtime'] < self.min_age_seconds:
+                        continue
+                    evicted.append(sid)
+                    total -= s['bytes']
+
+        files_removed = 0
+        bytes_reclaimed = 0
+        for sid in expired + evicted:
+            files, size = self._remove_session(sessions[sid])
+            files_removed += files
+            bytes_reclaimed += size
+
+        removed = expired_set | set(evicted)
+        current_bytes = sum(s['bytes'] for sid, s in sessions.items() if sid not in removed)
+
+        with self._lock:
+            m = self._metrics
+            m['runs'] += 1
+            m['expired_sessions'] += len(expired)
+            m['evicted_sessions'] += len(evicted)
+            m['sessions_removed'] += len(removed)
+            m['files_removed'] += files_removed
+            m['bytes_reclaimed'] += bytes_reclaimed
+            m['last_run_at'] = now
+            m['last_run_bytes_reclaimed'] = bytes_reclaimed
+            m['current_bytes'] = current_bytes
+            m['current_sessions'] = len(sessions) - len(removed)
+
+        if removed:
+            print(f"🧹 清理临时会话 {len(removed)} 个（过期 {len(expired)}, 超限淘汰 {len(evicted)}），"
+                  f"回收 {bytes_reclaimed / (1024 * 1024):.1f} MB")
+
+        return {
+            'expired': len(expired),
+            'evicted': len(evicted),
+            'files': files_removed,
+            'bytes': bytes_reclaimed,
+        }
+
+    def get_metrics(self) -> Dict:
+        """获取累计清理指标"""
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['ttl_seconds'] = self.ttl_seconds
+        metrics['max_bytes'] = self.max_bytes
+        metrics['interval_seconds'] = self.interval_seconds
+        return metrics
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景语料词频表：词 → 对数概率，用于计算热词的独特性
+
+热词原来完全按本群词频排序，"什么""今天"这类通用词总排在前面，
+只能靠 config.py 里越来越长的 FUNCTION_WORDS / BLACKLIST 手工排除。
+有了通用语料的词频，就能衡量一个词在本群是否"用得异常多"，不需要维护停用词表。
+
+词频表是一个紧凑的二进制开放寻址哈希表，通过 mmap 只读加载，查询 O(1)，
+只在查询到的页才会读入内存。由命令行从任意语料一次性构建：
+
+    python background_freq.py build corpus1.txt corpus2.txt -o background_freq.bin
+    python background_freq.py build --counts word_counts.tsv -o background_freq.bin
+    python background_freq.py lookup background_freq.bin 哈哈 今天
+
+没有配置词频表时使用 jieba 自带词典的词频作为背景。
+"""
+
+import os
+import sys
+import math
+import mmap
+import struct
+import hashlib
+import argparse
+from collections import Counter
+
+# 尝试导入numpy（批量计算独特性时使用，没有时逐个计算）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+
+MAGIC = b'QQBGFRQ1'
+# 文件头：魔数, 槽位数, 词条数, 语料总词数, 未登录词对数概率
+HEADER = struct.Struct('<8sIIdf4x')
+# 槽位：64位词哈希（0 表示空槽）, 对数概率
+SLOT = struct.Struct('<Qf4x')
+LOAD_FACTOR = 0.5
+
+
+def word_hash(word):
+    """词的 64 位哈希（只存哈希不存词本身，表更小；冲突概率可忽略）"""
+    h = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    return h or 1
+
+
+class BackgroundFrequencyTable:
+    """mmap 加载的背景词频表（只读，线程安全）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_slots, self.n_entries, self.total, self.oov_log_prob = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"不是有效的背景词频表: {path}")
+        if len(self._mm) < HEADER.size + self.n_slots * SLOT.size:
+            self.close()
+            raise ValueError(f"背景词频表文件不完整: {path}")
+
+    def _find(self, word):
+        h = word_hash(word)
+        slot = h % self.n_slots
+        for _ in range(self.n_slots):
+            stored, log_prob = SLOT.unpack_from(self._mm, HEADER.size + slot * SLOT.size)
+            if stored == h:
+                return log_prob
+            if stored == 0:
+                return None
+            slot = (slot + 1) % self.n_slots
+        return None
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def log_prob(self, word):
+        """词的对数概率，未登录词返回平滑后的下限"""
+        log_prob = self._find(word)
+        return self.oov_log_prob if log_prob is None else log_prob
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class JiebaBackground:
+    """以 jieba 自带词典的词频作为通用语料背景频率（没有词频表时的默认背景）"""
+
+    def __init__(self):
+        import jieba
+        jieba.dt.check_initialized()
+        self._freq = jieba.dt.FREQ
+        self.total = float(jieba.dt.total) or 1.0
+        # 未登录词按半次计
+        self.oov_log_prob = math.log(0.5 / self.total)
+
+    def __contains__(self, word):
+        return self._freq.get(word, 0) > 0
+
+    def log_prob(self, word):
+        count = self._freq.get(word, 0)
+        return math.log(count / self.total) if count > 0 else self.oov_log_prob
+
+
+def write_table(counts, path, min_count=1):
+    """
+    把词频写成二进制词频表
+
+    Args:
+        counts: {词: 次数}
+        path: 输出文件路径
+        min_count: 低于该次数的词不写入（按未登录词处理）
+
+    Returns:
+        写入的词条数
+    """
+    total = float(sum(counts.values())) or 1.0
+    entries = [(word, count) for word, count in counts.items() if count >= min_count and word]
+    n_slots = max(int(len(entries) / LOAD_FACTOR) + 1, 8)
+
+    slots = bytearray(n_slots * SLOT.size)
+    used = [False] * n_slots
+    for word, count in entries:
+        h = word_hash(word)
+        slot = h % n_slots
+        while used[slot]:
+            slot = (slot + 1) % n_slots
+        used[slot] = True
+        SLOT.pack_into(slots, slot * SLOT.size, h, math.log(count / total))
+
+    oov_log_prob = math.log(0.5 / total)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, n_slots, len(entries), total, oov_log_prob))
+        f.write(slots)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+_background = None
+_background_loaded = False
+
+
+def get_background_table():
+    """
+    获取进程级背景词频表：优先使用 BACKGROUND_FREQ_PATH 指定的词频表，
+    其次使用 jieba 词典词频，都不可用时返回 None
+    """
+    global _background, _background_loaded
+    if _background_loaded:
+        return _background
+    _background_loaded = True
+
+    import config as cfg
+    path = os.getenv('BACKGROUND_FREQ_PATH') or getattr(cfg, 'BACKGROUND_FREQ_PATH', '')
+    if path:
+        try:
+            _background = BackgroundFrequencyTable(path)
+            print(f"📚 已加载背景词频表: {path}（{_background.n_entries} 个词）")
+            return _background
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 背景词频表加载失败，改用 jieba 词典词频: {e}")
+    try:
+        _background = JiebaBackground()
+    except Exception as e:
+        print(f"⚠️ jieba 词典词频加载失败，跳过独特性评分: {e}")
+        _background = None
+    return _background
+
+
+def log_likelihood_scores(words, counts, corpus_total, background):
+    """
+    批量计算对数似然比（Dunning G²）独特性，有 numpy 时一次向量化完成
+
+    本群用得比通用语料多时为正，少时为负，绝对值越大差异越显著。
+
+    Args:
+        words: 词列表
+        counts: 与 words 对应的本群词频
+        corpus_total: 本群总词数
+        background: 背景词频表（需要 log_prob 和 total）
+
+    Returns:
+        与 words 对应的 G² 列表
+    """
+    if not words:
+        return []
+    bg_total = float(background.total)
+    log_probs = [background.log_prob(word) for word in words]
+    c = float(corpus_total) or 1.0
+    d = bg_total
+
+    if NUMPY_AVAILABLE:
+        a = np.asarray(counts, dtype=np.float64)
+        b = np.exp(np.asarray(log_probs, dtype=np.float64)) * d
+        e1 = c * (a + b) / (c + d)
+        e2 = d * (a + b) / (c + d)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g2 = 2 * (np.where(a > 0, a * np.log(a / e1), 0.0) + np.where(b > 0, b * np.log(b / e2), 0.0))
+        sign = np.where(a / c >= b / d, 1.0, -1.0)
+        return (sign * g2).tolist()
+
+    scores = []
+    for a, log_prob in zip(counts, log_probs):
+        b = math.exp(log_prob) * d
+        e1 = c * (a + b) / (c + d)
+        e2 = d * (a + b) / (c + d)
+        g2 = 2 * ((a * math.log(a / e1) if a > 0 else 0.0) + (b * math.log(b / e2) if b > 0 else 0.0))
+        scores.append(g2 if a / c >= b / d else -g2)
+    return scores
+
+
+def _count_corpus(paths, counts_mode=False):
+    """统计语料词频：文本文件逐行用 jieba 分词，--counts 模式读取 "词<TAB>次数" 格式"""
+    counts = Counter()
+    if not counts_mode:
+        import jieba
+    for path in paths:
+        print(f"📂 读取: {path}")
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if counts_mode:
+                    parts = line.rstrip('\n').split()
+                    if len(parts) >= 2 and parts[1].isdigit():
+                        counts[parts[0]] += int(parts[1])
+                    continue
+                for word in jieba.cut(line.strip()):
+                    word = word.strip()
+                    if word:
+                        counts[word] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="背景语料词频表工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="从语料构建词频表")
+    build.add_argument('inputs', nargs='+', help="语料文件（纯文本，或配合 --counts 使用词频文件）")
+    build.add_argument('-o', '--output', default='background_freq.bin', help="输出文件路径")
+    build.add_argument('--counts', action='store_true', help="输入为 \"词 次数\" 格式（如 jieba 的 dict.txt）")
+    build.add_argument('--min-count', type=int, default=2, help="最低词频，低于该值的词不写入")
+
+    lookup = sub.add_parser('lookup', help="查询词的对数概率")
+    lookup.add_argument('table', help="词频表路径")
+    lookup.add_argument('words', nargs='+')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        counts = _count_corpus(args.inputs, counts_mode=args.counts)
+        written = write_table(counts, args.output, min_count=args.min_count)
+        size_mb = os.path.getsize(args.output) / 1024 / 1024
+        print(f"✅ 已写入 {written} 个词（语料共 {sum(counts.values())} 词）→ {args.output} ({size_mb:.1f} MB)")
+        print(f"💡 在 config.py 或 backend/.env 中设置 BACKGROUND_FREQ_PATH 使用该词频表")
+    else:
+        table = BackgroundFrequencyTable(args.table)
+        for word in args.words:
+            found = '' if word in table else '（未登录）'
+            print(f"{word}\t{table.log_prob(word):.3f}{found}")
+        table.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
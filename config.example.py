@@ -85,6 +85,16 @@ MIN_FREQ = 1
 MIN_WORD_LEN = 1    # 最小词长（字符数）
 MAX_WORD_LEN = 10   # 最大词长（字符数）
 
+# 热词排序方式
+# 'frequency'        - 按词频排序（默认）
+# 'distinctiveness'  - 按相对通用语料的独特性（对数似然比）排序，通用高频词自动靠后，
+#                      不需要在 FUNCTION_WORDS / BLACKLIST 中逐个添加
+HOT_WORD_RANKING = 'frequency'
+
+# 背景语料词频表路径（由 python background_freq.py build 语料.txt -o 路径 生成）
+# 留空则使用 jieba 自带词典的词频
+BACKGROUND_FREQ_PATH = ""
+
 
 # ============================================
 # 新词发现参数
@@ -222,6 +232,43 @@ WORD_ALIAS_MAP = {
 }
 
 
+# ============================================
+# 情感分析配置
+# ============================================
+
+# 追加的情感关键词（在内置词表基础上扩展，见 sentiment.py）
+# 格式：[关键词列表] 或 {关键词: 权重}，权重默认 1，与内置词重复时权重累加
+SENTIMENT_POSITIVE_KEYWORDS = {
+    # 示例：
+    # '绝绝子': 2,
+    # 'yyds': 2,
+}
+SENTIMENT_NEGATIVE_KEYWORDS = {
+    # 示例：
+    # '寄了': 1,
+}
+
+# 情感分析后端：'lexicon'（关键词词典，默认）或 'model'（本地 CPU 分类模型）
+SENTIMENT_BACKEND = 'lexicon'
+
+# 本地模型路径（SENTIMENT_BACKEND = 'model' 时使用，加载失败自动回退到词典）
+# 支持 scikit-learn 模型（.pkl / .joblib，需有 predict_proba，类别为 0/1 或 negative/positive 等）
+# 和 ONNX 模型（.onnx，需安装 onnxruntime）
+SENTIMENT_MODEL_PATH = ''
+
+# 模型推理的进程数（0 表示 CPU 核数 - 1，1 表示在主进程中推理）
+SENTIMENT_WORKERS = 0
+
+# 模型每批推理的文本数
+SENTIMENT_BATCH_SIZE = 512
+
+# 模型分值绝对值不超过该值时视为中立
+SENTIMENT_NEUTRAL_MARGIN = 0.2
+
+# 分析时每攒够多少条发言批量打分一次
+SENTIMENT_CHUNK_SIZE = 4096
+
+
 # ============================================
 # 排行榜配置
 # ============================================
@@ -232,6 +279,12 @@ RANK_TOP_N = 10
 # 热词贡献者显示的前 N 名
 CONTRIBUTOR_TOP_N = 10
 
+# 互动关系图中回复和@的权重（用于最佳搭档、小圈子和互动最多的群友）
+INTERACTION_WEIGHTS = {'reply': 1.0, 'at': 1.0}
+
+# 小圈子的最少人数
+CIRCLE_MIN_SIZE = 3
+
 # 每个热词显示的示例消息数量
 SAMPLE_COUNT = 10
 
@@ -240,12 +293,22 @@ SAMPLE_COUNT = 10
 # 时间分析配置
 # ============================================
 
+# 时区（相对 UTC 的小时数，用于把消息时间戳换算成本地时间）
+# 8 为北京时间，可以是小数（如印度 5.5）
+TIMEZONE_OFFSET_HOURS = 8
+
 # 夜猫子时段（0-6点）
 NIGHT_OWL_HOURS = range(0, 6)
 
 # 早起鸟时段（6-9点）
 EARLY_BIRD_HOURS = range(6, 9)
 
+# 热词爆发检测：与之前多少天的使用率比较
+TREND_WINDOW_DAYS = 14
+
+# 热词爆发检测：使用率的 z 分数达到该值的日子计为爆发日
+TREND_BURST_Z = 3.0
+
 
 # ============================================
 # 机器人过滤
@@ -300,6 +363,69 @@ OPENAI_MODEL = ""
 # 'ask'     - 每次询问用户（默认）
 AI_COMMENT_MODE = 'ask'
 
+# AI 批量生成的并发请求数（热词锐评、群友锐评同时发出的请求数）
+AI_CONCURRENCY = 5
+
+# 每分钟最多发出的 AI 请求数（按服务商限流调整）
+AI_RATE_LIMIT_RPM = 60
+
+# 遇到 429 / 5xx / 超时时的最大重试次数
+AI_MAX_RETRIES = 3
+
+# 单个 AI 请求的超时时间（秒）
+AI_ITEM_TIMEOUT = 120
+
+# AI选词前先用本地打分预筛选，只把得分最高的 N 个候选词交给AI（0 表示不预筛选）
+AI_SELECT_SHORTLIST = 80
+
+# AI选词提示词的 token 预算（估算值），超出时自动减少例句条数和长度、丢弃低频候选词
+AI_SELECT_PROMPT_TOKEN_BUDGET = 6000
+
+# 热词锐评是否一次请求生成全部（返回 JSON 数组，缺失的词再逐词生成）
+# False：每个词单独请求一次
+AI_COMMENT_SINGLE_CALL = True
+
+# 是否缓存 AI 响应（相同模型、相同提示词、相同参数的请求直接返回上次的结果）
+# 重新生成报告时几乎瞬间完成，也不会重复消耗 token；想要每次都重新生成可设为 False
+LLM_CACHE_ENABLED = True
+
+# 缓存过期时间（小时）
+LLM_CACHE_TTL_HOURS = 720
+
+# 缓存最多保留的条数，超过后淘汰最久未使用的记录
+LLM_CACHE_MAX_ENTRIES = 5000
+
+# 缓存文件路径，留空则使用 runtime_outputs/llm_cache.sqlite3
+LLM_CACHE_PATH = ""
+
+# AI 请求共享连接池（所有生成器共用，长连接避免每次重新握手）
+# 连接池最大连接数
+AI_HTTP_MAX_CONNECTIONS = 20
+
+# 连接池保留的空闲 keep-alive 连接数
+AI_HTTP_MAX_KEEPALIVE = 10
+
+# 空闲连接保留时间（秒）
+AI_HTTP_KEEPALIVE_EXPIRY = 60
+
+# 单次 HTTP 请求超时（秒），AI 分析较慢，默认 5 分钟
+AI_HTTP_TIMEOUT = 300
+
+# 是否启用 HTTP/2（需要 pip install "httpx[http2]"，未安装时自动使用 HTTP/1.1）
+AI_HTTP2 = True
+
+
+# 本地选词引擎（未配置 API Key 或 AI 选词失败时使用）各维度权重
+# frequency: 词频  burstiness: 突发性（集中在某几周爆发）  diversity: 参与度（多少群友在用）
+# distinctiveness: 独特性（相对通用语料的频率比）  novelty: 新颖性（新词发现/词组合并得到的词）
+LOCAL_SELECT_WEIGHTS = {
+    'frequency': 0.2,
+    'burstiness': 0.2,
+    'diversity': 0.2,
+    'distinctiveness': 0.25,
+    'novelty': 0.15,
+}
+
 
 # ============================================
 # 图片导出配置
@@ -316,6 +442,20 @@ ENABLE_IMAGE_EXPORT = True
 # 'ask'     - 每次询问用户（默认）
 IMAGE_GENERATION_MODE = 'ask'
 
+# 头像地址前缀（可选）
+# 留空则直接使用 QQ 头像地址 https://q1.qlogo.cn/...
+# 填写后头像地址为 "{AVATAR_PROXY_URL}/{QQ号}"，例如后端头像缓存 "http://localhost:5000/api/avatar"
+AVATAR_PROXY_URL = ""
+
+# 生成 HTML 时是否把头像下载后以 base64 内嵌（截图时不再等待网络）
+EMBED_AVATARS = True
+
+# 批量下载头像的并发线程数
+IMAGE_DOWNLOAD_WORKERS = 16
+
+# 对同一域名（如 q1.qlogo.cn）的最大并发请求数
+IMAGE_DOWNLOAD_PER_HOST = 8
+
 
 # ============================================
 # 高级配置（一般不需要修改）
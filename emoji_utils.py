@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+emoji 识别与提取
+
+is_emoji 原来每次调用都新建 10 个区间的列表再逐个比较，extract_emojis 每次调用都重新编译正则，
+两者在分词统计、趣味统计里按词 / 按消息调用，一次分析要执行数百万次。
+这里把 emoji 字符预先展开为 frozenset，提取用的正则在模块加载时编译一次，
+并且按完整的 emoji 序列匹配，不再把组合 emoji 拆散：
+- ZWJ 组合（👨‍👩‍👧、🏳️‍🌈）
+- 肤色修饰（👍🏻）
+- 国旗（🇨🇳，两个区域指示符）、子区域旗帜（🏴 + 标签序列）
+- 键帽（1️⃣、#️⃣）
+"""
+
+import re
+
+# emoji 基本字符所在的码位区间
+EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),  # 表情
+    (0x1F300, 0x1F5FF),  # 符号和象形文字（含肤色修饰符）
+    (0x1F680, 0x1F6FF),  # 交通和地图
+    (0x1F1E0, 0x1F1FF),  # 区域指示符（国旗）
+    (0x2702, 0x27B0),    # 装饰符号
+    (0x1F900, 0x1F9FF),  # 补充符号和象形文字
+    (0x1FA00, 0x1FA6F),  # 棋类符号
+    (0x1FA70, 0x1FAFF),  # 符号和象形文字扩展-A
+    (0x2600, 0x26FF),    # 杂项符号
+    (0x2300, 0x23FF),    # 杂项技术符号
+)
+
+EMOJI_CHARS = frozenset(chr(code) for start, end in EMOJI_RANGES for code in range(start, end + 1))
+
+_ZWJ = '‍'
+_VS16 = '️'
+_KEYCAP = '⃣'
+
+_BASE = '[' + ''.join(f'{chr(start)}-{chr(end)}' for start, end in EMOJI_RANGES) + ']'
+_ELEMENT = (
+    _BASE
+    + f'{_VS16}?'
+    + '[\U0001F3FB-\U0001F3FF]?'          # 肤色修饰
+    + '(?:[\U000E0020-\U000E007E]+\U000E007F)?'  # 子区域旗帜的标签序列
+)
+
+# 完整的 emoji 序列：国旗 | 键帽 | 元素(ZWJ 元素)*
+EMOJI_PATTERN = re.compile(
+    '[\U0001F1E6-\U0001F1FF]{2}'
+    f'|[0-9#*]{_VS16}?{_KEYCAP}'
+    f'|{_ELEMENT}(?:{_ZWJ}{_ELEMENT})*'
+)
+
+
+def extract_emojis(text):
+    """提取文本中的所有 emoji（组合 emoji 作为一个整体返回）"""
+    # 大多数消息不含 emoji，集合判断比正则扫描快得多
+    if EMOJI_CHARS.isdisjoint(text) and _KEYCAP not in text:
+        return []
+    return EMOJI_PATTERN.findall(text)
+
+
+def is_emoji(text):
+    """单个 emoji 字符，或一个完整的 emoji 序列"""
+    if len(text) == 1:
+        return text in EMOJI_CHARS
+    return bool(text) and EMOJI_PATTERN.fullmatch(text) is not None
@@ -0,0 +1,75 @@
+/**
+ * 流式最终化报告 Composable
+ * 调用 /api/finalize/stream（POST + server-sent events），
+ * 每生成一条AI锐评就回调一次，前端可以边生成边展示。
+ * EventSource 不支持 POST，这里用 fetch 读取响应流并手动解析事件。
+ */
+
+/**
+ * 解析一段 SSE 文本块，返回 { event, data }，注释行（心跳）返回 null
+ */
+const parseEventBlock = (block) => {
+  let event = 'message'
+  const dataLines = []
+  for (const line of block.split('\n')) {
+    if (!line || line.startsWith(':')) continue
+    const idx = line.indexOf(':')
+    const field = idx === -1 ? line : line.slice(0, idx)
+    const value = idx === -1 ? '' : line.slice(idx + 1).replace(/^ /, '')
+    if (field === 'event') event = value
+    else if (field === 'data') dataLines.push(value)
+  }
+  if (dataLines.length === 0) return null
+  return { event, data: JSON.parse(dataLines.join('\n')) }
+}
+
+/**
+ * 发起流式最终化请求
+ * @param {string} url - 接口地址
+ * @param {Object} payload - 请求体
+ * @param {Function} onEvent - 回调 onEvent(event, data)
+ * @returns {Promise<void>} 流结束时 resolve；HTTP 错误或服务端 error 事件时 reject
+ */
+export async function streamFinalize(url, payload, onEvent) {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify(payload)
+  })
+
+  if (!response.ok || !response.body) {
+    let message = `HTTP ${response.status}`
+    try {
+      const data = await response.json()
+      if (data.error) message = data.error
+    } catch (e) {
+      // 非 JSON 错误响应，保留状态码
+    }
+    const err = new Error(message)
+    err.status = response.status
+    throw err
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder('utf-8')
+  let buffer = ''
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, '\n')
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const parsed = parseEventBlock(buffer.slice(0, boundary))
+      buffer = buffer.slice(boundary + 2)
+      if (parsed) {
+        if (parsed.event === 'error') {
+          throw new Error(parsed.data.error || '生成失败')
+        }
+        onEvent(parsed.event, parsed.data)
+      }
+      boundary = buffer.indexOf('\n\n')
+    }
+  }
+}
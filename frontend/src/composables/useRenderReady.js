@@ -0,0 +1,54 @@
+/**
+ * 渲染就绪信号 Composable
+ * 后端 Playwright 截图时等待 window.__REPORT_READY__ === true，
+ * 而不是固定 sleep 若干秒。页面在数据、字体、图片（头像）都加载完成
+ * 并完成一次绘制后设置该标志。
+ */
+
+export const RENDER_READY_FLAG = '__REPORT_READY__'
+
+// 单张图片最长等待时间，避免一个坏头像拖住整张截图
+const IMAGE_TIMEOUT_MS = 5000
+
+const waitForImage = (img) => {
+  if (img.complete) return Promise.resolve()
+  return new Promise((resolve) => {
+    const timer = setTimeout(resolve, IMAGE_TIMEOUT_MS)
+    const done = () => {
+      clearTimeout(timer)
+      resolve()
+    }
+    img.addEventListener('load', done, { once: true })
+    img.addEventListener('error', done, { once: true })
+  })
+}
+
+const nextFrame = () => new Promise((resolve) => requestAnimationFrame(() => resolve()))
+
+/**
+ * 清除就绪标志（重新加载数据前调用）
+ */
+export function resetRenderReady() {
+  window[RENDER_READY_FLAG] = false
+}
+
+/**
+ * 等待字体和图片加载完成后设置就绪标志
+ * @param {Element} root - 需要等待图片的根节点，默认整个文档
+ */
+export async function markRenderReady(root = document) {
+  try {
+    if (document.fonts && document.fonts.ready) {
+      await document.fonts.ready
+    }
+    const images = Array.from((root || document).querySelectorAll('img'))
+    await Promise.all(images.map(waitForImage))
+    // 两帧之后布局和绘制都已完成（图表高度等由 CSS 计算）
+    await nextFrame()
+    await nextFrame()
+  } catch (err) {
+    console.warn('等待渲染就绪失败:', err)
+  } finally {
+    window[RENDER_READY_FLAG] = true
+  }
+}
@@ -6,9 +6,20 @@ import json
 import math
 import asyncio
 import base64
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import config as cfg
 from utils import sanitize_filename
+from ai_batch import AsyncBatchRunner, ChatJob, ai_setting
+from ai_client import get_openai_client
+from llm_cache import cached_completion
+from prompt_builder import prefilter_candidates, build_candidate_section, estimate_tokens
+from word_ranker import LocalWordSelector
 
 # 尝试导入requests
 try:
@@ -62,9 +73,79 @@ def truncate_text(text, length=50):
     return text
 
 
+QLOGO_AVATAR_URL = "https://q1.qlogo.cn/g?b=qq&nk={uin}&s=640"
+
+
 def get_avatar_url(uin):
-    """获取QQ头像URL"""
-    return f"https://q1.qlogo.cn/g?b=qq&nk={uin}&s=640"
+    """获取QQ头像URL（配置了 AVATAR_PROXY_URL 时走后端头像缓存）"""
+    proxy_url = os.getenv('AVATAR_PROXY_URL', getattr(cfg, 'AVATAR_PROXY_URL', ''))
+    if proxy_url and uin:
+        return f"{proxy_url.rstrip('/')}/{uin}"
+    return QLOGO_AVATAR_URL.format(uin=uin)
+
+
+# 图片下载请求头，设置User-Agent，避免被拒绝
+IMAGE_REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://qzone.qq.com/',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
+}
+
+# 下载结果的进程内缓存 {url: data URI 或 None}，同一头像在多个榜单/多次生成中只下载一次
+_image_cache = OrderedDict()
+_image_cache_lock = threading.Lock()
+_IMAGE_CACHE_MAX_ENTRIES = 2048
+
+_http_session = None
+_http_session_lock = threading.Lock()
+_host_semaphores = {}
+
+
+def _get_http_session():
+    """获取共享的 requests.Session（连接池复用 TCP/TLS 连接）"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            pool_size = int(getattr(cfg, 'IMAGE_DOWNLOAD_WORKERS', 16))
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(IMAGE_REQUEST_HEADERS)
+            _http_session = session
+        return _http_session
+
+
+def _host_semaphore(url):
+    """每个域名的并发上限，避免对 qlogo 瞬间打出几十个请求被限流"""
+    host = urlparse(url).netloc
+    with _http_session_lock:
+        if host not in _host_semaphores:
+            limit = int(getattr(cfg, 'IMAGE_DOWNLOAD_PER_HOST', 8))
+            _host_semaphores[host] = threading.BoundedSemaphore(max(limit, 1))
+        return _host_semaphores[host]
+
+
+def _cache_image(url, data_uri):
+    with _image_cache_lock:
+        _image_cache[url] = data_uri
+        _image_cache.move_to_end(url)
+        while len(_image_cache) > _IMAGE_CACHE_MAX_ENTRIES:
+            _image_cache.popitem(last=False)
+
+
+def _to_data_uri(content, content_type):
+    """图片内容转为 data URI"""
+    image_data = base64.b64encode(content).decode('utf-8')
+    # 检测图片类型
+    if 'jpeg' in content_type or 'jpg' in content_type:
+        return f"data:image/jpeg;base64,{image_data}"
+    elif 'gif' in content_type:
+        return f"data:image/gif;base64,{image_data}"
+    elif 'webp' in content_type:
+        return f"data:image/webp;base64,{image_data}"
+    else:
+        return f"data:image/png;base64,{image_data}"
 
 
 def download_image_to_base64(url, timeout=10, retry=2):
@@ -85,61 +166,75 @@ def download_image_to_base64(url, timeout=10, retry=2):
     if not url or not url.startswith('http'):
         return None
     
-    # 设置User-Agent，避免被拒绝
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Referer': 'https://qzone.qq.com/',
-        'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8'
-    }
-    
-    # 禁用SSL警告（如果需要）
-    try:
-        import urllib3
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-    except:
-        pass
+    with _image_cache_lock:
+        if url in _image_cache:
+            return _image_cache[url]
     
+    session = _get_http_session()
     for attempt in range(retry + 1):
+        if attempt > 0:
+            # 指数退避 + 随机抖动，避免并发请求同时重试
+            time.sleep(min(0.5 * (2 ** (attempt - 1)), 4) * random.uniform(0.5, 1.5))
         try:
-            response = requests.get(url, timeout=timeout, stream=True, headers=headers, verify=True)
+            with _host_semaphore(url):
+                response = session.get(url, timeout=timeout)
             if response.status_code == 200:
                 # 检查内容长度
                 content = response.content
                 if len(content) < 100:  # 太小的内容可能是错误页面
-                    if attempt < retry:
-                        continue
-                    return None
-                
-                image_data = base64.b64encode(content).decode('utf-8')
-                # 检测图片类型
-                content_type = response.headers.get('Content-Type', 'image/png')
-                if 'jpeg' in content_type or 'jpg' in content_type:
-                    return f"data:image/jpeg;base64,{image_data}"
-                elif 'gif' in content_type:
-                    return f"data:image/gif;base64,{image_data}"
-                elif 'webp' in content_type:
-                    return f"data:image/webp;base64,{image_data}"
-                else:
-                    return f"data:image/png;base64,{image_data}"
+                    continue
+                data_uri = _to_data_uri(content, response.headers.get('Content-Type', 'image/png'))
+                _cache_image(url, data_uri)
+                return data_uri
             elif response.status_code == 404:
                 # 404直接返回，不需要重试
+                _cache_image(url, None)
                 return None
-        except requests.exceptions.Timeout:
-            if attempt < retry:
-                continue
-            return None
         except requests.exceptions.RequestException:
-            if attempt < retry:
-                continue
-            return None
+            continue
         except Exception:
-            if attempt < retry:
-                continue
-            return None
+            continue
     
     return None
 
 
+def download_images_to_base64(urls, timeout=10, retry=2, max_workers=None):
+    """
+    并发下载一批图片并转换为base64（共享连接池、按域名限流、结果缓存）
+    
+    Args:
+        urls: 图片URL列表
+        timeout: 单张图片超时时间（秒）
+        retry: 重试次数
+        max_workers: 并发线程数，默认读取 IMAGE_DOWNLOAD_WORKERS
+        
+    Returns:
+        {url: base64编码的图片数据}，下载失败的URL对应None
+    """
+    urls = [u for u in dict.fromkeys(urls) if u]
+    if not urls:
+        return {}
+    
+    max_workers = max_workers or int(getattr(cfg, 'IMAGE_DOWNLOAD_WORKERS', 16))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        results = executor.map(lambda u: download_image_to_base64(u, timeout=timeout, retry=retry), urls)
+        return dict(zip(urls, results))
+
+
+def download_avatars_to_base64(uins, timeout=10, retry=2):
+    """
+    并发下载一批QQ头像
+    
+    Returns:
+        {uin: base64编码的头像数据}，只包含下载成功的头像
+    """
+    uins = [str(u) for u in dict.fromkeys(uins) if u]
+    # 始终从 qlogo 直接下载（AVATAR_PROXY_URL 可能是相对地址）
+    url_map = {uin: QLOGO_AVATAR_URL.format(uin=uin) for uin in uins}
+    downloaded = download_images_to_base64(list(url_map.values()), timeout=timeout, retry=retry)
+    return {uin: downloaded[url] for uin, url in url_map.items() if downloaded.get(url)}
+
+
 def clean_ai_response(text):
     # 清理AI响应中的思考过程标记，同时保留换行符
     if not text:
@@ -183,6 +278,52 @@ def clean_ai_response(text):
     return cleaned.strip()
 
 
+def is_valid_ai_text(text):
+    """AI 响应清理后是否可用（与锐评后处理的判断一致），不可用的响应不写入缓存"""
+    return len(clean_ai_response(text) or '') >= 5
+
+
+def parse_selected_indices(text, candidate_count):
+    """
+    解析AI选词返回的序号（1 开始，逗号分隔）
+    
+    Returns:
+        候选词范围内的 0 开始序号列表（去重，保持AI给出的顺序）
+    """
+    # 清理响应中的思考过程，清理后为空时使用原始结果
+    result = clean_ai_response(text) or text or ''
+    indices = []
+    for part in result.replace('，', ',').split(','):
+        try:
+            idx = int(part.strip())
+        except ValueError:
+            continue
+        if 1 <= idx <= candidate_count and idx - 1 not in indices:
+            indices.append(idx - 1)  # 转为0索引
+    return indices
+
+
+# 渲染就绪标志（前端页面和 HTML 模板在字体、头像加载并绘制完成后设置）
+RENDER_READY_FLAG = '__REPORT_READY__'
+
+
+async def wait_for_render_ready(page, timeout_ms=None):
+    """等待页面设置渲染就绪标志，超过上限后不再等待，直接继续截图"""
+    if timeout_ms is None:
+        timeout_ms = int(os.getenv('RENDER_READY_TIMEOUT_MS', '15000'))
+    try:
+        await page.wait_for_function(f"() => window.{RENDER_READY_FLAG} === true", timeout=timeout_ms)
+        return True
+    except Exception:
+        print(f"   ⚠️ 等待渲染就绪超时（{timeout_ms}ms），继续截图")
+        return False
+
+
+async def wait_for_layout(page):
+    """等待两帧，确保修改视口或样式后的重新布局已经绘制"""
+    await page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+
+
 class AIWordSelector:
     """AI智能选词器"""
     
@@ -245,57 +386,15 @@ class AIWordSelector:
             return
         
         try:
-            from openai import OpenAI
-            import httpx
-            
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url,
-                http_client=httpx.Client(timeout=300.0)  # 增加到300秒（5分钟），给AI更多分析时间
-            )
+            # 进程级共享客户端，复用长连接（超时 300 秒，给AI更多分析时间）
+            self.client = get_openai_client(api_key, base_url)
             print(f"✅ AI客户端初始化成功 (模型: {self.model})")
         except Exception as e:
             print(f"⚠️ OpenAI客户端初始化失败: {e}")
     
-    def select_words(self, candidate_words, top_n=200):
-        """从候选词中智能选出10个年度热词"""
-        if not self.client:
-            print("❌ AI未启用，请配置OpenAI API Key")
-            return None
-        
-        # 准备候选词列表（取前top_n个）
-        candidates = candidate_words[:top_n]
-        
-        # 获取无意义词列表，用于AI参考
-        meaningless_words = list(cfg.FUNCTION_WORDS)[:50]  # 取前50个作为示例
-        meaningless_examples = '、'.join(meaningless_words[:20])  # 显示前20个作为示例
-        
-        # 构建候选词信息，包含更多上下文
-        words_info = []
-        for idx, word_data in enumerate(candidates, 1):
-            word = word_data['word']
-            freq = word_data['freq']
-            samples = word_data.get('samples', [])
-            
-            # 提供更多样本上下文（最多3个样本，每个最多40字符）
-            sample_texts = []
-            for sample in samples[:3]:
-                if sample:
-                    sample_texts.append(sample[:40])
-            
-            if sample_texts:
-                samples_preview = ' | '.join(sample_texts)
-            else:
-                samples_preview = '无样本'
-            
-            # 计算频率排名（用于AI参考）
-            rank_info = f"排名#{idx}"
-            
-            words_info.append(f"{idx}. {word} ({freq}次, {rank_info}) - 使用示例: {samples_preview}")
-        
-        words_text = '\n'.join(words_info)
-        
-        user_prompt = f"""请从以下{len(candidates)}个候选词中选出10个最适合作为年度热词的词汇：
+    def _build_user_prompt(self, candidate_count, words_text, meaningless_examples):
+        """构建选词请求的用户提示词"""
+        return f"""请从以下{candidate_count}个候选词中选出10个最适合作为年度热词的词汇：
 
 {words_text}
 
@@ -332,38 +431,66 @@ class AIWordSelector:
    - 确保选出的10个词都有实际意义和娱乐价值
 
 请仔细分析每个词的娱乐意义和群聊特色，严格过滤无意义词汇，选出最能代表这个群聊文化的10个词。"""
-
+    
+    def select_words(self, candidate_words, top_n=200, analyzer=None):
+        """
+        从候选词中智能选出10个年度热词
+        
+        Args:
+            analyzer: 可选 ChatAnalyzer，提供时会用于本地打分预筛选（突发性、新词等）
+        """
+        if not self.client:
+            print("❌ AI未启用，请配置OpenAI API Key")
+            return None
+        
+        # 准备候选词列表（取前top_n个），确定性预过滤功能词、ID类字符串和近似重复变体
+        candidates, dropped = prefilter_candidates(candidate_words[:top_n])
+        
+        # 本地打分预筛选，只把得分最高的词交给AI（AI_SELECT_SHORTLIST 为 0 时不筛选）
+        shortlist_size = ai_setting('AI_SELECT_SHORTLIST', 80)
+        if 0 < shortlist_size < len(candidates):
+            candidates = LocalWordSelector(analyzer).shortlist(candidates, shortlist_size)
+        
+        # 获取无意义词列表，用于AI参考
+        meaningless_words = list(cfg.FUNCTION_WORDS)[:50]  # 取前50个作为示例
+        meaningless_examples = '、'.join(meaningless_words[:20])  # 显示前20个作为示例
+        
+        # 固定部分（系统提示词 + 选词要求）之外的预算留给候选词列表，超出时逐级压缩例句
+        fixed_tokens = estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(
+            self._build_user_prompt(len(candidates), '', meaningless_examples)
+        )
+        token_budget = ai_setting('AI_SELECT_PROMPT_TOKEN_BUDGET', 6000)
+        words_text, candidates, compaction = build_candidate_section(
+            candidates, max(token_budget - fixed_tokens, 0)
+        )
+        user_prompt = self._build_user_prompt(len(candidates), words_text, meaningless_examples)
+        
+        print(f"   候选词 {min(len(candidate_words), top_n)} 个 → 预过滤和本地预筛选后 {len(candidates)} 个"
+              f"（功能词 {dropped['function_word']}、ID类 {dropped['id_like']}、"
+              f"符号 {dropped['symbol']}、重复变体 {dropped['variant']}）")
+        print(f"   提示词约 {fixed_tokens + compaction['tokens']} tokens（预算 {token_budget}，"
+              f"候选词列表 {compaction['tokens']}，每词例句 {compaction['samples_per_word']} 条"
+              f"×{compaction['sample_chars']} 字）")
+        
         try:
             print("🤖 AI正在分析并选择年度热词...")
-            response = self.client.chat.completions.create(
+            raw_result = cached_completion(
+                self.client,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
                 max_tokens=100,
-                temperature=0.7
+                temperature=0.7,
+                # 有效序号不足的响应不写入缓存，避免之后每次重新生成都重放同一个坏结果
+                validate=lambda text: len(parse_selected_indices(text, len(candidates))) >= min(10, len(candidates))
             )
             
-            # 清理响应中的思考过程
-            raw_result = response.choices[0].message.content.strip()
-            result = clean_ai_response(raw_result)
-            
-            # 如果清理后为空，使用原始结果
-            if not result:
-                result = raw_result
-            
-            print(f"   AI返回: {result}")
+            print(f"   AI返回: {clean_ai_response(raw_result) or raw_result}")
             
             # 解析序号
-            indices = []
-            for part in result.replace('，', ',').split(','):
-                try:
-                    idx = int(part.strip())
-                    if 1 <= idx <= len(candidates):
-                        indices.append(idx - 1)  # 转为0索引
-                except:
-                    continue
+            indices = parse_selected_indices(raw_result, len(candidates))
             
             if len(indices) < 10:
                 print(f"⚠️ AI只选出{len(indices)}个词，自动补充有意义的高频词...")
@@ -483,6 +610,9 @@ class AIUserPersonalityGenerator:
         base_url = os.getenv('OPENAI_BASE_URL', cfg.OPENAI_BASE_URL)
         self.model = os.getenv('OPENAI_MODEL', cfg.OPENAI_MODEL)
         
+        self.api_key = api_key
+        self.base_url = base_url
+        
         if not api_key or api_key == "sk-your-api-key-here":
             print("⚠️ 未配置OpenAI API Key，将跳过AI群友锐评")
             return
@@ -492,22 +622,13 @@ class AIUserPersonalityGenerator:
             return
         
         try:
-            from openai import OpenAI
-            import httpx
-            
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url if base_url else None,
-                http_client=httpx.Client(timeout=300.0)  # 增加到300秒（5分钟），给AI更多分析时间
-            )
+            # 进程级共享客户端，复用长连接（超时 300 秒，给AI更多分析时间）
+            self.client = get_openai_client(api_key, base_url)
         except Exception as e:
             print(f"⚠️ AI客户端初始化失败: {e}")
     
-    def generate_personality_comment(self, user_name, representative_words, user_stats=None):
-        """为单个群友生成性格和用词锐评"""
-        if not self.client:
-            return self._fallback_comment(user_name, representative_words)
-        
+    def _build_messages(self, user_name, representative_words, user_stats=None):
+        """构建群友锐评的请求消息"""
         # 构建词汇信息
         words_text = '、'.join([f"{w['word']}({w['count']}次)" for w in representative_words])
         top_words = [w['word'] for w in representative_words[:5]]
@@ -591,25 +712,34 @@ class AIUserPersonalityGenerator:
 - 重点关注用词特点、兴趣领域、性格特征，这些更有差异化
 - 直接输出锐评内容，不要加引号或其他格式。"""
 
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _postprocess(self, raw_content, user_name, representative_words):
+        """清理AI响应，无效时使用备用锐评"""
+        cleaned_content = clean_ai_response(raw_content) if raw_content else ''
+        if not cleaned_content or len(cleaned_content) < 5:
+            return self._fallback_comment(user_name, representative_words)
+        return cleaned_content
+    
+    def generate_personality_comment(self, user_name, representative_words, user_stats=None):
+        """为单个群友生成性格和用词锐评"""
+        if not self.client:
+            return self._fallback_comment(user_name, representative_words)
+        
         try:
-            # httpx.Client的timeout已经设置为300秒（5分钟），确保AI有足够时间完成分析
-            response = self.client.chat.completions.create(
+            # 共享客户端的timeout默认300秒（5分钟，AI_HTTP_TIMEOUT），确保AI有足够时间完成分析
+            raw_content = cached_completion(
+                self.client,
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=self._build_messages(user_name, representative_words, user_stats),
                 max_tokens=400,  # 增加token数量，支持分段和更详细的点评
-                temperature=0.9  # 提高温度，让输出更有创意
+                temperature=0.9,  # 提高温度，让输出更有创意
+                validate=is_valid_ai_text
             )
-            
-            raw_content = response.choices[0].message.content.strip()
-            cleaned_content = clean_ai_response(raw_content)
-            
-            if not cleaned_content or len(cleaned_content) < 5:
-                return self._fallback_comment(user_name, representative_words)
-            
-            return cleaned_content
+            return self._postprocess(raw_content, user_name, representative_words)
         except Exception as e:
             print(f"   ⚠️ AI生成失败({user_name}): {e}")
             return self._fallback_comment(user_name, representative_words)
@@ -620,14 +750,51 @@ class AIUserPersonalityGenerator:
         words_str = '、'.join(words_list[:3])
         return f"用词如{words_list[0] if words_list else '谜'}，风格独特，群聊中的{words_list[1] if len(words_list) > 1 else '独特'}存在"
     
-    def generate_batch(self, users_data):
-        """批量生成群友锐评"""
+    def generate_batch(self, users_data, on_result=None):
+        """
+        批量生成群友锐评
+        
+        Args:
+            on_result: 可选回调 on_result(name, comment)，每生成一条锐评调用一次（用于流式推送）
+        """
         if not self.client:
             print("⚠️ AI未启用，使用默认群友锐评")
-            return {u['name']: self._fallback_comment(u['name'], u['words']) for u in users_data}
+            comments = {u['name']: self._fallback_comment(u['name'], u['words']) for u in users_data}
+            if on_result:
+                for name, comment in comments.items():
+                    on_result(name, comment)
+            return comments
         
         print("🤖 正在生成AI群友性格锐评...")
-        print(f"   总共需要生成 {len(users_data)} 个用户的锐评，预计需要 {len(users_data) * 30} 秒")
+        print(f"   总共需要生成 {len(users_data)} 个用户的锐评")
+        
+        # 并发生成，引擎不可用时退回逐个生成
+        jobs = [
+            ChatJob(u['name'], self._build_messages(u['name'], u['words'], u.get('stats')), 400, 0.9,
+                    validate=is_valid_ai_text)
+            for u in users_data
+        ]
+        users_by_name = {u['name']: u for u in users_data}
+        processed = {}  # 每条结果只后处理一次，推送和返回的内容保持一致
+        
+        def handle_result(name, text):
+            comment = processed[name] = self._postprocess(text, name, users_by_name[name]['words'])
+            if on_result:
+                on_result(name, comment)
+        
+        try:
+            runner = AsyncBatchRunner(self.api_key, self.base_url, self.model)
+            results = runner.run_sync(jobs, on_result=handle_result)
+            comments = {
+                u['name']: processed.get(u['name']) or self._postprocess(results.get(u['name']), u['name'], u['words'])
+                for u in users_data
+            }
+            succeeded = sum(1 for text in results.values() if text)
+            print(f"✅ 完成！AI生成 {succeeded} 个锐评，备用锐评 {len(comments) - succeeded} 个")
+            return comments
+        except Exception as e:
+            print(f"⚠️ 并发生成失败，改为逐个生成: {e}")
+        
         comments = {}
         for i, user_info in enumerate(users_data, 1):
             user_name = user_info['name']
@@ -644,6 +811,8 @@ class AIUserPersonalityGenerator:
                 print(f"✗ (失败: {str(e)[:50]})")
                 # 失败时使用备用锐评
                 comments[user_name] = self._fallback_comment(user_name, user_info['words'])
+            if on_result:
+                on_result(user_name, comments[user_name])
         
         print(f"✅ 完成！成功生成 {len(comments)} 个锐评")
         return comments
@@ -679,6 +848,9 @@ class AICommentGenerator:
         base_url = os.getenv('OPENAI_BASE_URL', cfg.OPENAI_BASE_URL)
         self.model = os.getenv('OPENAI_MODEL', cfg.OPENAI_MODEL)
         
+        self.api_key = api_key
+        self.base_url = base_url
+        
         if not api_key or api_key == "sk-your-api-key-here":
             print("⚠️ 未配置OpenAI API Key，将跳过AI锐评")
             return
@@ -688,14 +860,8 @@ class AICommentGenerator:
             return
         
         try:
-            from openai import OpenAI
-            import httpx
-            
-            self.client = OpenAI(
-                api_key=api_key,
-                base_url=base_url if base_url else None,  # 如果为空则使用默认
-                http_client=httpx.Client(timeout=300.0)  # 增加到300秒（5分钟），给AI更多分析时间
-            )
+            # 进程级共享客户端，复用长连接（超时 300 秒，给AI更多分析时间）
+            self.client = get_openai_client(api_key, base_url)
             
             # 显示配置信息
             api_provider = "DeepSeek" if "deepseek" in (base_url or "").lower() else "OpenAI"
@@ -708,11 +874,8 @@ class AICommentGenerator:
         except Exception as e:
             print(f"⚠️ AI客户端初始化失败: {e}")
     
-    def generate_comment(self, word, freq, samples):
-        """为单个词生成锐评"""
-        if not self.client:
-            return self._fallback_comment(word)
-        
+    def _build_messages(self, word, freq, samples):
+        """构建热词锐评的请求消息"""
         # 构建用户提示
         samples_text = '\n'.join(f'- {s[:50]}' for s in samples[:5]) if samples else '无'
         
@@ -725,27 +888,34 @@ class AICommentGenerator:
 
 直接输出锐评内容，不要加引号或其他格式。"""
 
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _postprocess(self, raw_content, word):
+        """清理响应中的思考过程，为空或太短时使用备用"""
+        cleaned_content = clean_ai_response(raw_content) if raw_content else ''
+        if not cleaned_content or len(cleaned_content) < 5:
+            return self._fallback_comment(word)
+        return cleaned_content
+    
+    def generate_comment(self, word, freq, samples):
+        """为单个词生成锐评"""
+        if not self.client:
+            return self._fallback_comment(word)
+        
         try:
             # 尝试调用API，如果失败则降级处理
-            response = self.client.chat.completions.create(
+            raw_content = cached_completion(
+                self.client,
                 model=self.model,  # 使用实例变量
-                messages=[
-                    {"role": "system", "content": self.SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=self._build_messages(word, freq, samples),
                 max_tokens=150,
-                temperature=0.8
+                temperature=0.8,
+                validate=is_valid_ai_text
             )
-            
-            # 清理响应中的思考过程
-            raw_content = response.choices[0].message.content.strip()
-            cleaned_content = clean_ai_response(raw_content)
-            
-            # 如果清理后为空或太短，使用备用
-            if not cleaned_content or len(cleaned_content) < 5:
-                return self._fallback_comment(word)
-            
-            return cleaned_content
+            return self._postprocess(raw_content, word)
         except Exception as e:
             print(f"   ⚠️ AI生成失败({word}): {e}")
             return self._fallback_comment(word)
@@ -762,14 +932,151 @@ class AICommentGenerator:
         import random
         return random.choice(fallbacks)
     
-    def generate_batch(self, words_data):
-        """批量生成锐评"""
+    def _build_batch_messages(self, words_data):
+        """构建一次请求生成全部热词锐评的消息（要求返回JSON数组）"""
+        words_info = []
+        for idx, word_info in enumerate(words_data, 1):
+            samples = [s[:50] for s in word_info.get('samples', [])[:3] if s]
+            samples_text = ' | '.join(samples) if samples else '无'
+            words_info.append(f"{idx}. 词语：{word_info['word']}（{word_info['freq']}次）使用样本：{samples_text}")
+        
+        user_prompt = f"""请为以下{len(words_data)}个群聊热词分别生成一句锐评：
+
+{chr(10).join(words_info)}
+
+输出格式：只输出一个JSON数组，不要有其他文字，每个元素对应一个词：
+[{{"id": 序号, "word": "词语", "comment": "锐评"}}]"""
+
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _parse_batch_response(self, raw_content, words_data):
+        """解析并校验JSON数组，返回 {word: comment}，只包含有效条目"""
+        if not raw_content:
+            return {}
+        
+        # 去掉 ```json 代码块等包裹，只取最外层的数组
+        start = raw_content.find('[')
+        end = raw_content.rfind(']')
+        if start < 0 or end <= start:
+            return {}
+        try:
+            items = json.loads(raw_content[start:end + 1])
+        except ValueError:
+            return {}
+        if not isinstance(items, list):
+            return {}
+        
+        words = [w['word'] for w in words_data]
+        comments = {}
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('comment'), str):
+                continue
+            # 优先按序号对应，序号无效时按词语对应
+            word = None
+            idx = item.get('id')
+            if isinstance(idx, int) and 1 <= idx <= len(words):
+                word = words[idx - 1]
+            elif item.get('word') in words:
+                word = item['word']
+            if not word or word in comments:
+                continue
+            comment = clean_ai_response(item['comment'].strip())
+            if comment and len(comment) >= 5:
+                comments[word] = comment
+        return comments
+    
+    def generate_batch_single_call(self, words_data, on_result=None):
+        """
+        一次请求生成全部热词锐评，缺失或格式错误的词再单独请求一次
+        
+        Args:
+            on_result: 可选回调 on_result(word, comment)，每解析出一条锐评调用一次
+        
+        Returns:
+            {word: comment}，只包含AI成功生成的词
+        """
+        comments = {}
+        pending = list(words_data)
+        for attempt in range(2):
+            try:
+                raw_content = cached_completion(
+                    self.client,
+                    model=self.model,
+                    messages=self._build_batch_messages(pending),
+                    max_tokens=100 * len(pending) + 100,
+                    temperature=0.8,
+                    validate=lambda text, words=pending: bool(self._parse_batch_response(text, words))
+                )
+                parsed = self._parse_batch_response(raw_content, pending)
+                comments.update(parsed)
+                if on_result:
+                    for word, comment in parsed.items():
+                        on_result(word, comment)
+            except Exception as e:
+                print(f"   ⚠️ 批量生成锐评失败: {e}")
+                break
+            
+            pending = [w for w in words_data if w['word'] not in comments]
+            if not pending:
+                break
+            if attempt == 0:
+                print(f"   {len(pending)} 个词的锐评缺失或格式错误，重新请求...")
+        
+        print(f"   批量生成锐评 {len(comments)}/{len(words_data)} 个")
+        return comments
+    
+    def generate_batch(self, words_data, on_result=None):
+        """
+        批量生成锐评
+        
+        Args:
+            on_result: 可选回调 on_result(word, comment)，每生成一条锐评调用一次（用于流式推送）
+        """
         if not self.client:
             print("⚠️ AI未启用，使用默认锐评")
-            return {w['word']: self._fallback_comment(w['word']) for w in words_data}
+            comments = {w['word']: self._fallback_comment(w['word']) for w in words_data}
+            if on_result:
+                for word, comment in comments.items():
+                    on_result(word, comment)
+            return comments
         
         print("🤖 正在生成AI锐评...")
         comments = {}
+        
+        # 默认一次请求生成全部锐评，剩余的词再逐词生成
+        if ai_setting('AI_COMMENT_SINGLE_CALL', True):
+            comments = self.generate_batch_single_call(words_data, on_result=on_result)
+            words_data = [w for w in words_data if w['word'] not in comments]
+            if not words_data:
+                return comments
+        
+        # 并发生成，引擎不可用时退回逐个生成
+        jobs = [
+            ChatJob(w['word'], self._build_messages(w['word'], w['freq'], w.get('samples', [])), 150, 0.8,
+                    validate=is_valid_ai_text)
+            for w in words_data
+        ]
+        processed = {}  # 每条结果只后处理一次（备用锐评随机选取），推送和返回的内容保持一致
+        
+        def handle_result(word, text):
+            comment = processed[word] = self._postprocess(text, word)
+            if on_result:
+                on_result(word, comment)
+        
+        try:
+            runner = AsyncBatchRunner(self.api_key, self.base_url, self.model)
+            results = runner.run_sync(jobs, on_result=handle_result)
+            comments.update({
+                w['word']: processed.get(w['word']) or self._postprocess(results.get(w['word']), w['word'])
+                for w in words_data
+            })
+            return comments
+        except Exception as e:
+            print(f"⚠️ 并发生成失败，改为逐个生成: {e}")
+        
         for i, word_info in enumerate(words_data, 1):
             word = word_info['word']
             print(f"   [{i}/{len(words_data)}] {word}...", end=' ')
@@ -780,6 +1087,8 @@ class AICommentGenerator:
             )
             comments[word] = comment
             print(f"✓")
+            if on_result:
+                on_result(word, comment)
         
         return comments
 
@@ -1142,6 +1451,34 @@ class ImageGenerator:
                 for u in self.user_representative_words
             }
     
+    def _embed_avatars(self, data):
+        """并发下载模板数据中的所有头像并替换为base64，截图时不再等待网络"""
+        if not getattr(cfg, 'EMBED_AVATARS', True):
+            return
+        # 走后端头像缓存时头像由 /api/avatar 提供，不需要内嵌
+        if os.getenv('AVATAR_PROXY_URL', getattr(cfg, 'AVATAR_PROXY_URL', '')):
+            return
+        
+        entries = []
+        for ranking in data.get('rankings', []):
+            if ranking.get('first'):
+                entries.append(ranking['first'])
+            entries.extend(ranking.get('others', []))
+        if data.get('champion'):
+            entries.append(data['champion'])
+        entries.extend(data.get('user_personalities', []))
+        
+        uins = [str(e.get('uin', '')) for e in entries if e.get('uin')]
+        if not uins:
+            return
+        
+        avatars = download_avatars_to_base64(uins)
+        for entry in entries:
+            avatar = avatars.get(str(entry.get('uin', '')))
+            if avatar:
+                entry['avatar'] = avatar
+        print(f"   头像已内嵌: {len(avatars)}/{len(set(uins))}")
+    
     def generate_html(self):
         """生成HTML"""
         if not self.selected_words:
@@ -1166,6 +1503,7 @@ class ImageGenerator:
         
         template = env.get_template('report_template.html')
         data = self._prepare_template_data()
+        self._embed_avatars(data)
         html_content = template.render(**data)
         
         safe_name = sanitize_filename(self.json_data.get('chatName', '未知'))
@@ -1210,65 +1548,13 @@ class ImageGenerator:
             file_url = f'file://{os.path.abspath(html_path).replace(os.sep, "/")}'
             await page.goto(file_url, wait_until='domcontentloaded', timeout=30000)
             
-            # 等待所有图片真正加载完成（包括头像）
-            print("   等待图片加载...")
-            try:
-                # 更完善的图片加载等待逻辑
-                await page.evaluate("""
-                    async () => {
-                        const images = Array.from(document.images);
-                        const promises = images.map((img, index) => {
-                            return new Promise((resolve) => {
-                                // 如果图片已经加载完成
-                                if (img.complete && img.naturalHeight !== 0) {
-                                    resolve();
-                                    return;
-                                }
-                                
-                                // 监听加载成功
-                                img.onload = () => resolve();
-                                
-                                // 监听加载失败（也继续，避免卡住）
-                                img.onerror = () => {
-                                    console.warn('图片加载失败:', img.src);
-                                    resolve();
-                                };
-                                
-                                // 超时保护（5秒）
-                                setTimeout(() => {
-                                    console.warn('图片加载超时:', img.src);
-                                    resolve();
-                                }, 5000);
-                                
-                                // 如果src为空或无效，立即resolve
-                                if (!img.src || img.src === 'undefined' || img.src.startsWith('data:')) {
-                                    resolve();
-                                }
-                            });
-                        });
-                        
-                        await Promise.all(promises);
-                        
-                        // 额外等待确保渲染完成
-                        await new Promise(resolve => setTimeout(resolve, 500));
-                    }
-                """)
-            except Exception as e:
-                print(f"   图片加载等待出现异常（继续执行）: {e}")
-            
-            # 等待网络空闲（确保所有资源加载完成）
-            try:
-                await page.wait_for_load_state('networkidle', timeout=15000)
-            except:
-                # 如果超时，继续执行
-                pass
-            
-            # 额外等待确保渲染完成
-            await page.wait_for_timeout(1000)
+            # 等待模板设置渲染就绪标志（图片、字体加载完成），代替固定延时
+            print("   等待页面渲染就绪...")
+            await wait_for_render_ready(page)
             
             height = await page.evaluate('document.body.scrollHeight')
             await page.set_viewport_size({'width': 450, 'height': height + 50})
-            await page.wait_for_timeout(500)
+            await wait_for_layout(page)
             
             # 验证图片是否加载（调试用）
             loaded_images = await page.evaluate("""
@@ -1359,6 +1645,7 @@ class ImageGenerator:
             'message_count': self.json_data.get('messageCount', 0),
             'user_personalities': processed_users
         }
+        self._embed_avatars(data)
         
         html_content = template.render(**data)
         
@@ -1401,74 +1688,16 @@ class ImageGenerator:
             file_url = f'file://{os.path.abspath(html_path).replace(os.sep, "/")}'
             await page.goto(file_url, wait_until='domcontentloaded', timeout=30000)
             
-            # 等待所有图片真正加载完成（包括头像）
-            # 由于头像已转换为base64嵌入HTML，加载会更快更可靠
-            print("   等待图片加载...")
-            try:
-                # 更完善的图片加载等待逻辑
-                await page.evaluate("""
-                    async () => {
-                        const images = Array.from(document.images);
-                        if (images.length === 0) {
-                            return;
-                        }
-                        
-                        const promises = images.map((img) => {
-                            return new Promise((resolve) => {
-                                // 如果图片已经加载完成（包括base64图片）
-                                if (img.complete && img.naturalHeight !== 0) {
-                                    resolve();
-                                    return;
-                                }
-                                
-                                // base64图片通常立即加载完成
-                                if (img.src && img.src.startsWith('data:')) {
-                                    // 给base64图片一点时间渲染
-                                    setTimeout(() => resolve(), 100);
-                                    return;
-                                }
-                                
-                                // 监听加载成功
-                                img.onload = () => resolve();
-                                
-                                // 监听加载失败（也继续，避免卡住）
-                                img.onerror = () => {
-                                    resolve();  // 失败也继续
-                                };
-                                
-                                // 超时保护（3秒，base64图片应该很快）
-                                setTimeout(() => {
-                                    resolve();
-                                }, 3000);
-                            });
-                        });
-                        
-                        await Promise.all(promises);
-                        
-                        // 额外等待确保渲染完成
-                        await new Promise(resolve => setTimeout(resolve, 300));
-                    }
-                """)
-            except Exception as e:
-                print(f"   图片加载等待出现异常（继续执行）: {e}")
-            
-            # 等待网络空闲（确保所有资源加载完成）
-            # base64图片不需要网络，所以这个等待会很快
-            try:
-                await page.wait_for_load_state('networkidle', timeout=10000)
-            except:
-                # 如果超时，继续执行（base64图片不需要网络）
-                pass
-            
-            # 额外等待确保渲染完成
-            await page.wait_for_timeout(500)
+            # 等待模板设置渲染就绪标志（头像已转为base64，通常很快就绪）
+            print("   等待页面渲染就绪...")
+            await wait_for_render_ready(page)
             
             # 获取实际内容高度
             height = await page.evaluate('document.body.scrollHeight')
             await page.set_viewport_size({'width': 900, 'height': height + 50})
             
-            # 再次等待确保布局稳定
-            await page.wait_for_timeout(500)
+            # 等待重新布局完成
+            await wait_for_layout(page)
             
             # 验证图片是否加载（调试用）
             loaded_images = await page.evaluate("""
@@ -1540,11 +1769,11 @@ class ImageGenerator:
                 self.ai_selector = AIWordSelector()
             
             # AI选词
-            self.selected_words = self.ai_selector.select_words(top_words, top_n=200)
+            self.selected_words = self.ai_selector.select_words(top_words, top_n=200, analyzer=self.analyzer)
             
             if not self.selected_words:
-                print("⚠️ AI选词失败，改用自动选择前10个")
-                self.selected_words = top_words[:10]
+                print("⚠️ AI选词失败，改用本地选词")
+                self.selected_words = LocalWordSelector(self.analyzer).select_words(top_words, top_n=200)
         
         # 简单自动选择模式
         elif auto_select or non_interactive:
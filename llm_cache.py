@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+LLM 响应持久化缓存
+
+重新生成报告、或对同一份上传重复选词时，AI选词、热词锐评、群友锐评的请求内容完全相同，
+却每次都重新调用模型。这里用 SQLite 按 (模型, 消息内容, temperature, max_tokens) 的哈希缓存响应，
+支持过期时间和容量淘汰，可通过 LLM_CACHE_ENABLED 关闭。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from ai_batch import ai_setting
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'runtime_outputs', 'llm_cache.sqlite3')
+
+
+def prompt_fingerprint(model, messages, temperature, max_tokens):
+    """请求指纹：相同模型、相同消息、相同采样参数视为同一请求"""
+    payload = json.dumps({
+        'model': model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """基于 SQLite 的 LLM 响应缓存（线程安全）"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=30 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used)')
+        self._conn.commit()
+
+    def get(self, model, messages, temperature, max_tokens):
+        """查询缓存，未命中或已过期返回 None"""
+        key = prompt_fingerprint(model, messages, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row and (self.ttl_seconds <= 0 or now - row[1] < self.ttl_seconds):
+                self._conn.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (now, key))
+                self._conn.commit()
+                self.hits += 1
+                return row[0]
+            if row:
+                self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                self._conn.commit()
+            self.misses += 1
+            return None
+
+    def put(self, model, messages, temperature, max_tokens, response):
+        """写入缓存，超过条目上限时淘汰最久未使用的记录"""
+        if not response:
+            return
+        key = prompt_fingerprint(model, messages, temperature, max_tokens)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, model, response, now, now)
+            )
+            if self.max_entries > 0:
+                self._conn.execute("""
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                    )
+                """, (self.max_entries,))
+            self._conn.commit()
+
+    def get_stats(self):
+        """获取缓存统计"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+
+_llm_cache = None
+_llm_cache_failed = False
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """获取进程级 LLM 缓存，关闭或初始化失败时返回 None"""
+    global _llm_cache, _llm_cache_failed
+    if _llm_cache_failed or not ai_setting('LLM_CACHE_ENABLED', True):
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None and not _llm_cache_failed:
+            try:
+                _llm_cache = LLMCache(
+                    path=ai_setting('LLM_CACHE_PATH', '') or DEFAULT_CACHE_PATH,
+                    ttl_seconds=int(ai_setting('LLM_CACHE_TTL_HOURS', 720.0) * 3600),
+                    max_entries=ai_setting('LLM_CACHE_MAX_ENTRIES', 5000),
+                )
+            except Exception as e:
+                print(f"⚠️ LLM缓存初始化失败，将不使用缓存: {e}")
+                _llm_cache_failed = True
+        return _llm_cache
+
+
+def cached_completion(client, model, messages, max_tokens, temperature, validate=None):
+    """
+    带缓存的同步 chat completion
+
+    Args:
+        validate: 可选校验函数 validate(text) -> bool，校验不通过的响应不写入缓存
+
+    Returns:
+        响应文本（已 strip），请求异常时向上抛出
+    """
+    cache = get_llm_cache()
+    if cache:
+        cached = cache.get(model, messages, temperature, max_tokens)
+        if cached is not None:
+            return cached
+
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        max_tokens=max_tokens,
+        temperature=temperature
+    )
+    content = (response.choices[0].message.content or '').strip()
+
+    if cache and (validate is None or validate(content)):
+        cache.put(model, messages, temperature, max_tokens, content)
+    return content
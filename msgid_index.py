@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+消息 ID → 发送者 的紧凑索引（用于回复统计时找到被回复的人）
+
+原来 _build_mappings 用 {messageId 字符串: uin 字符串} 的 dict 保存每一条消息，
+几百万条消息时仅这个 dict 就要占用数百 MB，而它只在解析 referencedMessageId 时用到。
+这里改为两列定长数组：
+- 消息 ID：QQ 导出的 messageId 是数字字符串，直接存为 64 位无符号整数；
+  非数字的 ID 用 blake2b 取 8 字节摘要存入另一张表（碰撞概率可以忽略）
+- 发送者：uin 映射为连续的整数编号，存为 32 位无符号整数
+构建时只追加，第一次查询前排序一次，查询用二分查找。
+同一个消息 ID 出现多次时以最后一次为准（与原来 dict 的覆盖行为一致）。
+"""
+
+import hashlib
+from array import array
+from bisect import bisect_right
+
+# 尝试导入numpy（排序大量 ID 时使用，没有时用内置排序）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+_UINT64_MAX = (1 << 64) - 1
+
+
+def _hash_key(msg_id):
+    """非数字 ID 的 64 位摘要"""
+    return int.from_bytes(hashlib.blake2b(msg_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class _SortedTable:
+    """一张 (64 位键, 32 位值) 的表：追加后排序，二分查找"""
+
+    def __init__(self):
+        self.keys = array('Q')
+        self.values = array('I')
+        self._sorted = True
+
+    def append(self, key, value):
+        self.keys.append(key)
+        self.values.append(value)
+        self._sorted = False
+
+    def freeze(self):
+        """按键稳定排序（相同键保持追加顺序，查找时取最后一个）"""
+        if self._sorted:
+            return
+        if NUMPY_AVAILABLE:
+            keys = np.frombuffer(self.keys, dtype=np.uint64)
+            order = np.argsort(keys, kind='stable')
+            self.keys = array('Q', keys[order].tobytes())
+            self.values = array('I', np.frombuffer(self.values, dtype=np.uint32)[order].tobytes())
+        else:
+            order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+            self.keys = array('Q', [self.keys[i] for i in order])
+            self.values = array('I', [self.values[i] for i in order])
+        self._sorted = True
+
+    def get(self, key):
+        self.freeze()
+        idx = bisect_right(self.keys, key) - 1
+        if idx >= 0 and self.keys[idx] == key:
+            return self.values[idx]
+        return None
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class MessageIdIndex:
+    """messageId → 发送者 uin"""
+
+    def __init__(self):
+        self.uins = []  # 编号 → uin
+        self.uin_to_id = {}  # uin → 编号
+        self._numeric = _SortedTable()
+        self._hashed = _SortedTable()
+
+    @staticmethod
+    def _locate(msg_id):
+        """(是否数字 ID, 64 位键)"""
+        text = str(msg_id)
+        if text.isascii() and text.isdigit():
+            key = int(text)
+            if key <= _UINT64_MAX:
+                return True, key
+        return False, _hash_key(text)
+
+    def add(self, msg_id, uin):
+        """记录一条消息的发送者"""
+        if not msg_id or not uin:
+            return
+        user_id = self.uin_to_id.get(uin)
+        if user_id is None:
+            user_id = self.uin_to_id[uin] = len(self.uins)
+            self.uins.append(uin)
+        numeric, key = self._locate(msg_id)
+        (self._numeric if numeric else self._hashed).append(key, user_id)
+
+    def get(self, msg_id, default=None):
+        """被回复消息的发送者 uin，未知时返回 default"""
+        if not msg_id:
+            return default
+        numeric, key = self._locate(msg_id)
+        user_id = (self._numeric if numeric else self._hashed).get(key)
+        return self.uins[user_id] if user_id is not None else default
+
+    def __contains__(self, msg_id):
+        return self.get(msg_id) is not None
+
+    def __len__(self):
+        return len(self._numeric) + len(self._hashed)
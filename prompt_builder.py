@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+AI选词提示词构建（按 token 预算压缩）
+
+原来 AIWordSelector 把前 200 个候选词、每个词 3 条 40 字的例句全部塞进提示词，
+提示词越长，选词越慢越贵。这里在构建提示词时：
+1. 确定性地预过滤候选词：功能词 / 黑名单、ID 类字符串（QQ号、链接残片、长串字母数字）、
+   近似重复的变体（哈哈哈哈 / 哈哈哈、大小写不同的英文词），保留词频最高的那个
+2. 例句跨词去重：同一句话只在第一次出现时展示
+3. 超出预算时逐级压缩：例句条数 3→2→1、例句长度 40→28→16（以词所在位置为中心截取），
+   仍然超出时从末尾丢弃低频候选词
+并返回各部分的 token 估算，便于观察压缩效果。
+"""
+
+import re
+import config as cfg
+from utils import is_emoji
+
+# 按预算逐级尝试的 (每词例句数, 每条例句字数)
+COMPACTION_LEVELS = [(3, 40), (2, 40), (2, 28), (1, 28), (1, 16), (0, 0)]
+
+# ID 类字符串：5位以上纯数字（QQ号、群号）、连续6位以上字母数字混合、网址残片
+_ID_LIKE_PATTERNS = [
+    re.compile(r'^\d{5,}$'),
+    re.compile(r'^(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9_\-]{6,}$'),
+    re.compile(r'^(https?|www|com|cn|html?)$', re.IGNORECASE),
+]
+_SYMBOLS_ONLY = re.compile(r'^[\d\W_]+$')
+_REPEAT_RUN = re.compile(r'(.)\1{2,}')
+_CJK = re.compile(r'[㐀-鿿豈-﫿　-〿＀-￯]')
+
+
+def estimate_tokens(text):
+    """
+    粗略估算 token 数（不依赖具体分词器）
+    中日韩字符和全角标点约 1 个 token，其他字符约 4 个一个 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def is_id_like(word):
+    """是否是 QQ号、链接残片之类没有选词意义的字符串"""
+    return any(p.match(word) for p in _ID_LIKE_PATTERNS)
+
+
+def variant_key(word):
+    """近似重复判定键：小写、连续重复 3 次以上的字符压缩为 2 个"""
+    return _REPEAT_RUN.sub(r'\1\1', word.lower())
+
+
+def prefilter_candidates(candidates):
+    """
+    确定性预过滤候选词（保持原有顺序，白名单词总是保留）
+
+    Returns:
+        (保留的候选词列表, {原因: 过滤数量})
+    """
+    kept = []
+    seen_variants = set()
+    dropped = {'function_word': 0, 'id_like': 0, 'symbol': 0, 'variant': 0}
+
+    for word_data in candidates:
+        word = word_data['word']
+        if word not in cfg.WHITELIST:
+            if word in cfg.FUNCTION_WORDS or word in cfg.BLACKLIST:
+                dropped['function_word'] += 1
+                continue
+            if is_id_like(word):
+                dropped['id_like'] += 1
+                continue
+            if _SYMBOLS_ONLY.match(word) and not any(is_emoji(c) for c in word):
+                dropped['symbol'] += 1
+                continue
+        key = variant_key(word)
+        if key in seen_variants:
+            dropped['variant'] += 1
+            continue
+        seen_variants.add(key)
+        kept.append(word_data)
+
+    return kept, dropped
+
+
+def clip_sample(sample, word, max_chars):
+    """截取例句，以词出现的位置为中心，保证截取后仍包含该词"""
+    sample = ' '.join(sample.split())
+    if len(sample) <= max_chars:
+        return sample
+    pos = sample.find(word)
+    if pos < 0:
+        return sample[:max_chars] + '…'
+    start = max(0, min(pos + len(word) // 2 - max_chars // 2, len(sample) - max_chars))
+    clipped = sample[start:start + max_chars]
+    return ('…' if start > 0 else '') + clipped + ('…' if start + max_chars < len(sample) else '')
+
+
+def _format_candidates(candidates, samples_per_word, sample_chars):
+    """生成候选词列表文本，例句跨词去重"""
+    lines = []
+    seen_samples = set()
+    for idx, word_data in enumerate(candidates, 1):
+        word = word_data['word']
+        sample_texts = []
+        if samples_per_word > 0:
+            for sample in word_data.get('samples', []):
+                if len(sample_texts) >= samples_per_word:
+                    break
+                if not sample:
+                    continue
+                normalized = ' '.join(sample.split())
+                if normalized in seen_samples:
+                    continue
+                seen_samples.add(normalized)
+                sample_texts.append(clip_sample(normalized, word, sample_chars))
+
+        line = f"{idx}. {word} ({word_data['freq']}次)"
+        if sample_texts:
+            line += f" - 例: {' | '.join(sample_texts)}"
+        lines.append(line)
+    return lines
+
+
+def build_candidate_section(candidates, token_budget):
+    """
+    在 token 预算内生成候选词列表
+
+    Args:
+        candidates: 已预过滤的候选词
+        token_budget: 候选词列表可用的 token 数
+
+    Returns:
+        (候选词列表文本, 实际使用的候选词, {'samples_per_word', 'sample_chars', 'tokens'})
+    """
+    lines = []
+    for samples_per_word, sample_chars in COMPACTION_LEVELS:
+        lines = _format_candidates(candidates, samples_per_word, sample_chars)
+        tokens = estimate_tokens('\n'.join(lines))
+        if tokens <= token_budget:
+            return '\n'.join(lines), candidates, {
+                'samples_per_word': samples_per_word, 'sample_chars': sample_chars, 'tokens': tokens
+            }
+
+    # 去掉例句仍然超出预算：从末尾（低频）丢弃候选词，至少保留 10 个
+    tokens = 0
+    count = 0
+    for line in lines:
+        line_tokens = estimate_tokens(line) + 1
+        if tokens + line_tokens > token_budget and count >= 10:
+            break
+        tokens += line_tokens
+        count += 1
+    return '\n'.join(lines[:count]), candidates[:count], {
+        'samples_per_word': 0, 'sample_chars': 0, 'tokens': tokens
+    }
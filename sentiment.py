@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+情感分析
+
+原来 analyze_sentiment 对每条消息逐个执行 `keyword in text`，每条消息约 80 次子串扫描，
+百万条消息就是数千万次扫描。这里把正负向关键词编译成一个匹配器：
+- 安装了 pyahocorasick 时使用 Aho-Corasick 自动机（C 实现）
+- 否则按关键词首字符建索引：先取文本字符集与首字符集的交集（一次 C 层扫描），
+  只对首字符出现过的少数关键词做子串检查，结果与逐个 `in` 完全一致
+关键词带权重，可以在 config.py 中用 SENTIMENT_POSITIVE_KEYWORDS / SENTIMENT_NEGATIVE_KEYWORDS 扩展。
+
+批量接口：score_batch(texts) → [-1, 1] 的连续情感分（正数偏正向，负数偏负向），两种后端：
+- LexiconBackend：上面的关键词词典（默认）
+- LocalModelBackend：本地 CPU 分类模型（scikit-learn 的 .pkl/.joblib 或 ONNX），
+  按批向量化推理，多进程并行；需要额外安装 scikit-learn / onnxruntime
+通过 config.py 的 SENTIMENT_BACKEND / SENTIMENT_MODEL_PATH 选择。
+"""
+
+import os
+import atexit
+import pickle
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import config as cfg
+
+# 尝试导入 pyahocorasick
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    ahocorasick = None
+
+
+# 默认关键词（与原 analyze_sentiment 相同；重复出现的词权重累加，保持原有计分）
+DEFAULT_POSITIVE_KEYWORDS = [
+    '好', '棒', '赞', '厉害', '优秀', '完美', '喜欢', '爱', '开心', '高兴', '快乐', '幸福',
+    '不错', '可以', '支持', '同意', '对', '正确', 'nice', 'good', 'great', 'awesome',
+    '哈哈', 'hhh', 'hh', '233', '666', '👍', '😊', '😄', '😁', '😆', '😃', '😍', '❤️',
+    '牛逼', '666', '太棒了', '太好了', '真不错', '真棒', '厉害', '强', '👍'
+]
+
+DEFAULT_NEGATIVE_KEYWORDS = [
+    '不好', '差', '烂', '垃圾', '讨厌', '烦', '生气', '愤怒', '难过', '伤心', '失望',
+    '不行', '不对', '错误', '坏', '糟糕', '差劲', '无语', '服了', 'bad', 'terrible',
+    '😢', '😭', '😤', '😠', '😡', '💔', '😞', '😔', '😩', '😫',
+    '傻逼', 'sb', '垃圾', '废物', '滚', '去死', '烦死了', '气死了'
+]
+
+
+def _to_weights(keywords):
+    """关键词列表或 {关键词: 权重} 转换为 Counter（关键词统一小写）"""
+    weights = Counter()
+    if isinstance(keywords, dict):
+        for keyword, weight in keywords.items():
+            if keyword:
+                weights[keyword.lower()] += float(weight)
+    else:
+        for keyword in keywords or ():
+            if keyword:
+                weights[keyword.lower()] += 1.0
+    return weights
+
+
+class KeywordMatcher:
+    """一次扫描找出文本中出现的所有关键词（允许重叠）"""
+
+    def __init__(self, keywords):
+        self.keywords = sorted(set(keywords), key=lambda k: (-len(k), k))
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # 按首字符分组：只检查首字符在文本中出现过的关键词
+            by_first_char = {}
+            for keyword in self.keywords:
+                by_first_char.setdefault(keyword[0], []).append(keyword)
+            self._by_first_char = by_first_char
+            self._first_chars = frozenset(by_first_char)
+
+    def find(self, text):
+        """返回文本中出现过的关键词集合"""
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+        return {
+            keyword
+            for ch in self._first_chars.intersection(text)
+            for keyword in self._by_first_char[ch]
+            if keyword in text
+        }
+
+
+class SentimentLexicon:
+    """带权重的情感词典，每条消息一次扫描"""
+
+    def __init__(self, positive=None, negative=None):
+        """
+        Args:
+            positive: 正向关键词（列表或 {关键词: 权重}），默认内置词表 + config 扩展
+            negative: 负向关键词，同上
+        """
+        if positive is None:
+            positive = _to_weights(DEFAULT_POSITIVE_KEYWORDS)
+            positive.update(_to_weights(getattr(cfg, 'SENTIMENT_POSITIVE_KEYWORDS', {})))
+        if negative is None:
+            negative = _to_weights(DEFAULT_NEGATIVE_KEYWORDS)
+            negative.update(_to_weights(getattr(cfg, 'SENTIMENT_NEGATIVE_KEYWORDS', {})))
+        self.positive = _to_weights(positive)
+        self.negative = _to_weights(negative)
+        self.matcher = KeywordMatcher(list(self.positive) + list(self.negative))
+
+    def score(self, text):
+        """
+        计算正负向得分（每个关键词出现即计一次权重，与出现次数无关）
+
+        Returns:
+            (正向得分, 负向得分)
+        """
+        found = self.matcher.find(text.lower())
+        positive = sum(self.positive.get(k, 0) for k in found)
+        negative = sum(self.negative.get(k, 0) for k in found)
+        return positive, negative
+
+    def label(self, text):
+        """判断情感倾向，返回 'positive' / 'negative' / 'neutral'"""
+        if not text or len(text.strip()) < 2:
+            return 'neutral'
+        positive, negative = self.score(text)
+        if positive > negative and positive > 0:
+            return 'positive'
+        if negative > positive and negative > 0:
+            return 'negative'
+        return 'neutral'
+
+
+_default_lexicon = None
+
+
+def get_default_lexicon():
+    """进程级默认情感词典（首次使用时编译）"""
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = SentimentLexicon()
+    return _default_lexicon
+
+
+class SentimentBackend:
+    """情感分析后端基类：score_batch(texts) 返回与 texts 对应的 [-1, 1] 分值"""
+
+    name = ''
+    neutral_margin = 0.0
+
+    def score_batch(self, texts):
+        raise NotImplementedError
+
+    def label(self, score):
+        """分值转换为 'positive' / 'negative' / 'neutral'"""
+        if score > self.neutral_margin:
+            return 'positive'
+        if score < -self.neutral_margin:
+            return 'negative'
+        return 'neutral'
+
+    def close(self):
+        pass
+
+
+class LexiconBackend(SentimentBackend):
+    """
+    关键词词典后端：分值 = (正向得分 - 负向得分) / (正向得分 + 负向得分 + 1)
+    分值的正负与 SentimentLexicon.label 的判断一致
+    """
+
+    name = 'lexicon'
+
+    def __init__(self, lexicon=None):
+        self.lexicon = lexicon or get_default_lexicon()
+
+    def score_batch(self, texts):
+        scores = []
+        for text in texts:
+            if not text or len(text.strip()) < 2:
+                scores.append(0.0)
+                continue
+            positive, negative = self.lexicon.score(text)
+            scores.append((positive - negative) / (positive + negative + 1))
+        return scores
+
+
+_NAMED_SIGNS = {
+    'pos': 1, 'positive': 1,
+    'neg': -1, 'negative': -1,
+    'neu': 0, 'neutral': 0,
+}
+# 数字标注：二分类 0/1，三分类 -1/0/1 或 0/1/2（负向 / 中立 / 正向）
+_NUMERIC_SIGNS = {
+    frozenset({'0', '1'}): {'0': -1, '1': 1},
+    frozenset({'-1', '1'}): {'-1': -1, '1': 1},
+    frozenset({'-1', '0', '1'}): {'-1': -1, '0': 0, '1': 1},
+    frozenset({'0', '1', '2'}): {'0': -1, '1': 0, '2': 1},
+}
+
+
+def _class_signs(classes):
+    """
+    模型类别 → 情感方向（1 正向 / -1 负向 / 0 中立）
+    支持 0/1、-1/0/1、0/1/2 和 'positive'/'negative'/'neutral'（pos/neg/neu）标注，
+    其他类别集合无法判断方向，直接报错而不是猜测
+    """
+    labels = [str(c).strip().lower() for c in classes]
+    labels = [label[:-2] if label.endswith('.0') else label for label in labels]  # 1.0 → 1
+    if all(label in _NAMED_SIGNS for label in labels):
+        return [_NAMED_SIGNS[label] for label in labels]
+    mapping = _NUMERIC_SIGNS.get(frozenset(labels))
+    if mapping is None or len(set(labels)) != len(labels):
+        raise ValueError(f"无法识别的情感类别: {list(classes)}（支持 0/1、-1/0/1、0/1/2 或 positive/negative/neutral）")
+    return [mapping[label] for label in labels]
+
+
+def _load_model(path):
+    """加载本地分类模型，返回 (predict_proba 函数, 各列对应的情感方向)"""
+    if path.endswith('.onnx'):
+        import numpy as np
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+        input_name = session.get_inputs()[0].name
+
+        def predict_proba(texts):
+            outputs = session.run(None, {input_name: np.array(texts, dtype=object).reshape(-1, 1)})
+            probs = outputs[-1]
+            if isinstance(probs, list) and probs and isinstance(probs[0], dict):  # skl2onnx 的 ZipMap 输出
+                labels = list(probs[0].keys())
+                return [[row[label] for label in labels] for row in probs], labels
+            probs = np.asarray(probs)
+            # 没有类别信息时按 [负向, 正向] 或 [负向, 中立, 正向] 排列
+            labels = ['negative', 'positive'] if probs.shape[1] == 2 else ['negative', 'neutral', 'positive']
+            return probs.tolist(), labels
+
+        return predict_proba
+
+    try:
+        import joblib
+        model = joblib.load(path)
+    except ImportError:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+
+    def predict_proba(texts):
+        return model.predict_proba(texts).tolist(), list(model.classes_)
+
+    return predict_proba
+
+
+_worker_predict = None
+
+
+def _init_worker(path):
+    """进程池初始化：每个工作进程加载一次模型"""
+    global _worker_predict
+    _worker_predict = _load_model(path)
+
+
+def _score_chunk(texts):
+    """在工作进程中给一批文本打分：P(正向) - P(负向)"""
+    probs, labels = _worker_predict(texts)
+    signs = _class_signs(labels)
+    return [sum(p * sign for p, sign in zip(row, signs)) for row in probs]
+
+
+class LocalModelBackend(SentimentBackend):
+    """本地 CPU 分类模型后端，按批推理并分发到进程池"""
+
+    name = 'model'
+
+    def __init__(self, model_path, workers=None, batch_size=None, neutral_margin=None):
+        """
+        Args:
+            model_path: 模型路径（.onnx，或 .pkl/.joblib 的 scikit-learn 模型，需带 predict_proba）
+            workers: 进程数，默认 config.SENTIMENT_WORKERS（0 表示 CPU 核数 - 1，1 表示不开进程池）
+            batch_size: 每批推理的文本数，默认 config.SENTIMENT_BATCH_SIZE
+            neutral_margin: |分值| 不超过该值视为中立，默认 config.SENTIMENT_NEUTRAL_MARGIN
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+        self.model_path = model_path
+        workers = getattr(cfg, 'SENTIMENT_WORKERS', 0) if workers is None else workers
+        self.workers = int(workers) or max((os.cpu_count() or 2) - 1, 1)
+        self.batch_size = int(batch_size or getattr(cfg, 'SENTIMENT_BATCH_SIZE', 512))
+        self.neutral_margin = float(getattr(cfg, 'SENTIMENT_NEUTRAL_MARGIN', 0.2)
+                                    if neutral_margin is None else neutral_margin)
+        self._executor = None
+        # 先在主进程加载并试运行一次，模型无效或类别无法识别时尽早报错
+        _init_worker(model_path)
+        _score_chunk(['测试'])
+
+    def score_batch(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers <= 1 or len(chunks) == 1:
+            results = map(_score_chunk, chunks)
+        else:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker, initargs=(self.model_path,)
+                )
+            results = self._executor.map(_score_chunk, chunks)
+        scores = []
+        for chunk_scores in results:
+            scores.extend(chunk_scores)
+        # 过短的文本没有可判断的内容
+        return [0.0 if len(text.strip()) < 2 else score for text, score in zip(texts, scores)]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+_backend = None
+
+
+def get_sentiment_backend():
+    """
+    进程级情感分析后端：SENTIMENT_BACKEND = 'model' 且模型可用时使用本地模型，
+    否则使用关键词词典
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+
+    if getattr(cfg, 'SENTIMENT_BACKEND', 'lexicon') == 'model':
+        path = getattr(cfg, 'SENTIMENT_MODEL_PATH', '')
+        try:
+            _backend = LocalModelBackend(path)
+            print(f"🧠 使用本地情感模型: {path}（{_backend.workers} 个进程）")
+            atexit.register(_backend.close)
+            return _backend
+        except Exception as e:
+            print(f"⚠️ 本地情感模型加载失败，改用关键词词典: {e}")
+    _backend = LexiconBackend()
+    return _backend
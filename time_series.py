@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+按天分桶的时间序列统计
+
+原来唯一的时间统计是 24 小时分布，群友的"平均每小时发言数"只能假设群聊活跃了 30 天来估算。
+这里在分析的同一遍扫描中按天累计：
+- 全群每天的消息数、每个群友每天的发言数：以第一条消息的日期为原点的定长数组（array）
+- 每个词每天的出现次数：扫描时稀疏记录，过滤完成后只把保留下来的词压缩为数组
+由日序列可以直接得到周 / 月汇总、真实的时间跨度和发言速率、热词的月度走势和爆发检测，
+不需要再次遍历消息。
+"""
+
+from array import array
+from collections import Counter
+from datetime import date
+
+
+def _zeros(n):
+    return array('L', bytes(n * array('L').itemsize))
+
+
+class TimeSeriesAggregator:
+    """全群 / 群友 / 词三个维度的按天计数"""
+
+    def __init__(self):
+        self.origin = None  # 第 0 天对应的日期序数（date.toordinal()）
+        self.group = array('L')  # 全群每天的消息数
+        self.users = {}  # {uin: array 每天发言数}
+        self.words = {}  # {word: Counter{天: 次数}}，compact_words 后为 {word: array}
+        self._month_cache_key = None
+        self._month_labels_cache = []
+
+    # ---------- 累计 ----------
+
+    def _index(self, day):
+        """日期序数 → 数组下标，早于原点时整体向前扩展"""
+        if self.origin is None:
+            self.origin = day
+        idx = day - self.origin
+        if idx < 0:
+            shift = -idx
+            self.origin = day
+            self.group = _zeros(shift) + self.group
+            for uin, series in self.users.items():
+                self.users[uin] = _zeros(shift) + series
+            for word, days in self.words.items():
+                self.words[word] = Counter({d + shift: c for d, c in days.items()})
+            idx = 0
+        return idx
+
+    @staticmethod
+    def _bump(series, idx, count=1):
+        if idx >= len(series):
+            series.extend(_zeros(idx + 1 - len(series)))
+        series[idx] += count
+
+    def add_message(self, day, uin=None):
+        """记录一条消息（day 为本地日期序数）"""
+        idx = self._index(day)
+        self._bump(self.group, idx)
+        if uin:
+            series = self.users.get(uin)
+            if series is None:
+                series = self.users[uin] = array('L')
+            self._bump(series, idx)
+
+    def add_word(self, word, day, count=1):
+        """记录一个词的出现"""
+        idx = self._index(day)
+        days = self.words.get(word)
+        if days is None:
+            days = self.words[word] = Counter()
+        days[idx] += count
+
+    def compact_words(self, keep):
+        """只保留 keep 中的词，并把稀疏记录转换为与全群等长的数组"""
+        n_days = len(self.group)
+        compacted = {}
+        for word in keep:
+            days = self.words.get(word)
+            if not days:
+                continue
+            series = _zeros(max(n_days, max(days) + 1))
+            for idx, count in days.items():
+                series[idx] = count
+            compacted[word] = series
+        self.words = compacted
+
+    # ---------- 查询 ----------
+
+    @property
+    def n_days(self):
+        """从第一条到最后一条消息跨越的天数"""
+        return len(self.group)
+
+    def first_date(self):
+        return date.fromordinal(self.origin) if self.origin is not None else None
+
+    def last_date(self):
+        return date.fromordinal(self.origin + len(self.group) - 1) if self.group else None
+
+    def daily(self, key=None, kind='group'):
+        """日序列（list），kind 为 'group' / 'user' / 'word'，不存在时返回全 0"""
+        if kind == 'group':
+            series = self.group
+        else:
+            source = self.users if kind == 'user' else self.words
+            series = source.get(key)
+            if series is None:
+                return [0] * self.n_days
+            if isinstance(series, Counter):
+                dense = [0] * self.n_days
+                for idx, count in series.items():
+                    dense[idx] = count
+                return dense
+        daily = list(series)
+        if len(daily) < self.n_days:
+            daily.extend([0] * (self.n_days - len(daily)))
+        return daily
+
+    def weekly(self, key=None, kind='group'):
+        """{周序号: 次数}（周序号 = 日期序数 // 7，与 ChatAnalyzer 的周一致），只包含非零周"""
+        weeks = Counter()
+        if self.origin is None:
+            return weeks
+        for idx, count in enumerate(self.daily(key, kind)):
+            if count:
+                weeks[(self.origin + idx) // 7] += count
+        return weeks
+
+    def monthly(self, key=None, kind='group'):
+        """{'YYYY-MM': 次数}，覆盖首末消息之间的每个月（没有消息的月为 0）"""
+        months = {}
+        if self.origin is None:
+            return months
+        for month, count in zip(self._month_labels(), self.daily(key, kind)):
+            months[month] = months.get(month, 0) + count
+        return months
+
+    def _month_labels(self):
+        """每一天所属的月份（按原点和天数缓存）"""
+        cache_key = (self.origin, self.n_days)
+        if self._month_cache_key != cache_key:
+            labels = []
+            for idx in range(self.n_days):
+                d = date.fromordinal(self.origin + idx)
+                labels.append(f"{d.year:04d}-{d.month:02d}")
+            self._month_labels_cache = labels
+            self._month_cache_key = cache_key
+        return self._month_labels_cache
+
+    def active_days(self, uin):
+        """群友有发言的天数"""
+        series = self.users.get(uin)
+        return sum(1 for count in series if count) if series is not None else 0
+
+    def span_hours(self):
+        """群聊记录覆盖的小时数（按完整天计算）"""
+        return self.n_days * 24
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+消息时间戳解析
+
+parse_timestamp 原来对每条消息执行 fromisoformat + astimezone，时区写死为 UTC+8，
+数字形式的时间戳（load_json 流式解析时会转成字符串）一律解析失败。这里：
+- 支持 ISO 字符串（Z / ±HH:MM / 无时区）和秒、毫秒级 Unix 时间戳
+- 按"截断到小时的前缀 + 时区后缀"缓存解析结果，同一小时内的消息只解析一次
+- 目标时区由 config.py 的 TIMEZONE_OFFSET_HOURS 配置（默认 8，即北京时间）
+没有时区信息的 ISO 时间视为已经是目标时区的本地时间。
+QQ 出现之前（1999 年以前）或晚于当前时间一年以上的时间视为无效（如 0、True 被当作时间戳），
+避免单个异常值把按天统计的数组拉长到几十年。
+"""
+
+import re
+from datetime import datetime, timezone, timedelta
+import config as cfg
+
+# 日期 + 小时 | 分钟 | 秒及小数 | 时区后缀
+_ISO_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2}[T ]\d{2})(:\d{2})(?::\d{2}(?:[.,]\d+)?)?\s*(Z|[+-]\d{2}(?::?\d{2})?)?$'
+)
+_EPOCH_PATTERN = re.compile(r'^-?\d+(?:\.\d+)?$')
+# 大于该值的数字时间戳按毫秒处理（1e11 秒约为公元 5138 年）
+_EPOCH_MS_THRESHOLD = 1e11
+# 合理的消息时间范围：不早于该年份，不晚于当前时间加上该天数
+_MIN_YEAR = 1999
+_MAX_FUTURE_DAYS = 366
+
+
+def get_timezone_offset_hours():
+    """配置的目标时区（相对 UTC 的小时数）"""
+    return float(getattr(cfg, 'TIMEZONE_OFFSET_HOURS', 8))
+
+
+def _offset_minutes(suffix):
+    """时区后缀转换为分钟数，无后缀返回 None"""
+    if not suffix:
+        return None
+    if suffix == 'Z':
+        return 0
+    sign = -1 if suffix[0] == '-' else 1
+    digits = suffix[1:].replace(':', '')
+    return sign * (int(digits[:2]) * 60 + int(digits[2:4] or 0))
+
+
+class TimestampParser:
+    """带缓存的时间戳解析器，返回目标时区下的 (日期, 小时)"""
+
+    def __init__(self, offset_hours=None):
+        if offset_hours is None:
+            offset_hours = get_timezone_offset_hours()
+        self.offset_minutes = int(round(offset_hours * 60))
+        self.tz = timezone(timedelta(minutes=self.offset_minutes))
+        self._utc_hour_aligned = self.offset_minutes % 60 == 0
+        self._min_datetime = datetime(_MIN_YEAR, 1, 1, tzinfo=self.tz)
+        self._max_datetime = datetime.now(self.tz) + timedelta(days=_MAX_FUTURE_DAYS)
+        self._cache = {}
+
+    def _from_epoch(self, value):
+        if abs(value) > _EPOCH_MS_THRESHOLD:
+            value /= 1000
+        return datetime.fromtimestamp(value, self.tz)
+
+    def _from_iso(self, text):
+        dt = datetime.fromisoformat(text.replace('Z', '+00:00').replace(',', '.'))
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=self.tz)
+        return dt.astimezone(self.tz)
+
+    def local_datetime(self, ts):
+        """解析为目标时区的 datetime（不使用缓存），无法解析或不在合理范围内时返回 None"""
+        if ts is None or ts == '' or isinstance(ts, bool):
+            return None
+        try:
+            if isinstance(ts, (int, float)):
+                dt = self._from_epoch(float(ts))
+            else:
+                text = str(ts).strip()
+                if _EPOCH_PATTERN.match(text):
+                    dt = self._from_epoch(float(text))
+                else:
+                    dt = self._from_iso(text)
+        except (ValueError, OverflowError, OSError):
+            return None
+        if not self._min_datetime <= dt <= self._max_datetime:
+            return None
+        return dt
+
+    def date_hour(self, ts):
+        """
+        目标时区下的 (date, hour)，无法解析时返回 None
+
+        ISO 时间按小时前缀缓存；时区偏移不是整小时（如 +05:30）时按分钟前缀缓存。
+        """
+        if isinstance(ts, str):
+            # 最常见的 UTC 写法（2024-01-01T12:34:56.000Z）直接按切片命中缓存
+            if self._utc_hour_aligned and ts[-1:] == 'Z' and ts[13:14] == ':':
+                cached = self._cache.get((ts[:13], 'Z'))
+                if cached is not None:
+                    return cached
+            match = _ISO_PATTERN.match(ts)
+            if match:
+                hour_prefix, minute, suffix = match.groups()
+                source = _offset_minutes(suffix)
+                shift = self.offset_minutes - (self.offset_minutes if source is None else source)
+                key = (hour_prefix, suffix) if shift % 60 == 0 else (hour_prefix + minute, suffix)
+                cached = self._cache.get(key)
+                if cached is None:
+                    dt = self.local_datetime(ts)
+                    if dt is None:
+                        return None
+                    cached = self._cache[key] = (dt.date(), dt.hour)
+                return cached
+
+        dt = self.local_datetime(ts)
+        return (dt.date(), dt.hour) if dt is not None else None
+
+    def hour(self, ts):
+        """目标时区下的小时（0-23），无法解析时返回 None"""
+        result = self.date_hour(ts)
+        return result[1] if result is not None else None
+
+
+_default_parser = None
+
+
+def get_default_parser():
+    """进程级默认解析器（使用配置的时区）"""
+    global _default_parser
+    if _default_parser is None:
+        _default_parser = TimestampParser()
+    return _default_parser
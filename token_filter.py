@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+分词结果的过滤判断（按词缓存）
+
+_tokenize_and_count 原来对每一次出现的词都要做十几项检查：@ 判断、数字/符号正则、特殊字符正则、
+两遍逐字符扫描 MEANINGLESS_SYMBOLS 和标点、最多 8 次正则的 ID 判断，再查 BLACKLIST / FUNCTION_WORDS；
+_filter_results 又对每个不同的词重复其中大部分。而同一个词的判断结果永远相同，
+这里把所有正则预编译、字符集合预先展开，并按词缓存判断结果：
+- classify(word)：分词阶段，返回归一化后的标准词，应当丢弃时返回 None
+- is_noise_word(word)：过滤阶段只看词本身的检查（长度、词频、白名单、单字统计仍由调用方判断）
+词表大小有限，缓存就是一个普通 dict，每个不同的词只检查一次。
+"""
+
+import re
+import string
+import config as cfg
+from utils import is_emoji, MEANINGLESS_SYMBOLS
+
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]')
+_SPECIAL_PATTERN = re.compile(r'[%_\-}\]]')  # ID 中常见的特殊字符
+_DIGIT_SYMBOL_PATTERN = re.compile(r'^[\d\W]+$')
+_DIGIT_SPACE_PATTERN = re.compile(r'^[\d\s]+$')
+_ALNUM_PATTERN = re.compile(r'^[a-zA-Z0-9]+$')
+_LETTER_PATTERN = re.compile(r'[a-zA-Z]')
+_DIGIT_PATTERN = re.compile(r'[0-9]')
+
+_PUNCTUATION = frozenset(string.punctuation + '，。！？；：、（）【】')
+_MEANINGLESS = frozenset(MEANINGLESS_SYMBOLS)
+_MEANINGLESS_OR_PUNCTUATION = _MEANINGLESS | _PUNCTUATION
+
+# 长度在 6-20 之间、字母占多数但不是 ID 的常见英文词
+_COMMON_WORDS = frozenset({'password', 'username', 'account', 'message', 'picture', 'image'})
+
+
+def is_id_like_string(word):
+    """判断是否为ID类字符串（图片ID、消息ID等）"""
+    # 长度检查：ID通常在3-20个字符之间（包括短ID如7R%D8、0ED3V）
+    if not word or len(word) < 3 or len(word) > 20:
+        return False
+
+    # 如果包含特殊字符（如%、_、-、}、]等），很可能是ID
+    if _SPECIAL_PATTERN.search(word):
+        return True
+
+    # 必须是字母数字组合，且至少包含一个字母和一个数字（因此不会是纯数字或纯字母）
+    if not _ALNUM_PATTERN.match(word):
+        return False
+    if not (_LETTER_PATTERN.search(word) and _DIGIT_PATTERN.search(word)):
+        return False
+
+    # 字母数字混合的短字符串（3-5个字符），很可能是ID
+    if len(word) <= 5:
+        return True
+
+    # 对于长字符串（6-20个字符），字母数量应该占多数（至少50%），并排除常见英文词
+    if len(_LETTER_PATTERN.findall(word)) < len(word) * 0.5:
+        return False
+    return word.lower() not in _COMMON_WORDS
+
+
+def _is_symbol_only(word):
+    """只由无意义符号、标点和空白组成"""
+    return all(c in _MEANINGLESS_OR_PUNCTUATION or c.isspace() for c in word)
+
+
+def _is_special_id(word):
+    """包含特殊字符且没有中文，很可能是图片ID、消息ID等"""
+    return _SPECIAL_PATTERN.search(word) is not None and not _CJK_PATTERN.search(word)
+
+
+class TokenClassifier:
+    """按词缓存的分词过滤器"""
+
+    def __init__(self, normalize=None):
+        self.normalize = normalize or (lambda word: word)
+        self.blacklist = cfg.BLACKLIST
+        self.function_words = cfg.FUNCTION_WORDS
+        self._token_cache = {}
+        self._word_cache = {}
+
+    def classify(self, word):
+        """分词阶段：返回要统计的标准词（同词异格已归一化），应当丢弃时返回 None"""
+        try:
+            return self._token_cache[word]
+        except KeyError:
+            pass
+        result = None if self._is_noise_token(word) else self.normalize(word)
+        self._token_cache[word] = result
+        return result
+
+    def _is_noise_token(self, word):
+        # 过滤@符号及其相关内容
+        if '@' in word:
+            return True
+        # 纯数字/符号
+        if _DIGIT_SYMBOL_PATTERN.match(word) and not is_emoji(word):
+            return True
+        if _is_special_id(word):
+            return True
+        # 无意义符号（如⌒、☆、★等）和标点组成的词
+        if _is_symbol_only(word):
+            return True
+        if is_id_like_string(word):
+            return True
+        # 黑名单、虚词不计入统计
+        return word in self.blacklist or word in self.function_words
+
+    def is_noise_word(self, word):
+        """过滤阶段：特殊字符、ID、纯数字、纯标点、纯无意义符号"""
+        verdict = self._word_cache.get(word)
+        if verdict is None:
+            verdict = self._word_cache[word] = bool(
+                _is_special_id(word)
+                or is_id_like_string(word)
+                or _DIGIT_SPACE_PATTERN.match(word)
+                or _is_symbol_only(word)
+            )
+        return verdict
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+热词走势：爆发检测、峰值日期和流行周期
+
+年度报告除了"哪些词用得多"，更想知道"这个梗是什么时候火起来的"。
+这里只对热词（time_series.compact_words 保留下来的前 TOP_N 个词）的按天计数做计算，
+词表再大也不影响耗时：
+- 使用率 = 当天出现次数 / 当天全群消息数，避免把全群都很活跃的日子误判为爆发
+- 滚动 z 分数：与之前 TREND_WINDOW_DAYS 天的使用率均值和标准差比较；
+  标准差加上该词全年平均使用率作为下限，避免从 0 到 1 次就被当成无限大的爆发
+- 爆发分 = 最大 z 分数，连同爆发日期、出现次数最多的峰值日期、首次/最后出现日期和流行天数
+有 numpy 时所有词组成一个矩阵一次向量化计算，没有时逐词计算（结果相同）。
+"""
+
+import math
+from datetime import date
+import config as cfg
+
+# 尝试导入numpy（批量计算走势时使用，没有时逐词计算）
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+
+def _rolling_z_python(rates, window):
+    """单个词的滚动 z 分数（不含当天的前 window 天）"""
+    n = len(rates)
+    floor = sum(rates) / n if n else 0.0
+    z = [0.0] * n
+    s = sq = 0.0
+    for t in range(n):
+        if t > 0:
+            k = min(t, window)
+            mean = s / k
+            var = max(sq / k - mean * mean, 0.0)
+            z[t] = (rates[t] - mean) / math.sqrt(var + floor * floor) if floor > 0 else 0.0
+        s += rates[t]
+        sq += rates[t] * rates[t]
+        if t >= window:
+            s -= rates[t - window]
+            sq -= rates[t - window] * rates[t - window]
+    return z
+
+
+def _rolling_z_numpy(rates, window):
+    """所有词的滚动 z 分数（rates 为 词数 × 天数 矩阵）"""
+    n_words, n_days = rates.shape
+    floor = rates.mean(axis=1, keepdims=True)
+    zero = np.zeros((n_words, 1))
+    cs = np.concatenate([zero, np.cumsum(rates, axis=1)], axis=1)
+    cs2 = np.concatenate([zero, np.cumsum(rates * rates, axis=1)], axis=1)
+    t = np.arange(n_days)
+    start = np.maximum(t - window, 0)
+    k = np.maximum(t - start, 1)
+    mean = (cs[:, t] - cs[:, start]) / k
+    var = np.maximum((cs2[:, t] - cs2[:, start]) / k - mean * mean, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(floor > 0, (rates - mean) / np.sqrt(var + floor * floor), 0.0)
+    z[:, 0] = 0.0
+    return z
+
+
+def _summarize(counts, z, origin, threshold):
+    """单个词的走势摘要"""
+    active = [i for i, c in enumerate(counts) if c]
+    if not active:
+        return None
+    burst_idx = max(range(len(z)), key=lambda i: (z[i], -i))
+    peak_idx = max(active, key=lambda i: (counts[i], -i))
+    first, last = active[0], active[-1]
+    return {
+        'burst_score': round(float(z[burst_idx]), 2),
+        'burst_date': date.fromordinal(origin + burst_idx).isoformat(),
+        'burst_days': sum(1 for i in active if z[i] >= threshold),
+        'peak_date': date.fromordinal(origin + peak_idx).isoformat(),
+        'peak_count': int(counts[peak_idx]),
+        'first_date': date.fromordinal(origin + first).isoformat(),
+        'last_date': date.fromordinal(origin + last).isoformat(),
+        'lifetime_days': last - first + 1,
+        'active_days': len(active),
+    }
+
+
+def compute_trends(time_series, words=None, window=None, threshold=None):
+    """
+    计算热词走势
+
+    Args:
+        time_series: TimeSeriesAggregator（词已通过 compact_words 压缩）
+        words: 要计算的词，默认 time_series 中保留的所有词
+        window: 滚动窗口天数，默认 config.TREND_WINDOW_DAYS
+        threshold: z 分数达到该值的天计为爆发日，默认 config.TREND_BURST_Z
+
+    Returns:
+        {word: {'burst_score', 'burst_date', 'burst_days', 'peak_date', 'peak_count',
+                'first_date', 'last_date', 'lifetime_days', 'active_days'}}
+    """
+    window = int(window or getattr(cfg, 'TREND_WINDOW_DAYS', 14))
+    threshold = float(threshold if threshold is not None else getattr(cfg, 'TREND_BURST_Z', 3.0))
+    words = list(time_series.words if words is None else words)
+    if not words or time_series.origin is None or time_series.n_days == 0:
+        return {}
+
+    group = time_series.daily()
+    all_counts = [time_series.daily(word, 'word') for word in words]
+
+    if NUMPY_AVAILABLE:
+        counts = np.asarray(all_counts, dtype=np.float64)
+        totals = np.maximum(np.asarray(group, dtype=np.float64), 1.0)
+        z_matrix = _rolling_z_numpy(counts / totals, window)
+        z_rows = z_matrix.tolist()
+    else:
+        totals = [max(g, 1) for g in group]
+        z_rows = [
+            _rolling_z_python([c / g for c, g in zip(word_counts, totals)], window)
+            for word_counts in all_counts
+        ]
+
+    trends = {}
+    for word, word_counts, z in zip(words, all_counts, z_rows):
+        summary = _summarize(word_counts, z, time_series.origin, threshold)
+        if summary is not None:
+            trends[word] = summary
+    return trends
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+用户过滤（config.FILTERED_USERS）
+
+原来每条消息、每次查询贡献者时都要遍历 FILTERED_USERS 逐个做子串判断，
+export_json 里每个热词的每个贡献者也要判断一次。这里：
+- 把 FILTERED_USERS 编译成一个正则（各关键词转义后用 | 连接），一次扫描判断是否包含任一关键词
+- 按显示名称缓存判断结果，按 uin 缓存"该 uin 的映射名称是否被过滤"
+同一个用户第一次出现之后，判断只是一次字典查找。匹配规则不变：名称包含任一关键词即过滤。
+"""
+
+import re
+import config as cfg
+
+
+class UserFilter:
+    """FILTERED_USERS 的预编译匹配器"""
+
+    def __init__(self, patterns=None):
+        if patterns is None:
+            patterns = getattr(cfg, 'FILTERED_USERS', [])
+        self.patterns = tuple(patterns)
+        self._regex = re.compile('|'.join(re.escape(p) for p in self.patterns)) if self.patterns else None
+        self._name_cache = {}
+        self._uin_cache = {}
+
+    def is_filtered_name(self, name):
+        """名称是否包含任一过滤关键词"""
+        if not name or self._regex is None:
+            return False
+        verdict = self._name_cache.get(name)
+        if verdict is None:
+            verdict = self._name_cache[name] = self._regex.search(name) is not None
+        return verdict
+
+    def is_filtered_uin(self, uin, uin_to_name):
+        """uin 在映射中的名称是否被过滤（空 uin 视为过滤，没有映射名称的不过滤）"""
+        if not uin:
+            return True
+        verdict = self._uin_cache.get(uin)
+        if verdict is None:
+            verdict = self._uin_cache[uin] = self.is_filtered_name(uin_to_name.get(uin, ''))
+        return verdict
+
+    def forget_uins(self):
+        """uin → 名称的映射变化后清空按 uin 的缓存"""
+        self._uin_cache.clear()
@@ -2,8 +2,8 @@
 import re
 import json
 import math
-from datetime import datetime, timezone, timedelta
 from collections import Counter
+from emoji_utils import extract_emojis, is_emoji  # noqa: F401（保持从 utils 导入的兼容）
 
 # 无意义符号集合（装饰性符号，在词频统计中应该被过滤）
 MEANINGLESS_SYMBOLS = '⌒☆★◆◇■□▲△●○※§▽▼◐◑◒◓◔◕◖◗◘◙◚◛◜◝◞◟◠◡☀☁☂☃☄☎☏☐☑☒☓☔☕☖☗☘☙☚☛☜☝☞☟☠☡☢☣☤☥☦☧☨☩☪☫☬☭☮☯☰☱☲☳☴☵☶☷☸☹☺☻☼☽☾☿♀♁♂♃♄♅♆♇♈♉♊♋♌♍♎♏♐♑♒♓♔♕♖♗♘♙♚♛♜♝♞♟♠♡♢♣♤♥♦♧♨♩♪♫♬♭♮♯♰♱♲♳♴♵♶♷♸♹♺♻♼♽♾♿⚀⚁⚂⚃⚄⚅⚆⚇⚈⚉⚊⚋⚌⚍⚎⚏⚐⚑⚒⚓⚔⚕⚖⚗⚘⚙⚚⚛⚜⚝⚞⚟⚠⚡⚢⚣⚤⚥⚦⚧⚨⚩⚪⚫⚬⚭⚮⚯⚰⚱⚲⚳⚴⚵⚶⚷⚸⚹⚺⚻⚼⚽⚾⚿⛀⛁⛂⛃⛄⛅⛆⛇⛈⛉⛊⛋⛌⛍⛎⛏⛐⛑⛒⛓⛔⛕⛖⛗⛘⛙⛚⛛⛜⛝⛞⛟⛠⛡⛢⛣⛤⛥⛦⛧⛨⛩⛪⛫⛬⛭⛮⛯⛰⛱⛲⛳⛴⛵⛶⛷⛸⛹⛺⛻⛼⛽⛾⛿'
@@ -132,42 +132,13 @@ def load_json(filepath):
             print("❌ 文件过大，无法加载到内存")
             raise MemoryError("JSON 文件过大，请减小文件大小或增加系统内存")
 
-def extract_emojis(text):
-    emoji_pattern = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"
-        "\U0001F300-\U0001F5FF"
-        "\U0001F680-\U0001F6FF"
-        "\U0001F1E0-\U0001F1FF"
-        "\U00002702-\U000027B0"
-        "\U0001F900-\U0001F9FF"
-        "\U0001FA00-\U0001FA6F"
-        "\U0001FA70-\U0001FAFF"
-        "\U00002600-\U000026FF"
-        "\U00002300-\U000023FF"
-        "]",
-        flags=re.UNICODE
-    )
-    return emoji_pattern.findall(text)
-
-def is_emoji(char):
-    if len(char) != 1:
-        return False
-    code = ord(char)
-    emoji_ranges = [
-        (0x1F600, 0x1F64F), (0x1F300, 0x1F5FF), (0x1F680, 0x1F6FF),
-        (0x1F1E0, 0x1F1FF), (0x2702, 0x27B0), (0x1F900, 0x1F9FF),
-        (0x1FA00, 0x1FA6F), (0x1FA70, 0x1FAFF), (0x2600, 0x26FF), (0x2300, 0x23FF),
-    ]
-    return any(start <= code <= end for start, end in emoji_ranges)
-
 def parse_timestamp(ts):
-    try:
-        dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-        local_dt = dt.astimezone(timezone(timedelta(hours=8)))
-        return local_dt.hour
-    except:
-        return None
+    """
+    消息时间戳 → 本地小时（0-23），无法解析时返回 None
+    支持 ISO 字符串和 Unix 时间戳，时区见 config.TIMEZONE_OFFSET_HOURS（详见 timestamps.py）
+    """
+    from timestamps import get_default_parser  # 延迟导入：timestamps 读取 config，utils 本身不依赖配置
+    return get_default_parser().hour(ts)
 
 def clean_text(text):
     """清理文本，去除表情、@、回复等干扰内容"""
@@ -332,66 +303,45 @@ def analyze_sentiment(text):
     """
     简单的情感分析：判断文本的情感倾向
     返回: 'positive', 'negative', 'neutral'
-    """
-    if not text or len(text.strip()) < 2:
-        return 'neutral'
-    
-    text_lower = text.lower()
-    
-    # 正向情感关键词
-    positive_keywords = [
-        '好', '棒', '赞', '厉害', '优秀', '完美', '喜欢', '爱', '开心', '高兴', '快乐', '幸福',
-        '不错', '可以', '支持', '同意', '对', '正确', 'nice', 'good', 'great', 'awesome',
-        '哈哈', 'hhh', 'hh', '233', '666', '👍', '😊', '😄', '😁', '😆', '😃', '😍', '❤️',
-        '牛逼', '666', '太棒了', '太好了', '真不错', '真棒', '厉害', '强', '👍'
-    ]
     
-    # 负向情感关键词
-    negative_keywords = [
-        '不好', '差', '烂', '垃圾', '讨厌', '烦', '生气', '愤怒', '难过', '伤心', '失望',
-        '不行', '不对', '错误', '坏', '糟糕', '差劲', '无语', '服了', 'bad', 'terrible',
-        '😢', '😭', '😤', '😠', '😡', '💔', '😞', '😔', '😩', '😫',
-        '傻逼', 'sb', '垃圾', '废物', '滚', '去死', '烦死了', '气死了'
-    ]
-    
-    # 统计关键词出现次数
-    positive_count = sum(1 for keyword in positive_keywords if keyword in text_lower)
-    negative_count = sum(1 for keyword in negative_keywords if keyword in text_lower)
-    
-    # 判断情感倾向
-    if positive_count > negative_count and positive_count > 0:
-        return 'positive'
-    elif negative_count > positive_count and negative_count > 0:
-        return 'negative'
-    else:
-        return 'neutral'
+    关键词匹配由 sentiment.SentimentLexicon 一次扫描完成（词表见 sentiment.py，可在 config.py 扩展）
+    """
+    from sentiment import get_default_lexicon  # 延迟导入：sentiment 读取 config，utils 本身不依赖配置
+    return get_default_lexicon().label(text)
+
+# 单字统计：参与统计的字符（汉字、英文字母）和视为词边界的标点
+_SINGLE_CHAR_PATTERN = re.compile(r'[\u4e00-\u9fffa-zA-Z]')
+_SINGLE_CHAR_PUNCTUATION = '，。！？、；：""''（）,.!?;:\'"()[]【】《》<>…—～·'
+_BOUNDARY_CLASS = r'\s' + ''.join(sorted({re.escape(c) for c in _SINGLE_CHAR_PUNCTUATION}))
+# 左右相邻的都是开头/结尾、空白或标点，即独立出现在边界位置的单字
+_BOUNDARY_CHAR_PATTERN = re.compile(
+    rf'(?<![^{_BOUNDARY_CLASS}])[\u4e00-\u9fffa-zA-Z](?![^{_BOUNDARY_CLASS}])'
+)
+
 
 def analyze_single_chars(texts):
-    """分析单字的独立出现情况 - 来自旧版"""
+    """
+    分析单字的独立出现情况 - 来自旧版
+
+    每条文本只用两个预编译正则各扫描一遍（原来每个字符要执行三次 re.match），结果与旧版完全一致
+    """
     total_count = Counter()
     solo_count = Counter()
     boundary_count = Counter()
-    punctuation = set('，。！？、；：""''（）,.!?;:\'"()[]【】《》<>…—～·')
     
     for text in texts:
         # 统计每个字的总出现次数
-        for char in text:
-            if re.match(r'^[\u4e00-\u9fffa-zA-Z]$', char):
-                total_count[char] += 1
+        clean_chars = _SINGLE_CHAR_PATTERN.findall(text)
+        if not clean_chars:
+            continue
+        total_count.update(clean_chars)
         
         # 统计单字消息
-        clean_chars = [c for c in text if re.match(r'^[\u4e00-\u9fffa-zA-Z]$', c)]
         if len(clean_chars) == 1:
             solo_count[clean_chars[0]] += 1
         
         # 统计在边界位置的出现
-        for i, char in enumerate(text):
-            if not re.match(r'^[\u4e00-\u9fffa-zA-Z]$', char):
-                continue
-            left_ok = (i == 0) or (text[i-1] in punctuation) or (text[i-1].isspace())
-            right_ok = (i == len(text)-1) or (text[i+1] in punctuation) or (text[i+1].isspace())
-            if left_ok and right_ok:
-                boundary_count[char] += 1
+        boundary_count.update(_BOUNDARY_CHAR_PATTERN.findall(text))
     
     result = {}
     for char in total_count:
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+本地选词引擎（不调用 AI）
+
+没有配置 API Key 时，自动选词原来直接取词频前10，选出的多是"哈哈""什么"这类通用词。
+这里按四个维度给 topWords 打分，毫秒级完成、无需联网：
+- 突发性：词在各周之间的使用是否集中爆发（梗通常有明显的流行期）
+- 参与度：有多少群友在用、用得是否均匀（全群玩的梗 vs 个人口头禅）
+- 独特性：在本群的频率相对通用语料（背景词频表）高出多少
+- 新颖性：新词发现 / 词组合并得到的词、通用词典里没有的词
+同一套打分也用作 AI 选词前的预筛选，缩小候选词列表。
+"""
+
+import math
+import config as cfg
+from prompt_builder import prefilter_candidates, variant_key
+from background_freq import get_background_table
+
+# 各维度默认权重，可在 config.py 中用 LOCAL_SELECT_WEIGHTS 覆盖
+DEFAULT_WEIGHTS = {
+    'frequency': 0.2,
+    'burstiness': 0.2,
+    'diversity': 0.2,
+    'distinctiveness': 0.25,
+    'novelty': 0.15,
+}
+
+
+def _percentile_ranks(values):
+    """把一组分值转换为 0-1 的百分位（并列取平均名次），消除各维度量纲差异"""
+    n = len(values)
+    if n <= 1:
+        return [1.0] * n
+    order = sorted(range(n), key=lambda i: values[i])
+    ranks = [0.0] * n
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        avg = (i + j) / 2 / (n - 1)
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg
+        i = j + 1
+    return ranks
+
+
+def burstiness(periods, period_totals):
+    """
+    突发性：各周使用率的 (σ-μ)/(σ+μ)，映射到 0-1
+    使用率 = 该周出现次数 / 该周消息数，避免把群整体活跃的周误判为爆发
+    """
+    if not periods or not period_totals:
+        return 0.0
+    rates = [periods.get(p, 0) / total for p, total in period_totals.items() if total > 0]
+    if len(rates) < 2:
+        return 0.0
+    mean = sum(rates) / len(rates)
+    if mean <= 0:
+        return 0.0
+    std = math.sqrt(sum((r - mean) ** 2 for r in rates) / len(rates))
+    return ((std - mean) / (std + mean) + 1) / 2
+
+
+def contributor_diversity(counts):
+    """参与度：有效使用人数 exp(香农熵) 的对数，一个人刷屏的词得分低"""
+    total = sum(counts)
+    if total <= 0:
+        return 0.0
+    entropy = -sum(c / total * math.log(c / total) for c in counts if c > 0)
+    return entropy
+
+
+class LocalWordSelector:
+    """本地热词打分与选词"""
+
+    def __init__(self, analyzer=None, background=None, weights=None):
+        """
+        Args:
+            analyzer: ChatAnalyzer（可选），提供时间分布、完整贡献者和新词信息
+            background: 背景词频表（需要 log_prob(word) 和 in），默认使用 get_background_table()
+            weights: 各维度权重，默认 config.LOCAL_SELECT_WEIGHTS
+        """
+        self.analyzer = analyzer
+        self.background = background if background is not None else get_background_table()
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights or getattr(cfg, 'LOCAL_SELECT_WEIGHTS', {}))
+
+        self.novel_words = set()
+        if analyzer is not None:
+            self.novel_words.update(getattr(analyzer, 'discovered_words', ()) or ())
+            self.novel_words.update((getattr(analyzer, 'merged_words', None) or {}).keys())
+
+    def _features(self, candidates):
+        """计算每个候选词的原始特征值"""
+        analyzer = self.analyzer
+        word_periods = getattr(analyzer, 'word_periods', None) or {}
+        period_totals = getattr(analyzer, 'period_totals', None) or {}
+        word_contributors = getattr(analyzer, 'word_contributors', None) or {}
+        total_freq = sum(w['freq'] for w in candidates) or 1
+
+        features = {name: [] for name in DEFAULT_WEIGHTS}
+        for word_data in candidates:
+            word = word_data['word']
+            freq = word_data['freq']
+            features['frequency'].append(math.log1p(freq))
+            features['burstiness'].append(burstiness(word_periods.get(word), period_totals))
+
+            if word in word_contributors:
+                counts = list(word_contributors[word].values())
+            else:
+                counts = [c.get('count', 0) for c in word_data.get('contributors', [])]
+            features['diversity'].append(contributor_diversity(counts))
+
+            if self.background is not None:
+                # 本群相对概率与通用语料概率的对数比
+                features['distinctiveness'].append(math.log(freq / total_freq) - self.background.log_prob(word))
+            else:
+                features['distinctiveness'].append(0.0)
+
+            if word in self.novel_words:
+                features['novelty'].append(1.0)
+            elif self.background is not None and word not in self.background:
+                features['novelty'].append(0.5)
+            else:
+                features['novelty'].append(0.0)
+        return features
+
+    def score(self, candidate_words):
+        """
+        给候选词打分
+
+        Returns:
+            [(word_data, 总分, {维度: 0-1 分值})]，按总分从高到低排序
+        """
+        candidates = list(candidate_words)
+        if not candidates:
+            return []
+
+        features = self._features(candidates)
+        weights = dict(self.weights)
+        if not self.analyzer or not getattr(self.analyzer, 'period_totals', None):
+            weights['burstiness'] = 0  # 没有时间分布时不参与打分
+        if self.background is None:
+            weights['distinctiveness'] = 0
+        weight_sum = sum(weights.values()) or 1
+
+        normalized = {name: _percentile_ranks(values) for name, values in features.items()}
+        scored = []
+        for i, word_data in enumerate(candidates):
+            parts = {name: normalized[name][i] for name in features}
+            total = sum(weights[name] * parts[name] for name in parts) / weight_sum
+            scored.append((word_data, total, parts))
+        scored.sort(key=lambda item: -item[1])
+        return scored
+
+    def shortlist(self, candidate_words, n=60):
+        """预筛选：过滤无意义词后保留得分最高的 n 个，保持原有的词频顺序"""
+        candidates, _ = prefilter_candidates(candidate_words)
+        if len(candidates) <= n:
+            return candidates
+        keep = {id(word_data) for word_data, _, _ in self.score(candidates)[:n]}
+        return [w for w in candidates if id(w) in keep]
+
+    def select_words(self, candidate_words, top_n=200, count=10):
+        """
+        从候选词中选出年度热词
+
+        与已选词互为子串的词（如"哈哈"与"哈哈哈哈"、"牛逼"与"太牛逼了"）只保留得分高的一个。
+        去重后不足 count 个时依次补齐：先用因互为子串被跳过的词，再用预过滤掉的词，各自按得分从高到低；
+        只有候选词本身不足 count 个时才会少于 count 个。
+        返回结果按词频从高到低排序。
+        """
+        pool = candidate_words[:top_n]
+        candidates, _ = prefilter_candidates(pool)
+        selected = []
+        selected_keys = []
+        skipped = []
+        for word_data, _, _ in self.score(candidates):
+            key = variant_key(word_data['word'])
+            if any(key in other or other in key for other in selected_keys):
+                skipped.append(word_data)
+                continue
+            selected.append(word_data)
+            selected_keys.append(key)
+            if len(selected) >= count:
+                break
+
+        if len(selected) < count:
+            kept = {id(w) for w in candidates}
+            filtered = [word_data for word_data, _, _ in self.score(w for w in pool if id(w) not in kept)]
+            selected.extend((skipped + filtered)[:count - len(selected)])
+        return sorted(selected, key=lambda w: w['freq'], reverse=True)